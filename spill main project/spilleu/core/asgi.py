@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Under ASGI, /api/posts/feed/ is served by the async feed view (posts/views_async.py)
+os.environ.setdefault('FEED_ASYNC', 'True')
 
 application = get_asgi_application()
@@ -1,9 +1,15 @@
 # Create a new file: core/middleware.py
 import time
 import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.db import connection
 from django.core.cache import cache
 
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .timing import StageTimer
+
 logger = logging.getLogger(__name__)
 
 class DatabasePerformanceMiddleware:
@@ -13,16 +19,17 @@ class DatabasePerformanceMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
-        # Reset query count
-        initial_queries = len(connection.queries)
+        # Count queries with an execute wrapper (connection.queries is empty unless DEBUG)
+        timer = StageTimer()
         start_time = time.time()
         
         # Process request
-        response = self.get_response(request)
+        with timer.track_queries():
+            response = self.get_response(request)
         
         # Calculate performance metrics
         end_time = time.time()
-        total_queries = len(connection.queries) - initial_queries
+        total_queries = timer.db_count
         total_time = end_time - start_time
         
         # Log slow requests
@@ -35,7 +42,7 @@ class DatabasePerformanceMiddleware:
             )
             
             # Log individual slow queries in debug mode
-            if hasattr(connection, 'queries') and len(connection.queries) > 0:
+            if total_queries and len(connection.queries) >= total_queries:
                 for query in connection.queries[-total_queries:]:
                     if float(query['time']) > 0.1:  # Log queries slower than 100ms
                         logger.warning(f"Slow query ({query['time']}s): {query['sql'][:200]}...")
@@ -44,6 +51,7 @@ class DatabasePerformanceMiddleware:
         if hasattr(response, '__setitem__'):
             response['X-DB-Queries'] = str(total_queries)
             response['X-Response-Time'] = f"{total_time:.3f}"
+            response['X-DB-Time'] = f"{timer.db_time:.3f}"
         
         return response
 
@@ -63,4 +71,31 @@ class ConnectionPoolMiddleware:
         finally:
             # Ensure connections are properly closed for long-running requests
             if hasattr(connection, 'close_if_unusable_or_obsolete'):
-                connection.close_if_unusable_or_obsolete()
\ No newline at end of file
+                connection.close_if_unusable_or_obsolete()
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that stays async under ASGI. The stock middleware is sync-only,
+    so Django would run the rest of the chain — async views included — on the
+    one thread_sensitive thread, one request at a time.
+    """
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -70,7 +70,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.AsyncWhiteNoiseMiddleware',  # async-capable under ASGI
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -137,6 +137,37 @@ DATABASES = {
     }
 }
 
+# --- Cache (shared across workers when REDIS_URL is set) ---
+REDIS_URL = config('REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CACHE_SHARED = config('CACHE_SHARED', default=bool(REDIS_URL), cast=bool)  # every worker sees the same cache; features that keep state there need it
+
+# --- Feed ---
+FEED_SNAPSHOT_TTL = config('FEED_SNAPSHOT_TTL', default=900, cast=int)  # seconds a ranked For You snapshot lives
+FEED_SNAPSHOT_SIZE = config('FEED_SNAPSHOT_SIZE', default=500, cast=int)  # post ids ranked per snapshot
+FEED_UNI_BUFFER_SIZE = config('FEED_UNI_BUFFER_SIZE', default=200, cast=int)  # newest posts buffered per university
+FEED_UNI_BUFFER_TTL = config('FEED_UNI_BUFFER_TTL', default=300, cast=int)
+FEED_SEEN_WINDOW_DAYS = config('FEED_SEEN_WINDOW_DAYS', default=14, cast=int)  # cached seen-set span; keep >= the 3-day candidate window
+FEED_SEEN_LOCAL_TTL = config('FEED_SEEN_LOCAL_TTL', default=60, cast=int)  # seconds a seen-set is cached without CACHE_SHARED
+FEED_PREFILTER_CAP = config('FEED_PREFILTER_CAP', default=300, cast=int)  # rows shortlisted in SQL before exact scoring
+POST_SYNC_MAX_IDS = config('POST_SYNC_MAX_IDS', default=200, cast=int)  # ids per POST /api/posts/sync/
+POST_SYNC_LAG_SECONDS = config('POST_SYNC_LAG_SECONDS', default=60, cast=int)  # sync watermark trails now by this (in-flight writes, clock skew)
+STREAM_JSON_MIN_ITEMS = config('STREAM_JSON_MIN_ITEMS', default=50, cast=int)  # list pages this long stream (core/streaming.py)
+BATCH_IDEMPOTENCY_TTL = config('BATCH_IDEMPOTENCY_TTL', default=600, cast=int)  # seconds batch/action results are kept for retries
+VIEW_BUFFER = config('VIEW_BUFFER', default=bool(REDIS_URL), cast=bool)  # queue views for flush_view_events instead of writing them in the request
+VIEW_BUFFER_TTL = config('VIEW_BUFFER_TTL', default=86400, cast=int)  # seconds a buffered view waits for the flusher before it is lost
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=8, cast=int)  # tries before an outbox event is marked failed
+OUTBOX_BACKOFF = config('OUTBOX_BACKOFF', default=5, cast=int)  # seconds before the first retry; doubles per attempt
+FEED_ASYNC = config('FEED_ASYNC', default=False, cast=bool)  # route /feed/ to AsyncFeedView (set by core/asgi.py)
+PERSON_SEARCH_TRIGRAMS = config('PERSON_SEARCH_TRIGRAMS', default=True, cast=bool)  # fuzzy/infix name search; run rebuild_name_grams after enabling
+
 AUTH_USER_MODEL = 'users.User'
 
 # --- Password validation ---
@@ -0,0 +1,83 @@
+# core/streaming.py
+"""
+Incremental JSON responses for large list pages.
+
+JSONRenderer encodes the whole payload in one json.dumps call, so a page
+exists twice in memory (the item dicts, then the encoded string) before the
+first byte goes out. StreamingJSONResponse takes a payload dict whose
+``stream_key`` value is an iterable of items (e.g. cards.iter_cards()),
+encodes the other keys around it and the items one at a time with orjson,
+and sends ~CHUNK_SIZE byte chunks as they fill.
+
+The bytes match JSONRenderer's compact UTF-8 output for the same payload,
+including the \\u2028/\\u2029 escaping; values orjson has no native form for
+(Decimal, lazy strings, and datetimes, which DRF truncates to milliseconds)
+go through DRF's JSONEncoder. Floats are the one exception: orjson writes
+1e-05 as 1e-5.
+
+Small pages gain nothing; views stream only when should_stream() says so
+(STREAM_JSON_MIN_ITEMS).
+"""
+
+import orjson
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+CHUNK_SIZE = 16 * 1024
+_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+_fallback = JSONEncoder().default
+
+
+def dumps(value):
+    """One value as compact JSON bytes, as JSONRenderer would encode it."""
+    return (orjson.dumps(value, default=_fallback, option=_OPTIONS)
+            .replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029"))
+
+
+def iter_json(data, stream_key="items"):
+    """Yield `data` as JSON in chunks, consuming `data[stream_key]` lazily."""
+    buf = bytearray(b"{")
+    for i, (key, value) in enumerate(data.items()):
+        if i:
+            buf += b","
+        buf += dumps(str(key)) + b":"
+        if key != stream_key:
+            buf += dumps(value)
+            continue
+        buf += b"["
+        for j, item in enumerate(value):
+            if j:
+                buf += b","
+            buf += dumps(item)
+            if len(buf) >= CHUNK_SIZE:
+                yield bytes(buf)
+                buf.clear()
+        buf += b"]"
+    buf += b"}"
+    yield bytes(buf)
+
+
+async def _aiter(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def should_stream(request, count):
+    """Stream pages of at least STREAM_JSON_MIN_ITEMS items that negotiated plain JSON."""
+    renderer = getattr(request, "accepted_renderer", None)
+    return count >= settings.STREAM_JSON_MIN_ITEMS and getattr(renderer, "format", "json") == "json"
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    `data` streamed by iter_json(). Items must render without queries: the
+    view's transaction (ATOMIC_REQUESTS) has closed by the time they are
+    consumed. Pass `asynchronous=True` from async views so ASGI doesn't
+    buffer the whole body in a thread first.
+    """
+
+    def __init__(self, data, stream_key="items", status=200, asynchronous=False, **kwargs):
+        chunks = iter_json(data, stream_key)
+        super().__init__(_aiter(chunks) if asynchronous else chunks, status=status,
+                         content_type="application/json", **kwargs)
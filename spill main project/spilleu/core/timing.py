@@ -0,0 +1,72 @@
+# core/timing.py
+"""
+Per-request stage timing and staff debug switches.
+
+StageTimer records wall time per named stage (``stage()`` blocks or
+sequential ``lap()`` marks) and, while ``track_queries()`` is
+active, the time and count of every SQL statement via
+``connection.execute_wrapper`` — that works with DEBUG off, unlike
+``connection.queries``. ``header()`` renders the result as a Server-Timing
+header value.
+"""
+
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+DEBUG_PARAM = "debug"
+
+
+def is_debug_request(request):
+    """Staff users can opt into debug output with ?debug=1."""
+    user = getattr(request, "user", None)
+    flag = (request.GET.get(DEBUG_PARAM) or "").strip().lower()
+    return bool(user and user.is_authenticated and user.is_staff and flag in {"1", "true", "yes"})
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+        self.db_time = 0.0
+        self.db_count = 0
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        """Charge the time since the previous lap (or creation) to `name`."""
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0.0) + now - self._last
+        self._last = now
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t0
+
+    @contextmanager
+    def track_queries(self):
+        with connection.execute_wrapper(self._time_query):
+            yield
+
+    def _time_query(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - t0
+            self.db_count += 1
+
+    def as_dict(self):
+        """Milliseconds per stage, plus DB totals."""
+        data = {name: round(sec * 1000, 2) for name, sec in self.stages.items()}
+        data["db"] = round(self.db_time * 1000, 2)
+        data["db_queries"] = self.db_count
+        return data
+
+    def header(self):
+        parts = [f"{name};dur={sec * 1000:.2f}" for name, sec in self.stages.items()]
+        parts.append(f'db;dur={self.db_time * 1000:.2f};desc="{self.db_count} queries"')
+        return ", ".join(parts)
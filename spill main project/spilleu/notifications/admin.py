@@ -10,7 +10,7 @@ from datetime import timedelta
 
 from .models import (
     Notification, PushToken, NotificationLog,
-    HashtagFollow, UserFollow
+    HashtagFollow, UserFollow, OutboxEvent
 )
 
 # ============== ACTIONS ==============
@@ -242,9 +242,26 @@ class UserFollowAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('follower', 'followee')
 
 
+@admin.action(description="Retry selected outbox events now")
+def retry_outbox_events(modeladmin, request, queryset):
+    updated = queryset.exclude(status='done').update(status='pending', available_at=timezone.now())
+    modeladmin.message_user(request, f"{updated} events queued for retry.")
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'available_at', 'created_at', 'processed_at')
+    list_filter = ('status', 'kind', 'created_at')
+    search_fields = ('kind', 'last_error')
+    readonly_fields = ('created_at', 'processed_at')
+    date_hierarchy = 'created_at'
+    actions = [retry_outbox_events]
+
+
 # ============== ADMIN SITE CUSTOMIZATION ==============
 
 # Custom admin site title and header
 admin.site.site_header = 'Notifications Administration'
 admin.site.site_title = 'Notifications Admin'
-admin.site.index_title = 'Manage Notifications & Follows'
\ No newline at end of file
+admin.site.index_title = 'Manage Notifications & Follows'
+
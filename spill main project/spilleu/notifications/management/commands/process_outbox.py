@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications.outbox import process, purge
+
+
+class Command(BaseCommand):
+    help = ("Run queued notification/push side effects of post, vote and follow writes "
+            "(run as a worker with --interval, or every few seconds)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Events claimed per batch (default 100).")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep running, polling every N seconds when idle (default 0: drain once and exit).")
+        parser.add_argument("--keep-days", type=int, default=7, help="Purge done events older than this (default 7).")
+
+    def _drain(self, batch_size):
+        ran = succeeded = 0
+        while True:
+            batch_ran, batch_ok = process(limit=batch_size)
+            ran, succeeded = ran + batch_ran, succeeded + batch_ok
+            if batch_ran < batch_size:
+                return ran, succeeded
+
+    def handle(self, *args, **opts):
+        batch_size = max(1, opts["batch_size"])
+        while True:
+            ran, succeeded = self._drain(batch_size)
+            purged = purge(timezone.now() - timedelta(days=opts["keep_days"]))
+            if ran or purged or not opts["interval"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Outbox: {succeeded}/{ran} events done, {ran - succeeded} to retry or failed, {purged} purged."))
+            if not opts["interval"]:
+                return
+            time.sleep(opts["interval"])
@@ -73,6 +73,7 @@ class Notification(models.Model):
 
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class PushToken(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -101,4 +102,31 @@ class NotificationLog(models.Model):
     expo_ticket_id = models.CharField(max_length=255, blank=True, null=True)
     error_message = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    sent_at = models.DateTimeField(blank=True, null=True)
\ No newline at end of file
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+class OutboxEvent(models.Model):
+    """
+    A side effect of a post/vote/follow write, recorded in the same transaction
+    and carried out after commit by ``manage.py process_outbox``
+    (notifications/outbox.py).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=32)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # not retried before this
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'available_at'])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
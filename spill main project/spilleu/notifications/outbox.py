@@ -0,0 +1,116 @@
+# notifications/outbox.py
+"""
+Transactional outbox for the side effects of post, vote and follow writes.
+
+Receivers used to create Notification rows, fan out to every follower and
+call Expo's push API from inside ``post_save``. With ATOMIC_REQUESTS on, that
+ran inside the request's transaction, so create-post, like and vote held
+their row locks for as long as the follower loop and the push HTTP calls
+took. Now a receiver only calls ``enqueue()``, which inserts one OutboxEvent
+row in the same transaction: the event exists iff the write committed.
+
+``manage.py process_outbox`` claims due events in batches and runs the
+handler registered for each kind with ``@handles(kind)`` (handlers live in
+notifications/signals.py):
+
+* a handler runs in its own transaction together with marking its event
+  done, and events it enqueues (e.g. the pushes for the notifications it
+  created) commit with it;
+* an event whose handler raises is retried after OUTBOX_BACKOFF * 2**(attempts - 1)
+  seconds (capped at an hour), and is marked failed after OUTBOX_MAX_ATTEMPTS;
+* claiming pushes ``available_at`` out by CLAIM_LEASE, so a worker that dies
+  mid-batch only delays its events. Delivery is at-least-once: handlers check
+  current state (does the like still exist?) rather than trusting the event.
+
+Counter columns are not routed through here: their single-row UPDATEs stay in
+the request so counts are exact at commit (see posts/counters.py). Nor is the
+For You candidate pool: writes only insert a DirtyCandidate mark, and
+``manage.py refresh_feed_candidates --dirty-only`` does the refresh
+(posts/candidate_pool.py).
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+CLAIM_LEASE = timedelta(minutes=5)
+MAX_BACKOFF = 3600
+
+
+def handles(kind):
+    """Register the decorated function as the handler for `kind` events: fn(**payload)."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, **payload):
+    """Record a `kind` event in the current transaction."""
+    return OutboxEvent.objects.create(kind=kind, payload=payload)
+
+
+def enqueue_many(kind, payloads):
+    """One `kind` event per payload dict, in a single INSERT."""
+    return OutboxEvent.objects.bulk_create(
+        [OutboxEvent(kind=kind, payload=payload) for payload in payloads], batch_size=500)
+
+
+def _backoff(attempts):
+    base = getattr(settings, "OUTBOX_BACKOFF", 5)
+    return timedelta(seconds=min(MAX_BACKOFF, base * 2 ** (attempts - 1)))
+
+
+def claim(limit, now=None):
+    """Lease up to `limit` due events to this worker and return them, oldest first."""
+    now = now or timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        events = list(OutboxEvent.objects
+                      .select_for_update(skip_locked=skip_locked)
+                      .filter(status="pending", available_at__lte=now)
+                      .order_by("id")[:limit])
+        if events:
+            OutboxEvent.objects.filter(id__in=[e.id for e in events]).update(available_at=now + CLAIM_LEASE)
+    return events
+
+
+def run_event(event):
+    """Run `event`'s handler and record the outcome. Returns True on success."""
+    event.attempts += 1
+    try:
+        handler = HANDLERS[event.kind]
+        with transaction.atomic():
+            handler(**event.payload)
+            event.status = "done"
+            event.processed_at = timezone.now()
+            event.save(update_fields=["status", "attempts", "processed_at"])
+        return True
+    except Exception as e:
+        logger.exception("Outbox event %s (%s) failed", event.id, event.kind)
+        event.last_error = f"{type(e).__name__}: {e}"
+        event.status = "failed" if event.attempts >= getattr(settings, "OUTBOX_MAX_ATTEMPTS", 8) else "pending"
+        event.processed_at = None
+        if event.status == "pending":
+            event.available_at = timezone.now() + _backoff(event.attempts)
+        event.save(update_fields=["status", "attempts", "available_at", "processed_at", "last_error"])
+        return False
+
+
+def process(limit=100):
+    """Claim and run one batch. Returns (events run, events that succeeded)."""
+    events = claim(limit)
+    return len(events), sum(run_event(event) for event in events)
+
+
+def purge(older_than):
+    """Delete done events processed before `older_than`."""
+    return OutboxEvent.objects.filter(status="done", processed_at__lt=older_than).delete()[0]
@@ -58,24 +58,24 @@ class PostMinimalSerializer(serializers.ModelSerializer):
     def get_likes(self, obj):
         """Get likes for tea posts (no flag)"""
         if obj.flag is None:  # Tea posts
-            return obj.reactions.filter(reaction='up').count()
+            return obj.like_count
         return 0
     
     def get_red_votes(self, obj):
         """Get red votes for flagged posts"""
         if obj.flag in ['red', 'green']:  # Flagged posts
-            return obj.flag_votes.filter(vote='red').count()
+            return obj.red_vote_count
         return 0
     
     def get_green_votes(self, obj):
         """Get green votes for flagged posts"""
         if obj.flag in ['red', 'green']:  # Flagged posts
-            return obj.flag_votes.filter(vote='green').count()
+            return obj.green_vote_count
         return 0
     
     def get_replies_count(self, obj):
         """Get count of replies to this post"""
-        return obj.replies.count()
+        return obj.replies_count
 
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -140,24 +140,24 @@ class PostMinimalSerializer(serializers.ModelSerializer):
     def get_likes(self, obj):
         """Get likes for tea posts (no flag)"""
         if obj.flag is None:  # Tea posts
-            return obj.reactions.filter(reaction='up').count()
+            return obj.like_count
         return 0
     
     def get_red_votes(self, obj):
         """Get red votes for flagged posts"""
         if obj.flag in ['red', 'green']:  # Flagged posts
-            return obj.flag_votes.filter(vote='red').count()
+            return obj.red_vote_count
         return 0
     
     def get_green_votes(self, obj):
         """Get green votes for flagged posts"""
         if obj.flag in ['red', 'green']:  # Flagged posts
-            return obj.flag_votes.filter(vote='green').count()
+            return obj.green_vote_count
         return 0
     
     def get_replies_count(self, obj):
         """Get count of replies to this post"""
-        return obj.replies.count()
+        return obj.replies_count
 
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -17,8 +17,12 @@ logger = logging.getLogger(__name__)
 
 class PushNotificationService:
     @staticmethod
-    def send_push_notification(user, title, body, data=None):
-        """Send push notification to a specific user"""
+    def send_push_notification(user, title, body, data=None, raise_errors=False):
+        """
+        Send push notification to a specific user. With `raise_errors`, server
+        and connection errors are re-raised after logging so the caller (the
+        outbox worker) can retry.
+        """
         print(f"🔔 Attempting to send push notification to user {user.id}: {title}")
         
         tokens = PushToken.objects.filter(user=user, is_active=True)
@@ -86,6 +90,8 @@ class PushNotificationService:
                 notification_log.status = 'failed'
                 notification_log.error_message = str(exc)
                 notification_log.save()
+                if raise_errors:
+                    raise
                 
             except (ConnectionError, HTTPError) as exc:
                 # Handle connection errors
@@ -94,6 +100,8 @@ class PushNotificationService:
                 notification_log.status = 'failed'
                 notification_log.error_message = str(exc)
                 notification_log.save()
+                if raise_errors:
+                    raise
                 
             except Exception as exc:
                 # Handle any other errors
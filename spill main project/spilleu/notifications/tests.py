@@ -1,3 +1,109 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts.models import Hashtag, Post, VoteReaction
+from users.models import City, Country, University, UniversityFollow, User
+from . import outbox
+from .models import HashtagFollow, Notification, OutboxEvent, UserFollow
+
+
+def make_user(email, university):
+    return User.objects.create_user(email, "pass12345", university=university)
+
+
+class OutboxTests(TestCase):
+    """Post/vote receivers only enqueue; the worker creates notifications, retries with backoff, then gives up."""
+
+    def setUp(self):
+        country = Country.objects.create(name="Testland")
+        city = City.objects.create(name="Testville", country=country)
+        self.uni = University.objects.create(name="Test University", city=city)
+        self.other_uni = University.objects.create(name="Other University", city=city)
+        self.author = make_user("author@example.com", self.uni)
+        self.followers = [make_user(f"f{i}@example.com", self.other_uni) for i in range(3)]
+        for user in self.followers:
+            UserFollow.objects.create(follower=user, followee=self.author)
+            UniversityFollow.objects.create(user=user, university=self.uni)
+        outbox.process()  # new-follower events
+
+    def make_post(self, **extra):
+        return Post.objects.create(author=self.author, university=self.uni, first_name="alex",
+                                   content="some content long enough to post", **extra)
+
+    def drain(self):
+        while outbox.process()[0]:
+            pass
+
+    def test_post_creation_only_enqueues(self):
+        with CaptureQueriesContext(connection) as ctx:
+            post = self.make_post()
+        self.assertFalse([q["sql"] for q in ctx.captured_queries if "notifications_notification" in q["sql"]])
+
+        self.drain()
+        kinds = sorted(Notification.objects.filter(post=post).values_list("user_id", "kind"))
+        self.assertEqual(kinds, sorted([(u.id, k) for u in self.followers
+                                        for k in (Notification.NEW_POST_USER, Notification.NEW_POST_UNI)]))
+        self.assertFalse(OutboxEvent.objects.exclude(status="done").exists())
+        self.assertEqual(OutboxEvent.objects.filter(kind="push", payload__data__postId=str(post.id)).count(), 6)
+
+    def test_one_fan_out_job_per_post(self):
+        tags = [Hashtag.objects.create(name="campus"), Hashtag.objects.create(name="food")]
+        for tag in tags:
+            HashtagFollow.objects.create(user=self.followers[0], hashtag=tag)
+        HashtagFollow.objects.create(user=self.author, hashtag=tags[0])
+        before = OutboxEvent.objects.count()
+        post = self.make_post()
+        post.hashtags.set(tags)
+        reply = self.make_post(parent=post, thread=post)
+        own_reply = Post.objects.create(author=self.followers[1], university=self.other_uni, parent=post, thread=post,
+                                        first_name="alex", content="some content long enough to post")
+        self.assertEqual(list(OutboxEvent.objects.filter(id__gt=before).values_list("kind", "payload")),
+                         [("post_created", {"post_id": p.id}) for p in (post, reply, own_reply)])
+
+        self.drain()
+        self.assertEqual(sorted(Notification.objects.filter(kind=Notification.NEW_POST_HASHTAG)
+                                .values_list("user_id", flat=True)), [self.followers[0].id])
+        self.assertEqual(OutboxEvent.objects.get(kind="push", payload__data__type="new_post_hashtag")
+                         .payload["data"]["hashtag"], "campus")
+        self.assertEqual(list(Notification.objects.filter(kind=Notification.COMMENT_ON_MY_POST)
+                              .values_list("user_id", "post_id", "actor_id")),
+                         [(self.author.id, post.id, self.followers[1].id)])
+
+    def test_like_undone_before_processing_is_not_notified(self):
+        post = self.make_post()
+        like = VoteReaction.objects.create(user=self.followers[0], post=post, reaction="up")
+        VoteReaction.objects.create(user=self.followers[1], post=post, reaction="up")
+        like.delete()
+        self.drain()
+        self.assertEqual(list(Notification.objects.filter(kind=Notification.LIKE_ON_MY_POST)
+                              .values_list("actor_id", flat=True)), [self.followers[1].id])
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_BACKOFF=60)
+    def test_failing_handler_backs_off_then_fails(self):
+        calls = []
+
+        @outbox.handles("test_boom")
+        def boom(n):
+            calls.append(n)
+            raise RuntimeError("push gateway down")
+
+        try:
+            event = outbox.enqueue("test_boom", n=1)
+            outbox.process()
+            event.refresh_from_db()
+            self.assertEqual((event.status, event.attempts), ("pending", 1))
+            self.assertGreater(event.available_at, timezone.now() + timedelta(seconds=50))
+            self.assertEqual(outbox.process(), (0, 0))  # not due yet
+
+            OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+            outbox.process()
+            event.refresh_from_db()
+            self.assertEqual((event.status, event.attempts, event.last_error),
+                             ("failed", 2, "RuntimeError: push gateway down"))
+            self.assertEqual(calls, [1, 1])
+        finally:
+            del outbox.HANDLERS["test_boom"]
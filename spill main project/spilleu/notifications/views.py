@@ -8,6 +8,8 @@ from rest_framework import status
 from django.db.models import Q, Count
 from django.shortcuts import get_object_or_404
 
+from core.streaming import StreamingJSONResponse, should_stream
+
 # Import models from correct locations
 from users.models import User, University, UniversityFollow
 from posts.models import Hashtag, Post
@@ -43,21 +45,29 @@ class NotificationsListView(APIView):
             is_read=False
         ).count()
         
-        # Serialize notifications
-        serializer = NotificationSerializer(notifications, many=True)
-        
         # Check if there are more notifications
         total_count = Notification.objects.filter(user=request.user).count()
         has_more = offset + page_size < total_count
         
-        return Response({
+        # Serialize notifications (long pages stream item by item; rows are
+        # fetched here, inside the request transaction)
+        notifications = list(notifications)
+        stream = should_stream(request, len(notifications))
+        if stream:
+            serializer = NotificationSerializer()
+            items = (serializer.to_representation(n) for n in notifications)
+        else:
+            items = NotificationSerializer(notifications, many=True).data
+        
+        data = {
             "unread_count": unread_count,
-            "items": serializer.data,
+            "items": items,
             "has_more": has_more,
             "page": page,
             "page_size": page_size,
             "total_count": total_count,
-        })
+        }
+        return StreamingJSONResponse(data) if stream else Response(data)
 
 class NotificationsMarkReadView(APIView):
     permission_classes = [IsAuthenticated]
@@ -135,27 +135,27 @@ class PostAdmin(admin.ModelAdmin):
     def likes_count(self, obj):
         if obj.flag in ('red', 'green'):
             return "-"  # Flag posts don't have likes
-        return obj.reactions.filter(reaction="up").count()
+        return obj.like_count
 
     @admin.display(description="Red Votes")
     def red_votes_count(self, obj):
         if obj.flag not in ('red', 'green'):
             return "-"  # Tea posts don't have flag votes
-        return obj.flag_votes.filter(vote="red").count()
+        return obj.red_vote_count
 
     @admin.display(description="Green Votes")
     def green_votes_count(self, obj):
         if obj.flag not in ('red', 'green'):
             return "-"  # Tea posts don't have flag votes
-        return obj.flag_votes.filter(vote="green").count()
+        return obj.green_vote_count
 
     @admin.display(description="Replies")
     def replies_count(self, obj):
-        return obj.replies.count()
+        return obj.replies_count
 
     @admin.display(description="Views")
     def views_count(self, obj):
-        return SeenPost.objects.filter(post=obj).count()
+        return obj.views_count
 
     @admin.display(description="Score")
     def engagement_score(self, obj):
@@ -0,0 +1,322 @@
+# posts/batch.py
+"""
+Set-based execution of BatchActionsView's like / flag_vote / save actions.
+
+Running each action on its own (get_object_or_404, update_or_create or
+delete, then the counter, pool and notification receivers of that row) made
+a 50-action batch hundreds of queries. A batch here is two steps:
+
+1. Plan. The referenced posts and the user's likes, flag votes and saves on
+   them are loaded with one query each. The actions are replayed in order
+   against that in-memory state. That yields every action's result exactly
+   as sequential execution would, and the final state per post (last write
+   wins).
+2. Apply. The difference between final and initial state is written with
+   one bulk INSERT, UPDATE or DELETE per table and kind of change. Row
+   signals don't fire (or, for deletes, return early while
+   ``applying_batch()`` is set); their effects follow set-wise: counter UPDATEs
+   grouped by delta, one candidate-pool refresh, and one ``reactions_changed``
+   signal for notifications (notifications/signals.py).
+
+A concurrent batch from the same user can insert a row the plan didn't see;
+the unique constraint rejects ours and the batch is re-planned once from
+fresh state, so counters never count a row twice.
+
+Retries. An action may carry a client-chosen ``action_id``; a later action
+with the same id within BATCH_IDEMPOTENCY_TTL is answered with the stored
+result instead of being applied again (so a retried like/unlike pair can't
+re-notify). The whole batch may carry a key too (``Idempotency-Key`` header
+or ``batch_id``); BatchActionsView stores the response body under it with
+claim_batch() / finish_batch() and answers a retry before any action is
+looked at. Both kinds of key are IdempotencyKey rows inserted with ON
+CONFLICT DO NOTHING before the work runs, inside the request's transaction:
+a concurrent request with the same key waits on the unique index until the
+first one commits (and then reads its result) or rolls back (and then runs).
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.dispatch import Signal
+
+from .candidate_pool import mark_dirty
+from .counters import update_counters
+from .models import IdempotencyKey, Post, PostFlagVote, SavedPost, VoteReaction
+from .viewer_state import ViewerState
+
+FLAG_VOTES = ("red", "green")
+NOT_FOUND = "No Post matches the given query."  # get_object_or_404's message, kept for clients
+
+# Sent once per applied batch with the net changes. liked / unliked /
+# unvoted: post ids; voted: {post_id: vote} for new flag votes only (a
+# red <-> green switch updates the row and notifies nobody, as before).
+reactions_changed = Signal()
+
+# Set while apply() deletes rows. The per-row delete receivers (counters,
+# candidate pool, notification cleanup) return early; apply() does their
+# work set-wise.
+_applying = threading.local()
+
+
+def applying_batch():
+    return getattr(_applying, "active", False)
+
+
+@contextmanager
+def _set_wise():
+    _applying.active = True
+    try:
+        yield
+    finally:
+        _applying.active = False
+
+
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field("key").max_length
+
+
+def _ttl():
+    return getattr(settings, "BATCH_IDEMPOTENCY_TTL", 600)
+
+
+def _claim_keys(user_id, scope, keys):
+    """
+    Insert `keys` for `user_id` in the current transaction and return
+    {key: stored result}: None for keys this call inserted (or whose work
+    produced no result), the committed result for the rest. Keys older than
+    BATCH_IDEMPOTENCY_TTL are dropped first and claimed afresh.
+    """
+    rows = IdempotencyKey.objects.filter(user_id=user_id, scope=scope, key__in=keys)
+    rows.filter(created_at__lt=timezone.now() - timedelta(seconds=_ttl())).delete()
+    IdempotencyKey.objects.bulk_create(
+        [IdempotencyKey(user_id=user_id, scope=scope, key=key) for key in keys], ignore_conflicts=True)
+    return dict(rows.values_list("key", "result"))
+
+
+def claim_batch(user_id, key):
+    """None if this request now owns batch `key`; otherwise the response body stored for it."""
+    return _claim_keys(user_id, "batch", [key]).get(key)
+
+
+def finish_batch(user_id, key, body):
+    """Store `body` for batch `key`; it becomes visible when the request commits."""
+    IdempotencyKey.objects.filter(user_id=user_id, scope="batch", key=key).update(result=body)
+
+
+def purge_keys():
+    """Delete keys older than BATCH_IDEMPOTENCY_TTL. Returns the number deleted."""
+    cutoff = timezone.now() - timedelta(seconds=_ttl())
+    return IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()[0]
+
+
+def _post_id(pid):
+    """`pid` as the ORM would read it for a pk lookup; raises its TypeError/ValueError."""
+    return None if pid is None else Post._meta.pk.get_prep_value(pid)
+
+
+class ActionBatch:
+    """
+    One user's batch: `results` holds a result dict per action (None for
+    view actions and unknown ops, which the view reports itself or not at
+    all), after plan().
+    """
+
+    def __init__(self, user, actions):
+        self.user = user
+        self.actions = actions
+
+    def run(self):
+        """Plan and apply. Returns `results`."""
+        self.replayed = self._claim_actions()
+        for attempt in range(2):
+            self.plan()
+            try:
+                with transaction.atomic():
+                    self.apply()
+            except IntegrityError:
+                if attempt:
+                    raise
+                continue
+            self._remember()
+            return self.results
+
+    # ---------- action ids ----------
+
+    def _action_key(self, action):
+        action_id = action.get("action_id")
+        if action_id is None or (action.get("type") or "").lower() == "view":
+            return None  # views are idempotent on their own (SeenPost is unique)
+        return str(action_id)  # BatchActionsView rejects ids over MAX_KEY_LENGTH
+
+    def _claim_actions(self):
+        """{action id: result} for actions this user already had applied."""
+        keys = {k for k in map(self._action_key, self.actions) if k}
+        if not keys:
+            return {}
+        return {k: v for k, v in _claim_keys(self.user.id, "action", keys).items() if v is not None}
+
+    def _remember(self):
+        fresh = {k: v for k, v in self.done.items() if k not in self.replayed}
+        if fresh:
+            rows = list(IdempotencyKey.objects.filter(user=self.user, scope="action", key__in=fresh))
+            for row in rows:
+                row.result = fresh[row.key]
+            IdempotencyKey.objects.bulk_update(rows, ["result"], batch_size=500)
+
+    # ---------- plan ----------
+
+    def plan(self):
+        ids = set()
+        for action in self.actions:
+            if (action.get("type") or "").lower() == "view" or self._action_key(action) in self.replayed:
+                continue
+            try:
+                ids.add(_post_id(action.get("id")))
+            except (TypeError, ValueError):
+                pass
+        ids.discard(None)
+
+        self.posts = {pid: (parent_id, flag) for pid, parent_id, flag in
+                      Post.objects.filter(id__in=ids).values_list("id", "parent_id", "flag")} if ids else {}
+        known = list(self.posts)
+        self.initial_likes = ViewerState.load_reactions(self.user, known) if known else {}
+        self.initial_votes = ViewerState.load_flag_votes(self.user, known) if known else {}
+        self.initial_saved = ViewerState.load_saved_ids(self.user, known) if known else set()
+        self.likes = dict(self.initial_likes)
+        self.votes = dict(self.initial_votes)
+        self.saved = set(self.initial_saved)
+
+        self.results = []
+        self.done = dict(self.replayed)  # also answers an action id repeated within the batch
+        for action in self.actions:
+            key = self._action_key(action)
+            if key in self.done:
+                self.results.append(self.done[key])
+                continue
+            result = self._plan_action(action)
+            self.results.append(result)
+            if key and result is not None:
+                self.done[key] = result
+
+    def _plan_action(self, action):
+        kind = (action.get("type") or "unknown").lower()
+        pid = action.get("id")
+        if kind == "view":
+            return None
+        handler = getattr(self, f"_plan_{kind}", None)
+        if handler is None:
+            return {"ok": False, "id": pid, "error": "unknown type"}
+        try:
+            return handler(action, pid, _post_id(pid))
+        except Exception as e:
+            return {"ok": False, "kind": kind, "id": pid, "error": str(e)}
+
+    def _plan_like(self, action, pid, key):
+        post = self.posts.get(key)
+        if post is None:
+            return {"ok": False, "kind": "like", "id": pid, "error": NOT_FOUND}
+        parent_id, flag = post
+        if parent_id is None and flag in FLAG_VOTES:
+            return {"ok": False, "kind": "like", "id": pid, "error": "Use flag voting on flagged posts"}
+
+        op = action.get("op", "").lower()
+        if op == "add":
+            self.likes[key] = "up"
+            return {"ok": True, "kind": "like", "id": pid}
+        if op == "remove":
+            return {"ok": self.likes.pop(key, None) is not None, "kind": "like", "id": pid}
+        return None
+
+    def _plan_flag_vote(self, action, pid, key):
+        post = self.posts.get(key)
+        if post is None or post[0] is not None:
+            return {"ok": False, "kind": "flag_vote", "id": pid, "error": NOT_FOUND}
+        if post[1] not in FLAG_VOTES:
+            return {"ok": False, "kind": "flag_vote", "id": pid, "error": "Only flagged posts accept red/green votes"}
+
+        vote = action.get("vote", "").lower()
+        if vote in FLAG_VOTES:
+            self.votes[key] = vote
+            return {"ok": True, "kind": "flag_vote", "id": pid, "vote": vote}
+        if vote == "remove":
+            return {"ok": self.votes.pop(key, None) is not None, "kind": "flag_vote", "id": pid}
+        return None
+
+    def _plan_save(self, action, pid, key):
+        if key not in self.posts:
+            return {"ok": False, "kind": "save", "id": pid, "error": "post not found"}
+
+        op = action.get("op", "").lower()
+        if op == "add":
+            self.saved.add(key)
+            return {"ok": True, "kind": "save", "id": pid}
+        if op == "remove":
+            existed = key in self.saved
+            self.saved.discard(key)
+            return {"ok": existed, "kind": "save", "id": pid}
+        return None
+
+    # ---------- apply ----------
+
+    @staticmethod
+    def _diff(before, after):
+        """(inserted, deleted, changed) keys between two {post_id: value} states."""
+        inserted = [k for k in after if k not in before]
+        deleted = [k for k in before if k not in after]
+        changed = [k for k in after if k in before and after[k] != before[k]]
+        return inserted, deleted, changed
+
+    def _delete(self, model, post_ids):
+        if post_ids:
+            with _set_wise():
+                model.objects.filter(user=self.user, post_id__in=post_ids).delete()
+
+    def apply(self):
+        user = self.user
+        liked, unliked, relabeled = self._diff(self.initial_likes, self.likes)
+        VoteReaction.objects.bulk_create([VoteReaction(user=user, post_id=pid, reaction="up") for pid in liked])
+        self._delete(VoteReaction, unliked)
+        if relabeled:
+            VoteReaction.objects.filter(user=user, post_id__in=relabeled).update(reaction="up")
+
+        voted, unvoted, switched = self._diff(self.initial_votes, self.votes)
+        PostFlagVote.objects.bulk_create([PostFlagVote(user=user, post_id=pid, vote=self.votes[pid]) for pid in voted])
+        self._delete(PostFlagVote, unvoted)
+        for vote in FLAG_VOTES:
+            ids = [pid for pid in switched if self.votes[pid] == vote]
+            if ids:
+                PostFlagVote.objects.filter(user=user, post_id__in=ids).update(vote=vote)
+
+        saved = self.saved - self.initial_saved
+        SavedPost.objects.bulk_create([SavedPost(user=user, post_id=pid) for pid in saved])
+        self._delete(SavedPost, self.initial_saved - self.saved)
+
+        # Counters: net delta per post, one UPDATE per (column, delta)
+        deltas = {}
+        for pid in {*liked, *unliked, *relabeled}:
+            delta = (self.likes.get(pid) == "up") - (self.initial_likes.get(pid) == "up")
+            if delta:
+                deltas.setdefault(("like_count", delta), []).append(pid)
+        for pid in {*voted, *unvoted, *switched}:
+            before, after = self.initial_votes.get(pid), self.votes.get(pid)
+            if before:
+                deltas.setdefault((f"{before}_vote_count", -1), []).append(pid)
+            if after:
+                deltas.setdefault((f"{after}_vote_count", +1), []).append(pid)
+        for (field, delta), ids in deltas.items():
+            qs = Post.objects.filter(id__in=ids)
+            if delta < 0:
+                qs = qs.filter(**{f"{field}__gt": 0})
+            update_counters(qs, **{field: F(field) + delta})
+
+        changed = {*liked, *unliked, *relabeled, *voted, *unvoted, *switched}
+        if changed:
+            mark_dirty(changed)
+            reactions_changed.send(
+                sender=ActionBatch, user=user,
+                liked=liked, unliked=unliked, voted={pid: self.votes[pid] for pid in voted}, unvoted=unvoted,
+            )
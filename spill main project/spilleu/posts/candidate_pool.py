@@ -0,0 +1,176 @@
+# posts/candidate_pool.py
+"""
+For You candidate pool.
+
+Every top-level post from the last CANDIDATE_WINDOW has a FeedCandidate row
+holding its time-independent score components (engagement, Bayesian
+engagement-rate term, zero-engagement penalty), so ranking a feed is a read
+of a few thousand narrow rows plus numpy, instead of the aggregate query over
+every recent post.
+
+Write paths don't refresh rows themselves: post saves, votes and batch
+actions call mark_dirty(), one INSERT into DirtyCandidate, and
+``manage.py refresh_feed_candidates --dirty-only`` (every few seconds)
+refreshes the marked ids set-wise. Views don't mark anything; their small
+effect on the rate term is picked up by the view-buffer flush or the full
+rebuild_pool() run every few minutes, which also catches any mark that
+raced with a drain.
+
+Combining the stored parts with personalize_scores_batch() applies the same
+float operations in the same order as calculate_post_score(), so pool scores
+equal the reference scores.
+"""
+
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .feed_engine import (
+    boost_expression, decay_bound_expression, engagement_components_batch, personalize_scores_batch,
+    prefiltered_top_k,
+)
+from .models import DirtyCandidate, FeedCandidate, Post
+from .seen_set import SeenSet
+
+CANDIDATE_WINDOW = timedelta(days=3)
+
+_COMPONENT_FIELDS = ["engagement_score", "eng_rate_score", "zero_penalty"]
+_SYNCED_FIELDS = ["university_id", "flag", "created_at"] + _COMPONENT_FIELDS
+
+# Posts inside an in-flight delete cascade. Their votes/views are deleted (and
+# fire post_delete) before the Post row itself; re-upserting the candidate at
+# that point would leave a row pointing at a deleted post.
+_deleting = threading.local()
+
+
+def deleting_post_ids():
+    if not hasattr(_deleting, "ids"):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def refresh_candidates(post_ids):
+    """
+    Recompute the pool rows for `post_ids` from the stored Post counters:
+    one SELECT, one upsert, one DELETE for ids that no longer qualify
+    (replies, suppressed posts, posts older than the window, deleted posts).
+    """
+    post_ids = set(post_ids) - deleting_post_ids()
+    if not post_ids:
+        return 0
+
+    cutoff = timezone.now() - CANDIDATE_WINDOW
+    rows = list(
+        Post.objects
+        .filter(id__in=post_ids, visible=True, parent__isnull=True, created_at__gte=cutoff)
+        .order_by()
+        .annotate(repost_count=Count('reposts'))
+        .values_list('id', 'university_id', 'flag', 'created_at',
+                     'like_count', 'red_vote_count', 'green_vote_count', 'replies_count', 'repost_count',
+                     'views_count')
+    )
+
+    stale = post_ids - {r[0] for r in rows}
+    if stale:
+        FeedCandidate.objects.filter(post_id__in=stale).delete()
+    if not rows:
+        return 0
+
+    cols = list(zip(*rows))
+    engagement_score, rate_term, penalty = engagement_components_batch(
+        likes=cols[4], red_votes=cols[5], green_votes=cols[6],
+        comments=cols[7], reposts=cols[8], views=cols[9], flag=cols[2],
+    )
+    FeedCandidate.objects.bulk_create(
+        [
+            FeedCandidate(
+                post_id=r[0], university_id=r[1], flag=r[2], created_at=r[3],
+                engagement_score=e, eng_rate_score=t, zero_penalty=z,
+            )
+            for r, e, t, z in zip(rows, engagement_score.tolist(), rate_term.tolist(), penalty.tolist())
+        ],
+        update_conflicts=True,
+        unique_fields=["post"],
+        update_fields=_SYNCED_FIELDS + ["refreshed_at"],
+        batch_size=500,
+    )
+    return len(rows)
+
+
+def mark_dirty(post_ids):
+    """Queue `post_ids` for the next refresh_dirty(). One INSERT, no reads."""
+    post_ids = {pid for pid in post_ids if pid} - deleting_post_ids()
+    if post_ids:
+        DirtyCandidate.objects.bulk_create([DirtyCandidate(post_id=pid) for pid in post_ids],
+                                           ignore_conflicts=True, batch_size=500)
+
+
+def refresh_dirty(batch_size=2000):
+    """Refresh and unmark queued ids, `batch_size` per transaction. Returns rows upserted."""
+    refreshed = 0
+    while True:
+        with transaction.atomic():
+            ids = list(DirtyCandidate.objects.order_by("post_id").values_list("post_id", flat=True)[:batch_size])
+            if not ids:
+                return refreshed
+            DirtyCandidate.objects.filter(post_id__in=ids).delete()
+            refreshed += refresh_candidates(ids)
+
+
+def prune_candidates():
+    """Drop rows that have aged out of the window. Returns the number deleted."""
+    deleted, _ = FeedCandidate.objects.filter(created_at__lt=timezone.now() - CANDIDATE_WINDOW).delete()
+    return deleted
+
+
+def rebuild_pool(batch_size=2000):
+    """Refresh every post inside the window, prune the rest and clear the dirty marks."""
+    DirtyCandidate.objects.all().delete()
+    cutoff = timezone.now() - CANDIDATE_WINDOW
+    ids = list(Post.objects.filter(parent__isnull=True, created_at__gte=cutoff).values_list('id', flat=True))
+    refreshed = 0
+    for i in range(0, len(ids), batch_size):
+        refreshed += refresh_candidates(ids[i:i + batch_size])
+    return refreshed, prune_candidates()
+
+
+def ranked_candidate_ids(user, user_data, limit, seen_ids=None, now=None, cap=None):
+    """
+    Best `limit` post ids from the pool for `user`, best first. Only time
+    decay and per-user affinity are computed here, and only for the rows
+    with the highest SQL score bound (feed_engine.prefiltered_top_k).
+
+    `seen_ids` (a SeenSet or a collection of post ids) is filtered in memory
+    after the pool read, not pushed into the query as a NOT IN.
+    """
+    now = now or timezone.now()
+    qs = FeedCandidate.objects.filter(created_at__gte=now - CANDIDATE_WINDOW)
+
+    def drop_seen(rows):
+        pool_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        if isinstance(seen_ids, SeenSet):
+            seen_mask = seen_ids.contains(pool_ids)  # the pool window is inside the seen-set window
+        else:
+            seen_mask = np.isin(pool_ids, np.fromiter(seen_ids, dtype=np.int64))
+        return [rows[i] for i in np.flatnonzero(~seen_mask).tolist()]
+
+    def score_rows(rows):
+        cols = list(zip(*rows))
+        base = np.asarray(cols[4]) + np.asarray(cols[5]) - np.asarray(cols[6])
+        return personalize_scores_batch(
+            base, created_at=cols[3], university_id=cols[1], flag=cols[2],
+            user=user, user_data=user_data, now=now,
+        )
+
+    bound = (F('engagement_score') + F('eng_rate_score') - F('zero_penalty')
+             + decay_bound_expression(now) + boost_expression(user, user_data or {}))
+    rows = prefiltered_top_k(
+        qs, bound,
+        ['post_id', 'university_id', 'flag', 'created_at', *_COMPONENT_FIELDS], score_rows, limit,
+        cap=cap, keep=drop_seen if seen_ids is not None else None,
+    )
+    return [r[0] for r in rows]
@@ -0,0 +1,170 @@
+# posts/cards.py
+"""
+Plain-dict card builders for list endpoints.
+
+PostSerializer/PostPreviewSerializer/ReplySerializer walk ~20 DRF fields per
+item, including a nested UserSerializer that recomputes the author's age for
+every post. The builders here produce the exact same JSON (same keys, same
+order, same values; see CardBuilderTests) with plain functions over hydrated
+posts, computing each author once per page and reading viewer state from a
+ViewerState loaded for the whole page.
+
+Hydrate with select_related('author__university__city', 'university__city')
+and prefetch_related('hashtags') to keep rendering query-free.
+"""
+
+from django.utils import timezone
+
+from .utils import resolve_image_url
+from .viewer_state import ViewerState
+
+_FLAGGED = ("red", "green")
+
+
+def iso_datetime(value):
+    """DRF DateTimeField output: current timezone, ISO 8601, 'Z' for UTC."""
+    if value is None:
+        return None
+    value = timezone.localtime(value)
+    s = value.isoformat()
+    if s.endswith("+00:00"):
+        s = s[:-6] + "Z"
+    return s
+
+
+def display_name(user, today=None):
+    """Anonymous author label: gender prefix + age ("f21"), or the email local part."""
+    dob = getattr(user, "date_of_birth", None) or getattr(user, "dob", None)
+    if not dob:
+        return getattr(user, "email", "f").split("@")[0]
+
+    today = today or timezone.now().date()
+    age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+    age = max(age, 0)
+
+    g = (getattr(user, "gender", None) or "").strip().lower()
+    prefix = "m" if g in ("m", "male", "man") else "f"
+    return f"{prefix}{age}"
+
+
+def _str_or_none(value):
+    return str(value) if value is not None else None
+
+
+class CardContext:
+    """Per-page state shared by every card: viewer state and the author cache."""
+
+    def __init__(self, request, posts, viewer_state=None):
+        user = getattr(request, "user", None)
+        self.authenticated = bool(user and user.is_authenticated)
+        self.state = viewer_state or ViewerState.load(user, posts)
+        self.today = timezone.now().date()
+        self._authors = {}
+
+    def author(self, user):
+        card = self._authors.get(user.id)
+        if card is None:
+            card = self._authors[user.id] = {
+                "id": user.id,
+                "email": user.email,
+                "name": display_name(user, self.today),
+                "university": _str_or_none(user.university),
+            }
+        return dict(card)
+
+
+def _hashtags(post):
+    return [f"#{t.name}" for t in post.hashtags.all()]
+
+
+def post_preview_card(post, ctx):
+    """Same output as PostPreviewSerializer."""
+    flagged = post.flag in _FLAGGED
+    return {
+        "id": post.id,
+        "first_name": post.first_name,
+        "person_age": post.person_age,
+        "content": post.content,
+        "flag": post.flag,
+        "university": _str_or_none(post.university),
+        "created_at": iso_datetime(post.created_at),
+        "author": ctx.author(post.author),
+        "image": resolve_image_url(getattr(post, "image", None)),
+        "interaction_mode": "flag_vote" if flagged else "like_only",
+        "likes": 0 if flagged else post.like_count,
+        "red_votes": post.red_vote_count if flagged else 0,
+        "green_votes": post.green_vote_count if flagged else 0,
+        "views": post.views_count,
+        "hashtags": _hashtags(post),
+        "user_reaction": ctx.state.reaction(post.id) if ctx.authenticated and not flagged else None,
+        "user_flag_vote": ctx.state.flag_vote(post.id) if ctx.authenticated and flagged else None,
+        "saved": ctx.state.saved(post.id) if ctx.authenticated else False,
+        "image_url": post.image_url,
+    }
+
+
+def post_card(post, ctx):
+    """Same output as PostSerializer."""
+    card = post_preview_card(post, ctx)
+    card["replies_count"] = post.replies_count
+    card["vote_score"] = card["green_votes"] - card["red_votes"] if post.flag in _FLAGGED else card["likes"]
+    card["is_seen"] = bool(getattr(post, "_is_seen", False))
+    return card
+
+
+def reply_card(reply, ctx):
+    """Same output as ReplySerializer."""
+    return {
+        "id": reply.id,
+        "content": reply.content,
+        "image": reply.image_url or resolve_image_url(getattr(reply, "image", None)),
+        "created_at": iso_datetime(reply.created_at),
+        "author": ctx.author(reply.author),
+        "university": _str_or_none(reply.university),
+        "parent": reply.parent_id,
+        "thread": reply.thread_id,
+        "likes": reply.like_count,
+        "views": reply.views_count,
+        "hashtags": _hashtags(reply),
+        "user_reaction": ctx.state.reaction(reply.id) if ctx.authenticated else None,
+        "replies_count": reply.replies_count,
+    }
+
+
+# Compact rows for POST /sync/ (CounterSyncView): COUNTER_COLUMNS are read
+# with values_list(), counter_row() turns them into COUNTER_FIELDS tuples
+COUNTER_COLUMNS = ("id", "flag", "like_count", "red_vote_count", "green_vote_count", "replies_count", "views_count")
+COUNTER_FIELDS = ("id", "likes", "red_votes", "green_votes", "replies_count", "views",
+                  "user_reaction", "user_flag_vote", "saved")
+
+
+def counter_row(row, state):
+    """Same values as the matching card fields, for a COUNTER_COLUMNS row and the viewer's ViewerState."""
+    pid, flag, likes, red, green, replies, views = row
+    flagged = flag in _FLAGGED
+    return (
+        pid,
+        0 if flagged else likes,
+        red if flagged else 0,
+        green if flagged else 0,
+        replies,
+        views,
+        None if flagged else state.reaction(pid),
+        state.flag_vote(pid) if flagged else None,
+        state.saved(pid),
+    )
+
+
+def iter_cards(posts, request, card=post_card, viewer_state=None):
+    """
+    Like build_cards(), but yields the cards lazily (for StreamingJSONResponse).
+    Viewer state is still loaded up front, so consuming it runs no queries.
+    """
+    posts = list(posts)
+    ctx = CardContext(request, posts, viewer_state)
+    return (card(p, ctx) for p in posts)
+
+
+def build_cards(posts, request, card=post_card, viewer_state=None):
+    """Render `posts` with `card`, loading viewer state once for the page."""
+    return list(iter_cards(posts, request, card, viewer_state))
@@ -0,0 +1,185 @@
+# posts/counters.py
+"""
+Denormalized Post counters: how they are derived and how to check/repair them.
+
+Staleness guarantee
+-------------------
+Every counter below is updated by a receiver in posts/signals.py with a
+single ``UPDATE ... SET col = col +/- 1`` issued in the same transaction as
+the row that caused it (ATOMIC_REQUESTS is on). Once the request commits,
+the stored value is exact; readers never see a counter ahead of or behind
+its source rows.
+
+``views_count`` follows the same rule: single inserts go through the
+SeenPost/SeenReply post_save receivers and bulk inserts must go through
+``record_seen_posts()``, which bumps the counter and the daily rollup
+set-wise. With VIEW_BUFFER on, views skip the request entirely and are
+applied by ``manage.py flush_view_events`` (posts/view_buffer.py), so
+views_count trails SeenPost's source events by up to one flush interval.
+
+Every counter write also stamps ``Post.counters_updated_at`` (use
+``update_counters()``), which the delta-sync endpoint (``posts/sync/``)
+filters on to send clients only the posts whose numbers moved.
+
+The only way to drift is to write source rows without going through
+``Model.save()``/``Model.delete()`` or the helpers here:
+``QuerySet.update()``, raw SQL, or a bare ``bulk_create``.
+``counter_drift()`` finds such rows and ``rebuild_counters()``
+(``manage.py backfill_post_counters``) repairs them.
+"""
+
+from django.db import connection
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Post, PostFlagVote, PostViewDaily, SeenPost, SeenReply, VoteReaction,
+)
+from .seen_set import add_seen_on_commit
+
+
+def _count_subquery(qs, fk="post_id"):
+    """Correlated COUNT(*) over `qs` for the outer Post row, 0 when empty."""
+    subq = (qs.filter(**{fk: OuterRef("pk")})
+              .order_by()
+              .values(fk)
+              .annotate(c=Count("id"))
+              .values("c")[:1])
+    return Coalesce(Subquery(subq, output_field=IntegerField()), Value(0))
+
+
+def counter_sources():
+    """Map each denormalized Post column to an expression computing its true value."""
+    return {
+        "like_count": _count_subquery(VoteReaction.objects.filter(reaction="up")),
+        "replies_count": _count_subquery(Post.objects.all(), fk="parent_id"),
+        "red_vote_count": _count_subquery(PostFlagVote.objects.filter(vote="red")),
+        "green_vote_count": _count_subquery(PostFlagVote.objects.filter(vote="green")),
+        # A post is either top-level (SeenPost) or a reply (SeenReply); one side is always 0
+        "views_count": (_count_subquery(SeenPost.objects.all())
+                        + _count_subquery(SeenReply.objects.all(), fk="reply_id")),
+    }
+
+
+def update_counters(qs, **changes):
+    """`qs.update(**changes)` for counter columns, stamping counters_updated_at."""
+    return qs.update(**changes, counters_updated_at=timezone.now())
+
+
+def rebuild_counters(qs=None, fields=None):
+    """Recompute the counters for `qs` (default: all posts) in one UPDATE."""
+    qs = Post.objects.all() if qs is None else qs
+    sources = counter_sources()
+    if fields:
+        sources = {f: sources[f] for f in fields}
+    return update_counters(qs, **sources)
+
+
+def counter_drift(qs=None):
+    """
+    Return a list of (post_id, field, stored, actual) for every counter that
+    disagrees with its source rows. Empty list means consistent.
+    """
+    qs = Post.objects.all() if qs is None else qs
+    sources = counter_sources()
+    rows = (qs.order_by()
+              .annotate(**{f"_actual_{f}": expr for f, expr in sources.items()})
+              .values("id", *sources.keys(), *[f"_actual_{f}" for f in sources]))
+    drift = []
+    for row in rows:
+        for f in sources:
+            if row[f] != row[f"_actual_{f}"]:
+                drift.append((row["id"], f, row[f], row[f"_actual_{f}"]))
+    return drift
+
+
+# ---------- View counters ----------
+
+def bump_view_counters(post_ids, day=None, daily_model=PostViewDaily, daily_fk="post_id"):
+    """
+    Add one unique view to every post in `post_ids`: Post.views_count and the
+    `daily_model` rollup for `day`. Three statements regardless of batch size.
+    """
+    post_ids = list(set(post_ids))
+    if not post_ids:
+        return
+    day = day or timezone.now().date()
+
+    update_counters(Post.objects.filter(id__in=post_ids), views_count=F("views_count") + 1)
+    daily_model.objects.bulk_create(
+        [daily_model(**{daily_fk: pid, "day": day, "unique_count": 0}) for pid in post_ids],
+        ignore_conflicts=True,
+    )
+    daily_model.objects.filter(**{f"{daily_fk}__in": post_ids, "day": day}).update(
+        unique_count=F("unique_count") + 1
+    )
+
+
+def add_view_counts(counts):
+    """
+    Add `n` unique views for every ((post_id, day), n) in `counts` to
+    Post.views_count and PostViewDaily. One UPDATE per distinct delta, so a
+    large batch costs a handful of statements.
+    """
+    if not counts:
+        return
+    per_post = {}
+    for (pid, _), n in counts.items():
+        per_post[pid] = per_post.get(pid, 0) + n
+    by_delta = {}
+    for pid, n in per_post.items():
+        by_delta.setdefault(n, []).append(pid)
+    for n, ids in by_delta.items():
+        update_counters(Post.objects.filter(id__in=ids), views_count=F("views_count") + n)
+
+    PostViewDaily.objects.bulk_create(
+        [PostViewDaily(post_id=pid, day=day, unique_count=0) for pid, day in counts],
+        ignore_conflicts=True, batch_size=1000,
+    )
+    per_day = {}
+    for (pid, day), n in counts.items():
+        per_day.setdefault((day, n), []).append(pid)
+    for (day, n), ids in per_day.items():
+        PostViewDaily.objects.filter(post_id__in=ids, day=day).update(unique_count=F("unique_count") + n)
+
+
+def insert_seen_posts(user_id, post_ids):
+    """
+    Insert SeenPost rows for `user_id` and return the post ids this call
+    actually inserted. ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` leaves
+    out rows that already existed or that a concurrent transaction inserted
+    first, so two requests recording the same view can't both count it.
+    """
+    qn = connection.ops.quote_name
+    fields = [SeenPost._meta.get_field(name) for name in ("user", "post", "seen_at")]
+    seen_at = fields[2].get_db_prep_value(timezone.now(), connection)
+    ids = sorted(post_ids)
+    inserted = set()
+    with connection.cursor() as cursor:
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            cursor.execute(
+                f"INSERT INTO {qn(SeenPost._meta.db_table)} ({', '.join(qn(f.column) for f in fields)}) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(chunk))} "
+                f"ON CONFLICT DO NOTHING RETURNING {qn(fields[1].column)}",
+                [value for pid in chunk for value in (user_id, pid, seen_at)],
+            )
+            inserted.update(row[0] for row in cursor.fetchall())
+    return inserted
+
+
+def record_seen_posts(user, post_ids):
+    """
+    Insert SeenPost rows for `user` and bump view counters for the rows that
+    were actually inserted. Unknown post ids are ignored. Returns the set of
+    newly recorded post ids.
+    """
+    existing = set(Post.objects.filter(id__in=set(post_ids)).values_list("id", flat=True))
+    if not existing:
+        return set()
+    new_ids = insert_seen_posts(user.id, existing)
+    if new_ids:
+        bump_view_counters(new_ids)
+        add_seen_on_commit(user.id, new_ids)
+    return new_ids
@@ -1,9 +1,16 @@
 # posts/feed_engine.py
 
-from datetime import timedelta
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast, Greatest
 from django.utils import timezone
-from django.db.models import Count, Q, OuterRef, Subquery
-from posts.models import Post, SeenPost
+from core.timing import StageTimer
+from posts.models import Post
+from posts.selectors import hydrate_posts
 from users.models import UniversityFollow
 
 # ----- Tunables -----
@@ -14,175 +21,401 @@ ZERO_SLOPE = 0.01
 ZERO_CAP = 10.0
 
 
-def calculate_post_score(post, user, user_data):
+def calculate_post_score(post, user, user_data, now=None):
     """
     Updated scoring for new flag system:
     - Tea posts (no flag): scored by likes
     - Red/Green posts: scored by green_votes - red_votes
+
+    Reference implementation; score_posts_batch() must stay numerically identical.
+    The terms themselves live in explain_post_score().
+    """
+    return explain_post_score(post, user, user_data, now=now)['score']
+
+
+def explain_post_score(post, user, user_data, now=None):
+    """
+    calculate_post_score() broken into its components (staff debug output).
+    'score' is the components summed in order.
     """
-    comment_count = getattr(post, 'comment_count', 0) or 0
+    comment_count = getattr(post, 'replies_count', 0) or 0
     repost_count = getattr(post, 'repost_count', 0) or 0
-    views = getattr(post, 'views', 0) or 0
+    views = getattr(post, 'views_count', 0) or 0
 
     # Different engagement calculation based on post type
     if getattr(post, 'flag', None) in ('red', 'green'):
         # Flagged posts: use red/green votes
-        red_votes = getattr(post, 'red_votes', 0) or 0
-        green_votes = getattr(post, 'green_votes', 0) or 0
+        red_votes = getattr(post, 'red_vote_count', 0) or 0
+        green_votes = getattr(post, 'green_vote_count', 0) or 0
         vote_score = green_votes - red_votes
         engagement = green_votes + red_votes  # Total voting activity
     else:
         # Tea posts: use likes only
-        likes = getattr(post, 'upvotes', 0) or 0
-        vote_score = likes
-        engagement = likes
-
-    score = 0.0
-    
-    # Core engagement scoring
-    score += vote_score * 3.0
-    score += comment_count * 2.0
-    score += repost_count * 2.0
+        vote_score = engagement = getattr(post, 'like_count', 0) or 0
 
     # Engagement rate adjustment (Bayesian smoothing)
     total_engagement = engagement + 0.6 * comment_count + 0.8 * repost_count
     eng_rate = (total_engagement + ENG_PRIOR_VIEWS * ENG_BASELINE) / (max(1.0, views) + ENG_PRIOR_VIEWS)
-    score += 25.0 * (eng_rate - ENG_BASELINE)
 
     # Penalty for posts with many views but zero engagement
+    penalty = 0.0
     if total_engagement == 0 and views >= ZERO_START:
-        import math
         penalty = min(ZERO_CAP, ZERO_SLOPE * math.sqrt(max(0.0, views - ZERO_START)) * 100)
-        score -= penalty
 
-    # Time decay
-    hours_since = (timezone.now() - post.created_at).total_seconds() / 3600.0
-    score += 4.0 / (hours_since + 2.0) ** 0.5
+    hours_since = ((now or timezone.now()) - post.created_at).total_seconds() / 3600.0
 
     # University preferences
+    university_boost = 0.0
     if user and post.university_id == user.university_id:
-        score += 2.0
+        university_boost = 2.0
     elif user and post.university_id in user_data.get('followed_uni_ids', set()):
-        score += 1.5
+        university_boost = 1.5
 
     # Flag preference (if user has a preferred flag type)
+    flag_boost = 0.0
+    if user and user_data.get('preferred_flag_type') and getattr(post, 'flag', None) == user_data['preferred_flag_type']:
+        flag_boost = 1.0
+
+    parts = {
+        'vote_score': vote_score * 3.0,
+        'comments': comment_count * 2.0,
+        'reposts': repost_count * 2.0,
+        'eng_rate_term': 25.0 * (eng_rate - ENG_BASELINE),
+        'zero_penalty': -penalty,
+        'decay': 4.0 / math.sqrt(hours_since + 2.0),
+        'university_boost': university_boost,
+        'flag_boost': flag_boost,
+        'age_penalty': -100.0 if hours_since > 24 * 7 else 0.0,  # Older than 1 week
+    }
+    return {
+        **parts,
+        'eng_rate': eng_rate,
+        'hours_since': hours_since,
+        'views': views,
+        'score': sum(parts.values(), 0.0),
+    }
+
+
+def explain_posts(posts, user=None, user_data=None, now=None):
+    """
+    Attach explain_post_score() output as `score_explain` to each post, with
+    repost counts loaded for posts that were hydrated without them.
+    """
+    posts = list(posts)
+    missing = [p.id for p in posts if not hasattr(p, 'repost_count')]
+    if missing:
+        counts = dict(Post.objects.filter(id__in=missing).annotate(c=Count('reposts')).values_list('id', 'c'))
+        for p in posts:
+            if p.id in counts:
+                p.repost_count = counts[p.id]
+    if user_data is None:
+        user_data = build_user_data(user) if user else {}
+    for p in posts:
+        p.score_explain = explain_post_score(p, user, user_data, now=now)
+    return posts
+
+
+# ----- Vectorized scoring -----
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_ONE_US = timedelta(microseconds=1)
+
+
+def _epoch_us(created_at):
+    """Datetimes (aware) or a datetime64 array -> int64 microseconds since epoch."""
+    if isinstance(created_at, np.ndarray) and np.issubdtype(created_at.dtype, np.datetime64):
+        return created_at.astype("datetime64[us]").astype(np.int64)
+    return np.fromiter(((dt - _EPOCH) // _ONE_US for dt in created_at), dtype=np.int64)
+
+
+def engagement_components_batch(*, likes, red_votes, green_votes, comments, reposts, views, flag):
+    """
+    Time-independent score parts, one entry per post:
+    (engagement, engagement-rate term, zero-engagement penalty).
+    These only change when a post's counters change, so they can be stored
+    (see posts/candidate_pool.py) and combined with personalize_scores_batch().
+    """
+    flag = np.asarray(flag, dtype=object)
+    is_flagged = (flag == 'red') | (flag == 'green')
+    likes = np.asarray(likes, dtype=np.float64)
+    red = np.asarray(red_votes, dtype=np.float64)
+    green = np.asarray(green_votes, dtype=np.float64)
+    comments = np.asarray(comments, dtype=np.float64)
+    reposts = np.asarray(reposts, dtype=np.float64)
+    views = np.asarray(views, dtype=np.float64)
+
+    vote_score = np.where(is_flagged, green - red, likes)
+    engagement = np.where(is_flagged, green + red, likes)
+
+    engagement_score = vote_score * 3.0 + comments * 2.0 + reposts * 2.0
+
+    total_engagement = engagement + 0.6 * comments + 0.8 * reposts
+    eng_rate = (total_engagement + ENG_PRIOR_VIEWS * ENG_BASELINE) / (np.maximum(1.0, views) + ENG_PRIOR_VIEWS)
+    rate_term = 25.0 * (eng_rate - ENG_BASELINE)
+
+    zero_hit = (total_engagement == 0) & (views >= ZERO_START)
+    penalty = np.minimum(ZERO_CAP, ZERO_SLOPE * np.sqrt(np.maximum(0.0, views - ZERO_START)) * 100)
+    penalty = np.where(zero_hit, penalty, 0.0)
+
+    return engagement_score, rate_term, penalty
+
+
+def personalize_scores_batch(base, *, created_at, university_id, flag, user=None, user_data=None, now=None):
+    """
+    Add the request-time parts (time decay, own/followed university, preferred
+    flag, old-post penalty) to `base` = engagement + rate term - penalty.
+    """
+    user_data = user_data or {}
+    now = now or timezone.now()
+    score = np.array(base, dtype=np.float64)
+
+    delta_us = (now - _EPOCH) // _ONE_US - _epoch_us(created_at)
+    hours_since = delta_us.astype(np.float64) / 1e6 / 3600.0
+    score += 4.0 / np.sqrt(hours_since + 2.0)
+
     if user:
-        pref_flag = user_data.get('preferred_flag_type')
-        if pref_flag and getattr(post, 'flag', None) == pref_flag:
-            score += 1.0
+        uni = np.asarray(university_id, dtype=np.int64)
+        own = uni == user.university_id if user.university_id is not None else np.zeros(len(uni), dtype=bool)
+        followed_ids = [u for u in user_data.get('followed_uni_ids', ()) if u is not None]
+        followed = np.isin(uni, np.fromiter(followed_ids, dtype=np.int64, count=len(followed_ids)))
+        score += np.where(own, 2.0, np.where(followed, 1.5, 0.0))
 
-    # Penalize very old posts
-    if hours_since > 24 * 7:  # Older than 1 week
-        score -= 100.0
+        pref_flag = user_data.get('preferred_flag_type')
+        if pref_flag:
+            score += np.where(np.asarray(flag, dtype=object) == pref_flag, 1.0, 0.0)
 
+    score -= np.where(hours_since > 24 * 7, 100.0, 0.0)
     return score
 
 
+def score_posts_batch(*, likes, red_votes, green_votes, comments, reposts, views,
+                      created_at, university_id, flag, user=None, user_data=None, now=None):
+    """
+    Score many posts at once from column arrays (one entry per post).
+
+    Returns a float64 array equal, element for element, to calling
+    calculate_post_score() on each post with the same `now`: every operation
+    is applied in the same order and all inputs are exact in float64.
+    """
+    engagement_score, rate_term, penalty = engagement_components_batch(
+        likes=likes, red_votes=red_votes, green_votes=green_votes,
+        comments=comments, reposts=reposts, views=views, flag=flag,
+    )
+    return personalize_scores_batch(
+        engagement_score + rate_term - penalty,
+        created_at=created_at, university_id=university_id, flag=flag,
+        user=user, user_data=user_data, now=now,
+    )
+
+
+def top_k_indices(scores, k):
+    """
+    Indices of the `k` highest scores, best first, without sorting the whole
+    array: O(n) partition + O(k log k) sort of the winners. Ties keep input
+    order, so the result equals a stable full sort sliced to [:k].
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        kth = np.partition(scores, n - k)[n - k]  # k-th largest value
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        idx = np.concatenate((above, ties))
+    else:
+        idx = np.arange(n)
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+
+def post_columns(posts):
+    """Extract the score_posts_batch() columns from already-loaded Post objects."""
+    return {
+        'likes': [getattr(p, 'like_count', 0) or 0 for p in posts],
+        'red_votes': [getattr(p, 'red_vote_count', 0) or 0 for p in posts],
+        'green_votes': [getattr(p, 'green_vote_count', 0) or 0 for p in posts],
+        'comments': [getattr(p, 'replies_count', 0) or 0 for p in posts],
+        'reposts': [getattr(p, 'repost_count', 0) or 0 for p in posts],
+        'views': [getattr(p, 'views_count', 0) or 0 for p in posts],
+        'created_at': [p.created_at for p in posts],
+        'university_id': [p.university_id for p in posts],
+        'flag': [getattr(p, 'flag', None) for p in posts],
+    }
+
+
+def _default_user_data(user):
+    return {
+        "followed_uni_ids": set(
+            UniversityFollow.objects.filter(user=user).values_list("university_id", flat=True)
+        ) if user else set(),
+    }
+
+
 def rank_posts(posts, user=None, limit=50, user_data=None):
     """
     Rank posts using the updated scoring system
     """
     if user_data is None:
-        user_data = {
-            "followed_uni_ids": set(
-                UniversityFollow.objects.filter(user=user).values_list("university_id", flat=True)
-            ) if user else set(),
-        }
+        user_data = _default_user_data(user)
     
-    scored = []
     now = timezone.now()
-    
-    for post in posts:
-        # Check if post is actively suppressed
-        if getattr(post, "moderation_status", None) in (Post.MOD_SOFT, Post.MOD_ESC):
-            if not getattr(post, "moderation_until", None) or post.moderation_until > now:
-                scored.append((-1e9, post))  # Bury suppressed posts
-                continue
-        
-        score = calculate_post_score(post, user, user_data)
-        scored.append((score, post))
-    
-    # Sort by score (highest first)
-    scored.sort(key=lambda t: t[0], reverse=True)
-    
-    # Return top posts
-    return [post for _, post in scored[:limit]]
 
+    # Suppressed posts never enter the candidate set
+    candidates = [post for post in posts if getattr(post, "visible", True)]
+
+    scores = score_posts_batch(**post_columns(candidates), user=user, user_data=user_data, now=now)
+    return [candidates[i] for i in top_k_indices(scores, limit)]
+
+
+# ----- SQL coarse prefilter -----
+# Ranking reads only the best rows by a SQL upper bound on the score, then
+# scores that shortlist exactly. If the k-th exact score doesn't beat the
+# bound of everything left out, the shortlist grows, so results always equal
+# a full computation.
+
+# Bucket edges (hours) for the piecewise-constant decay bound
+_DECAY_EDGES_H = (0, 0.25, 0.5, 1, 2, 3, 4, 6, 8, 12, 16, 20, 24, 30, 36, 48, 60, 72, 96, 120, 144, 168)
+_BOUND_EPS = 1e-9  # SQL and numpy round differently
+
+
+def prefilter_cap():
+    return getattr(settings, 'FEED_PREFILTER_CAP', 300)
+
+
+def decay_bound_expression(now, field='created_at'):
+    """SQL upper bound on the time-decay term (age penalty ignored: it only lowers scores)."""
+    whens = [When(**{f'{field}__gt': now}, then=Value(1e9))]  # created after `now`: always shortlist
+    for lo, hi in zip(_DECAY_EDGES_H, _DECAY_EDGES_H[1:]):
+        whens.append(When(**{f'{field}__gt': now - timedelta(hours=hi)}, then=Value(4.0 / math.sqrt(lo + 2.0))))
+    return Case(*whens, default=Value(4.0 / math.sqrt(_DECAY_EDGES_H[-1] + 2.0)), output_field=FloatField())
+
+
+def boost_expression(user, user_data):
+    """SQL equivalent of the own/followed university and preferred flag boosts."""
+    if not user:
+        return Value(0.0, output_field=FloatField())
+    expr = Case(
+        When(university_id=user.university_id, then=Value(2.0)),
+        When(university_id__in=[u for u in user_data.get('followed_uni_ids', ()) if u is not None], then=Value(1.5)),
+        default=Value(0.0), output_field=FloatField(),
+    )
+    pref_flag = user_data.get('preferred_flag_type')
+    if pref_flag:
+        expr = expr + Case(When(flag=pref_flag, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+    return expr
+
+
+def engagement_bound_expression():
+    """
+    SQL engagement + engagement-rate term over the stored Post counters and
+    an annotated `repost_count`. The zero-engagement penalty is left out, so
+    this is an upper bound on engagement + rate - penalty.
+    """
+    def num(name):
+        return Cast(F(name), FloatField())
+
+    flagged = When(flag__in=['red', 'green'], then=Value(1.0))
+    is_flagged = Case(flagged, default=Value(0.0), output_field=FloatField())
+    likes = (1.0 - is_flagged) * num('like_count')
+    vote = is_flagged * (num('green_vote_count') - num('red_vote_count')) + likes
+    engagement = is_flagged * (num('green_vote_count') + num('red_vote_count')) + likes
+    total = engagement + 0.6 * num('replies_count') + 0.8 * num('repost_count')
+    rate = (total + ENG_PRIOR_VIEWS * ENG_BASELINE) / (Greatest(num('views_count'), Value(1.0)) + ENG_PRIOR_VIEWS)
+    return vote * 3.0 + num('replies_count') * 2.0 + num('repost_count') * 2.0 + 25.0 * (rate - ENG_BASELINE)
+
+
+def prefiltered_top_k(qs, bound, columns, score_rows, limit, cap=None, keep=None):
+    """
+    Best `limit` rows of `qs` (tuples of `columns`) by `score_rows(rows)`,
+    reading only the top rows by the SQL upper bound `bound`. `keep(rows)`
+    optionally drops rows in memory before scoring. Ties keep the full
+    computation's order, newest first (the first column must be the primary
+    key; columns must include 'created_at').
+    """
+    cap = max(cap or prefilter_cap(), limit)
+    qs = qs.annotate(_bound=bound).order_by('-_bound', '-created_at', '-pk')
+    i_created = columns.index('created_at')
+    while True:
+        fetched = list(qs.values_list(*columns, '_bound')[:cap])
+        rows = sorted((r[:-1] for r in fetched), key=lambda r: (r[i_created], r[0]), reverse=True)
+        if keep is not None:
+            rows = keep(rows)
+        scores = score_rows(rows) if rows else np.empty(0)
+        order = top_k_indices(scores, limit)
+        # Everything past the shortlist scores at most its lowest bound
+        if len(fetched) < cap or (len(order) == limit and scores[order[-1]] > fetched[-1][-1] + _BOUND_EPS):
+            return [rows[i] for i in order]
+        cap *= 4
+
+
+_POST_SIGNAL_COLUMNS = ['id', 'like_count', 'red_vote_count', 'green_vote_count', 'replies_count',
+                        'repost_count', 'views_count', 'created_at', 'university_id', 'flag']
 
-def get_for_you_feed(user, seen_ids=None, limit=20):
+
+def rank_post_ids(qs, user=None, limit=50, user_data=None, now=None, cap=None):
     """
-    Generate personalized For You feed with updated scoring
+    Id-and-signals phase of a ranked fetch: shortlist `qs` in SQL with a
+    coarse score bound (prefilter_cap() rows, FEED_PREFILTER_CAP), score the
+    shortlist exactly from narrow values_list() rows and return the best
+    `limit` post ids. Filter out suppressed posts in `qs`; load the winners
+    with selectors.hydrate_posts().
     """
+    if user_data is None:
+        user_data = _default_user_data(user)
+    now = now or timezone.now()
+
+    def score_rows(rows):
+        cols = list(zip(*rows))
+        return score_posts_batch(
+            likes=cols[1], red_votes=cols[2], green_votes=cols[3], comments=cols[4], reposts=cols[5],
+            views=cols[6], created_at=cols[7], university_id=cols[8], flag=cols[9],
+            user=user, user_data=user_data, now=now,
+        )
+
+    bound = engagement_bound_expression() + decay_bound_expression(now) + boost_expression(user, user_data)
+    rows = prefiltered_top_k(qs.annotate(repost_count=Count('reposts')), bound, _POST_SIGNAL_COLUMNS,
+                             score_rows, limit, cap=cap)
+    return [r[0] for r in rows]
+
+
+def build_user_data(user):
+    """Per-user inputs to the personalization boosts (followed + own university, flag preference)."""
     followed_uni_ids = set(
         UniversityFollow.objects.filter(user=user).values_list('university_id', flat=True)
     )
-    followed_uni_ids.add(user.university_id)
+    if user.university_id is not None:  # soft-deleted users have none
+        followed_uni_ids.add(user.university_id)
 
-    user_data = {
+    return {
         'followed_uni_ids': followed_uni_ids,
         'preferred_flag_type': getattr(user, 'preferred_flag_type', None),
     }
 
-    # Look at posts from last 3 days
-    days_back = 3
-    qs = Post.objects.filter(
-        created_at__gte=timezone.now() - timedelta(days=days_back),
-        parent__isnull=True  # Only top-level posts
-    )
-    
-    if seen_ids:
-        qs = qs.exclude(id__in=seen_ids)
 
-    # Exclude actively suppressed posts
+def get_for_you_feed(user, seen_ids=None, limit=20, timer=None, explain=False):
+    """
+    Generate personalized For You feed with updated scoring.
+    `timer` (core.timing.StageTimer) records rank/hydrate stages; `explain`
+    attaches score components to each post as `score_explain`.
+    """
+    timer = timer or StageTimer()
+    user_data = build_user_data(user)
+
+    # Rank from the precomputed candidate pool (last 3 days, suppressed posts
+    # already excluded), then load full objects only for the winners
+    from .candidate_pool import ranked_candidate_ids
     now = timezone.now()
-    qs = qs.exclude(
-        Q(moderation_status__in=[Post.MOD_SOFT, Post.MOD_ESC]) &
-        (Q(moderation_until__isnull=True) | Q(moderation_until__gt=now))
-    )
+    with timer.stage('rank'):
+        ids = ranked_candidate_ids(user, user_data, limit, seen_ids=seen_ids, now=now)
+    with timer.stage('hydrate'):
+        result = hydrate_posts(ids)
+    if explain:
+        explain_posts(result, user, user_data, now=now)
 
-    # Views via subquery
-    views_subq = (SeenPost.objects
-                  .filter(post_id=OuterRef('pk'))
-                  .values('post_id')
-                  .annotate(c=Count('id'))
-                  .values('c')[:1])
-
-    # Annotate with engagement metrics for both post types
-    qs = qs.annotate(
-        # Like-based metrics (for Tea posts)
-        upvotes=Count('reactions', filter=Q(reactions__reaction='up'), distinct=True),
-        
-        # Flag-based metrics (for Red/Green posts)
-        red_votes=Count('flag_votes', filter=Q(flag_votes__vote='red'), distinct=True),
-        green_votes=Count('flag_votes', filter=Q(flag_votes__vote='green'), distinct=True),
-        
-        # Common metrics
-        repost_count=Count('reposts', distinct=True),
-        comment_count=Count('replies', distinct=True),
-        views=Subquery(views_subq),
-    ).select_related('author', 'university').prefetch_related('hashtags')
-
-    posts = list(qs)
-    
-    # Calculate vote scores for each post based on type
-    for post in posts:
+    # Calculate vote scores for each returned post based on type
+    for post in result:
         if post.flag in ('red', 'green'):
-            post.vote_score = (getattr(post, 'green_votes', 0) or 0) - (getattr(post, 'red_votes', 0) or 0)
+            post.vote_score = post.green_vote_count - post.red_vote_count
         else:
-            post.vote_score = getattr(post, 'upvotes', 0) or 0
-
-    # Score and rank posts
-    scored = [(calculate_post_score(post, user, user_data), post) for post in posts]
-    scored.sort(key=lambda t: t[0], reverse=True)
-
-    # Deduplicate and return
-    result, seen = [], set()
-    for _, post in scored:
-        if post.id in seen:
-            continue
-        result.append(post)
-        seen.add(post.id)
-        if len(result) >= limit:
-            break
-    
+            post.vote_score = post.like_count
+
     return result
\ No newline at end of file
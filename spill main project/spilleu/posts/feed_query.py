@@ -0,0 +1,210 @@
+# posts/feed_query.py
+"""
+Query-param parsing and row fetching for GET /feed/, shared by FeedView and
+AsyncFeedView (posts/views_async.py).
+
+Every method that touches the database is plain blocking ORM code with no
+dependency on the others beyond its arguments, so the async view can run
+independent steps (unseen scan, seen backfill, hydration, viewer state)
+concurrently in worker threads while the sync view calls them in sequence.
+"""
+
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from core.timing import StageTimer
+from users.models import UniversityFollow
+from .feed_snapshots import create_snapshot, load_snapshot
+from .models import Post
+from .person_search import person_filter
+from .selectors import scope_filter
+from .uni_buffers import recent_rows
+from .utils import apply_keyset, decode_cursor, encode_cursor
+
+SCOPES = ('for_you', 'following', 'my_uni')
+
+
+def _parse_datetime(value, default=None):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except Exception:
+        return default
+
+
+class FeedRequest:
+    """The feed's query params and cursor, validated."""
+
+    def __init__(self, params, now):
+        self.scope = params.get('scope', 'for_you')
+        self.page_size = int(params.get('page_size', 20))
+        self.name = (params.get("name") or "").strip()
+        self.uni_id = params.get("university_id")
+        self.age = params.get("age")
+        self.now = now
+        self.error = None
+        if self.scope not in SCOPES:
+            self.error = 'Invalid scope. Must be: for_you, following, or my_uni'
+
+        self.cursor = {
+            "mode": "unseen",
+            "last_created_at": None,
+            "last_id": None,
+            "refresh_watermark": now.isoformat(),
+        }
+        token = params.get('cursor')
+        if token:
+            self.cursor = decode_cursor(token)
+
+        # Ranked For You: opt-in via ?ranked=1 (or a ranked cursor); person-search
+        # filters keep the chronological path. Snapshots live in the cache, so
+        # without a shared one (CACHE_SHARED) the next page could land on a
+        # worker that never saw it: serve the chronological feed instead.
+        ranked = (params.get("ranked") or "").strip().lower() in {"1", "true", "yes"}
+        self.ranked = (self.scope == 'for_you' and not self.has_filters
+                       and getattr(settings, "CACHE_SHARED", False)
+                       and (ranked or self.cursor.get("mode") == "ranked"))
+
+    @property
+    def has_filters(self):
+        return bool(self.name or self.uni_id or self.age)
+
+    def filters(self):
+        return {"name": self.name, "university_id": self.uni_id, "age": self.age}
+
+
+def ranked_page_ids(user, cursor, page_size, now, timer=None):
+    """
+    (page_ids, next_cursor) for a ranked page. The first page ranks once into
+    a cached snapshot (posts/feed_snapshots.py); later pages slice it by the
+    cursor offset. An expired or foreign snapshot is re-ranked but the cursor
+    offset is kept, so the client moves on instead of getting page 1 again;
+    posts already committed as seen drop out of the new ranking. `timer`
+    (core.timing.StageTimer) gets "query" and, when ranking ran, "rank" laps.
+    """
+    timer = timer or StageTimer()
+    snapshot_id = cursor.get("snapshot") if cursor.get("mode") == "ranked" else None
+    offset = int(cursor.get("offset") or 0)
+
+    ids = load_snapshot(snapshot_id, user)
+    timer.lap("query")
+    if ids is None:
+        snapshot_id, ids = create_snapshot(user, now=now)
+        timer.lap("rank")
+
+    page_ids = ids[offset:offset + page_size]
+    next_offset = offset + len(page_ids)
+    next_cursor = None
+    if next_offset < len(ids):
+        next_cursor = encode_cursor({
+            "mode": "ranked",
+            "snapshot": snapshot_id,
+            "offset": next_offset,
+            "refresh_watermark": cursor.get("refresh_watermark", now.isoformat()),
+        })
+    return page_ids, next_cursor
+
+
+class ChronologicalFeed:
+    """
+    Keyset walk over the visible top-level posts of one scope, newest first.
+    Rows are (post_id, created_at, is_seen) tuples; full objects are hydrated
+    for the page afterwards (selectors.hydrate_posts).
+    """
+
+    def __init__(self, user, request):
+        self.user = user
+        self.request = request
+        self.page_size = request.page_size
+        cursor = request.cursor
+        self.mode = cursor.get("mode", "unseen")
+        self.refresh_cutoff = _parse_datetime(cursor.get("refresh_watermark", request.now.isoformat()),
+                                              default=request.now)
+
+        self.last_created_at = None
+        self.last_id = cursor.get("last_id")
+        if cursor.get("last_created_at") and self.last_id:
+            self.last_created_at = _parse_datetime(cursor["last_created_at"])
+            if self.last_created_at is None:
+                self.last_id = None
+
+        base_qs = Post.objects.filter(visible=True, parent__isnull=True, created_at__lte=self.refresh_cutoff)
+        if request.name:
+            base_qs = person_filter(base_qs, request.name)
+        if request.uni_id and str(request.uni_id).isdigit():
+            base_qs = base_qs.filter(university_id=int(request.uni_id))
+        if request.age and str(request.age).isdigit():
+            base_qs = base_qs.filter(person_age=int(request.age))
+        self.base_qs = scope_filter(base_qs, request.scope, user)
+        # Seen posts are told apart in memory via the cached seen-set
+        # (posts/seen_set.py), not with an IN-subquery over every SeenPost row
+        self.seen_qs = self.base_qs.filter(seenpost__user=user)
+
+    @cached_property
+    def buffer_uni_ids(self):
+        """
+        following/my_uni merge the per-university recent-post buffers
+        (posts/uni_buffers.py) and only query when a cursor runs past them.
+        None when the stream has to come from the database.
+        """
+        if self.request.scope not in ('following', 'my_uni') or self.request.has_filters:
+            return None
+        if self.request.scope == 'following':
+            return list(UniversityFollow.objects.filter(user=self.user).values_list('university_id', flat=True))
+        return [self.user.university_id] if self.user.university_id else []
+
+    @staticmethod
+    def page_rows(qs, after_created_at, after_id, limit):
+        return list(apply_keyset(qs, after_created_at, after_id).values_list('id', 'created_at')[:limit])
+
+    def stream_rows(self, after_created_at, after_id, limit):
+        if self.buffer_uni_ids is not None:
+            rows = recent_rows(self.buffer_uni_ids, after_created_at, after_id, limit, cutoff=self.refresh_cutoff)
+            if rows is not None:
+                return rows
+        return self.page_rows(self.base_qs, after_created_at, after_id, limit)
+
+    def scan_unseen(self, seen_set, max_chunks):
+        """
+        Walk the stream in keyset chunks and drop seen posts. Returns
+        (rows, exhausted, position): `exhausted` when the stream ran out before
+        the page filled (the caller backfills with seen posts); otherwise
+        `position` is where the scan stopped — a heavy reader can hit
+        `max_chunks` before filling the page, and the cursor resumes there.
+        """
+        rows = []
+        chunk = max(self.page_size * 2, 40)
+        scan_at, scan_id = self.last_created_at, self.last_id
+        for _ in range(max_chunks):
+            batch = self.stream_rows(scan_at, scan_id, chunk)
+            seen_ids = seen_set.seen_among(batch)
+            for pid, created_at in batch:
+                scan_at, scan_id = created_at, pid
+                if pid not in seen_ids:
+                    rows.append((pid, created_at, False))
+                    if len(rows) == self.page_size:
+                        return rows, False, (scan_at, scan_id)
+            if len(batch) < chunk:
+                return rows, True, None
+        return rows, False, (scan_at, scan_id) if scan_id is not None else None
+
+    def seen_rows(self, after_created_at, after_id, limit):
+        return [(pid, created_at, True)
+                for pid, created_at in self.page_rows(self.seen_qs, after_created_at, after_id, limit)]
+
+    def seen_page(self):
+        """The next page in seen mode."""
+        return self.seen_rows(self.last_created_at, self.last_id, self.page_size)
+
+    def next_cursor(self, rows, position, mode):
+        if position is None and rows:
+            position = (rows[-1][1], rows[-1][0])
+        if not position:
+            return None
+        return encode_cursor({
+            "mode": mode,
+            "last_created_at": position[0].isoformat(),
+            "last_id": position[1],
+            "refresh_watermark": self.refresh_cutoff.isoformat(),
+        })
@@ -0,0 +1,56 @@
+# posts/feed_snapshots.py
+"""
+Ranked For You snapshots.
+
+A ranked feed can't be paginated by (created_at, id), and re-ranking on every
+page would both cost a full scoring pass and reshuffle posts between pages.
+Instead the first ranked page ranks the candidate pool once and stores the
+ordered post ids in the cache under a short-lived snapshot id; later pages
+only slice that list by the offset carried in the cursor and hydrate the page
+(selectors.hydrate_posts).
+
+Snapshots belong to the user who created them and expire after
+FEED_SNAPSHOT_TTL seconds. An expired or foreign snapshot is treated as
+missing and the caller ranks a fresh one, keeping the cursor's offset.
+Ranked mode is only offered with CACHE_SHARED (see feed_query.FeedRequest).
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .candidate_pool import ranked_candidate_ids
+from .feed_engine import build_user_data
+from .seen_set import load_seen_set
+
+SNAPSHOT_KEY = "feed:snapshot:{}"
+
+
+def _ttl():
+    return getattr(settings, "FEED_SNAPSHOT_TTL", 900)
+
+
+def create_snapshot(user, now=None):
+    """Rank the unseen pool for `user` and cache it. Returns (snapshot_id, ids)."""
+    ids = ranked_candidate_ids(
+        user,
+        build_user_data(user),
+        getattr(settings, "FEED_SNAPSHOT_SIZE", 500),
+        seen_ids=load_seen_set(user, now=now),
+        now=now,
+    )
+    snapshot_id = uuid.uuid4().hex
+    cache.set(SNAPSHOT_KEY.format(snapshot_id), {"user_id": user.id, "ids": ids}, _ttl())
+    return snapshot_id, ids
+
+
+def load_snapshot(snapshot_id, user):
+    """The cached id list for `snapshot_id`, or None if expired or not owned by `user`."""
+    if not snapshot_id:
+        return None
+    data = cache.get(SNAPSHOT_KEY.format(snapshot_id))
+    if not data or data.get("user_id") != user.id:
+        return None
+    return data["ids"]
+
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.counters import counter_drift, rebuild_counters
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Backfill or rebuild the denormalized counter columns on Post (likes, replies, views, red/green flag votes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Posts updated per UPDATE statement (default 5000).")
+        parser.add_argument("--check", action="store_true", help="Only report drifted counters; exit non-zero if any.")
+
+    def handle(self, *args, **opts):
+        batch_size = max(1, opts["batch_size"])
+
+        bounds = Post.objects.order_by("id").values_list("id", flat=True)
+        first, last = bounds.first(), bounds.last()
+        if first is None:
+            self.stdout.write(self.style.SUCCESS("No posts to backfill."))
+            return
+
+        if opts["check"]:
+            drift = []
+            for start in range(first, last + 1, batch_size):
+                drift += counter_drift(Post.objects.filter(id__gte=start, id__lt=start + batch_size))
+            for post_id, field, stored, actual in drift[:50]:
+                self.stdout.write(f"Post {post_id}: {field} stored={stored} actual={actual}")
+            if drift:
+                raise CommandError(f"{len(drift)} drifted counters found.")
+            self.stdout.write(self.style.SUCCESS("Post counters are consistent."))
+            return
+
+        self.stdout.write(self.style.NOTICE(f"Backfilling post counters for ids {first}..{last} ..."))
+
+        updated = 0
+        for start in range(first, last + 1, batch_size):
+            updated += rebuild_counters(Post.objects.filter(id__gte=start, id__lt=start + batch_size))
+
+        self.stdout.write(self.style.SUCCESS(f"Post counters backfilled for {updated} posts."))
@@ -0,0 +1,100 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from core.streaming import iter_json
+from posts.cards import build_cards, iter_cards, post_card
+from posts.models import Hashtag, Post
+from posts.selectors import hydrate_posts
+from posts.serializers import PostSerializer
+from posts.viewer_state import viewer_context
+from users.models import City, Country, University, User
+
+
+class Command(BaseCommand):
+    help = ("Benchmark feed card rendering: PostSerializer vs the plain-dict card builder (items/s), "
+            "then JSONRenderer vs streamed JSON (time to first byte, peak memory)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=200, help="Posts to render (default 200).")
+        parser.add_argument("--repeat", type=int, default=5, help="Best-of-N timing (default 5).")
+        parser.add_argument("--synthetic", action="store_true",
+                            help="Create throwaway posts inside a transaction that is rolled back.")
+
+    def _best(self, fn, repeat):
+        best = float("inf")
+        result = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - t0)
+        return best, result
+
+    def _make_posts(self, n):
+        country = Country.objects.create(name="Benchland")
+        uni = University.objects.create(name="Bench University", city=City.objects.create(name="Bench", country=country))
+        authors = [User.objects.create_user(f"bench{i}@example.com", "pass12345", university=uni) for i in range(10)]
+        tags = [Hashtag.objects.create(name=f"benchtag{i}") for i in range(3)]
+        for i in range(n):
+            post = Post.objects.create(
+                author=authors[i % len(authors)], university=uni, first_name="alex",
+                flag=(None, "red", "green")[i % 3], content="benchmark post content " * 3,
+            )
+            post.hashtags.set(tags[: i % 4])
+
+    def _measure_body(self, chunks):
+        """(seconds to the first chunk, total seconds, peak traced bytes) for producing a response body."""
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        first = None
+        for _ in chunks():
+            if first is None:
+                first = time.perf_counter() - t0
+        total = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return first, total, peak
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            if opts["synthetic"]:
+                self._make_posts(opts["count"])
+
+            ids = list(Post.objects.filter(parent__isnull=True).order_by("-created_at")
+                       .values_list("id", flat=True)[:opts["count"]])
+            posts = hydrate_posts(ids)
+            if not posts:
+                self.stdout.write(self.style.WARNING("No posts to render; pass --synthetic."))
+                return
+
+            request = RequestFactory().get("/")
+            request.user = User.objects.filter(id__in={p.author_id for p in posts}).first()
+            render = JSONRenderer().render
+
+            # Both sides get preloaded viewer state, so this measures field machinery only
+            t_ser, by_ser = self._best(
+                lambda: PostSerializer(posts, many=True, context=viewer_context(request, posts)).data, opts["repeat"])
+            t_card, by_card = self._best(lambda: build_cards(posts, request, post_card), opts["repeat"])
+
+            n = len(posts)
+            self.stdout.write(
+                f"n={n:>6}  serializer {n / t_ser:>10,.0f} items/s  "
+                f"cards {n / t_card:>10,.0f} items/s  "
+                f"speedup {t_ser / t_card:>5.1f}x  identical={render(by_ser) == render(by_card)}"
+            )
+
+            # Whole-page render vs core.streaming, as the feed builds its body
+            for label, chunks in (
+                ("JSONRenderer", lambda: [render({"items": build_cards(posts, request), "next_cursor": None})]),
+                ("streamed", lambda: iter_json({"items": iter_cards(posts, request), "next_cursor": None})),
+            ):
+                first, total, peak = self._measure_body(chunks)
+                self.stdout.write(f"n={n:>6}  {label:<12} first byte {first * 1e3:>8.2f} ms  "
+                                  f"total {total * 1e3:>8.2f} ms  peak {peak / 1024:>8,.0f} KiB")
+
+            if opts["synthetic"]:
+                transaction.set_rollback(True)
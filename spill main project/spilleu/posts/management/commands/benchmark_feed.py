@@ -0,0 +1,97 @@
+import heapq
+import random
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.feed_engine import calculate_post_score, post_columns, score_posts_batch, top_k_indices
+
+
+def synthetic_posts(n, now, seed=0):
+    """Post-like objects with realistic counter distributions (no DB needed)."""
+    rng = random.Random(seed)
+    flags = (None, None, "red", "green")
+    posts = []
+    for i in range(n):
+        views = int(rng.paretovariate(1.2) * 20) if rng.random() > 0.1 else 0
+        engaged = rng.random() > 0.3
+        posts.append(SimpleNamespace(
+            id=i + 1,
+            flag=rng.choice(flags),
+            like_count=rng.randint(0, 50) if engaged else 0,
+            red_vote_count=rng.randint(0, 40) if engaged else 0,
+            green_vote_count=rng.randint(0, 40) if engaged else 0,
+            replies_count=rng.randint(0, 20) if engaged else 0,
+            repost_count=0,
+            views_count=views,
+            created_at=now - timedelta(seconds=rng.randint(0, 8 * 24 * 3600), microseconds=rng.randint(0, 999999)),
+            university_id=rng.randint(1, 40),
+        ))
+    return posts
+
+
+class Command(BaseCommand):
+    help = "Benchmark feed scoring (scalar vs vectorized) and top-k selection (full sort vs heap vs argpartition)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000], help="Candidate counts to benchmark.")
+        parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timing (default 3).")
+        parser.add_argument("--limit", type=int, default=20, help="Top-k size for the selection benchmark (default 20).")
+
+    def _best(self, fn, repeat):
+        best = float("inf")
+        result = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - t0)
+        return best, result
+
+    def handle(self, *args, **opts):
+        now = timezone.now()
+        user = SimpleNamespace(university_id=1)
+        user_data = {"followed_uni_ids": {2, 3, 5, 8}, "preferred_flag_type": "green"}
+
+        for n in opts["sizes"]:
+            posts = synthetic_posts(n, now)
+            columns = post_columns(posts)
+
+            t_scalar, scalar = self._best(
+                lambda: [calculate_post_score(p, user, user_data, now=now) for p in posts], opts["repeat"])
+            t_batch, batch = self._best(
+                lambda: score_posts_batch(**columns, user=user, user_data=user_data, now=now), opts["repeat"])
+            t_batch_e2e, _ = self._best(
+                lambda: score_posts_batch(**post_columns(posts), user=user, user_data=user_data, now=now), opts["repeat"])
+
+            identical = np.array_equal(np.asarray(scalar), batch)
+            self.stdout.write(
+                f"n={n:>7}  scalar {n / t_scalar:>12,.0f} posts/s  "
+                f"batch {n / t_batch:>12,.0f} posts/s  "
+                f"batch+extract {n / t_batch_e2e:>12,.0f} posts/s  "
+                f"identical={identical}"
+            )
+
+            # Top-k selection over the same scores
+            k = opts["limit"]
+            scores = batch
+            score_list = scores.tolist()
+            t_sort, by_sort = self._best(
+                lambda: [p for _, p in sorted(zip(score_list, posts), key=lambda t: t[0], reverse=True)[:k]],
+                opts["repeat"])
+            t_heap, by_heap = self._best(
+                lambda: [p for _, p in heapq.nlargest(k, zip(score_list, posts), key=lambda t: t[0])],
+                opts["repeat"])
+            t_part, by_part = self._best(
+                lambda: [posts[i] for i in top_k_indices(scores, k)], opts["repeat"])
+
+            same = [p.id for p in by_sort] == [p.id for p in by_heap] == [p.id for p in by_part]
+            self.stdout.write(
+                f"n={n:>7}  top-{k}: full sort {t_sort * 1e3:>8.2f} ms  "
+                f"heapq {t_heap * 1e3:>8.2f} ms  "
+                f"argpartition {t_part * 1e3:>8.2f} ms  "
+                f"same_result={same}"
+            )
@@ -0,0 +1,130 @@
+import asyncio
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from posts.models import Post, SeenPost
+from users.models import City, Country, University, User
+
+
+class Command(BaseCommand):
+    help = ("Load-test GET /feed/: FeedView on a WSGI thread pool vs AsyncFeedView on one ASGI event loop, "
+            "with the same concurrency. Reports p50/p99 request latency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=2_000, help="Synthetic top-level posts (default 2000).")
+        parser.add_argument("--viewers", type=int, default=40, help="Viewers, one feed session each (default 40).")
+        parser.add_argument("--pages", type=int, default=4, help="Pages walked per session (default 4).")
+        parser.add_argument("--page-size", type=int, default=20, help="Feed page size (default 20).")
+        parser.add_argument("--concurrency", type=int, default=8, help="Sessions in flight at once (default 8).")
+        parser.add_argument("--scope", default="for_you", choices=("for_you", "following", "my_uni"))
+        parser.add_argument("--rtt", type=float, default=0.0,
+                            help="Simulated network round trip per query in ms, e.g. 1 for a remote PostgreSQL "
+                                 "(default 0: local SQLite has no I/O wait to overlap).")
+
+    def _insert(self, opts):
+        # Committed, not rolled back: the async view reads on worker-thread connections
+        rng = random.Random(1)
+        now = timezone.now()
+        country = Country.objects.create(name="Benchland")
+        city = City.objects.create(name="Bench", country=country)
+        unis = University.objects.bulk_create(
+            [University(name=f"Bench University {i}", city=city) for i in range(5)])
+        users = [User.objects.create_user(f"bench{i}@example.com", "pass12345", university=unis[i % len(unis)])
+                 for i in range(opts["viewers"])]
+        posts = Post.objects.bulk_create([
+            Post(author=rng.choice(users), university=rng.choice(unis), first_name="alex",
+                 flag=rng.choice((None, "red", "green")), content="benchmark post")
+            for _ in range(opts["posts"])], batch_size=1000)
+        for p in posts:
+            p.created_at = now - timedelta(seconds=rng.randint(0, 2 * 24 * 3600))
+        Post.objects.bulk_update(posts, ["created_at"], batch_size=1000)
+
+        # Heavy readers: most of the stream is seen, so unseen pages run out
+        # early and the seen backfill is on the hot path
+        SeenPost.objects.bulk_create([
+            SeenPost(user=u, post=p) for u in users for p in posts if rng.random() < 0.9], batch_size=5000)
+        return country, users
+
+    def _add_rtt(self, conn, seconds):
+        def delayed(execute, sql, params, many, context):
+            time.sleep(seconds)
+            return execute(sql, params, many, context)
+        conn.execute_wrappers.append(delayed)
+
+    def _session_params(self, opts):
+        return {"scope": opts["scope"], "page_size": opts["page_size"]}
+
+    def _run_sync(self, url, sessions, opts):
+        def session(headers):
+            client, params, timings = Client(), self._session_params(opts), []
+            try:
+                for _ in range(opts["pages"]):
+                    t0 = time.perf_counter()
+                    resp = client.get(url, params, headers=headers)
+                    timings.append(time.perf_counter() - t0)
+                    params["cursor"] = resp.json()["next_cursor"]
+                    if not params["cursor"]:
+                        break
+            finally:
+                close_old_connections()
+            return timings
+
+        with ThreadPoolExecutor(opts["concurrency"]) as pool:
+            return [t for timings in pool.map(session, sessions) for t in timings]
+
+    def _run_async(self, url, sessions, opts):
+        async def session(headers, slots):
+            client, params, timings = AsyncClient(), self._session_params(opts), []
+            async with slots:
+                for _ in range(opts["pages"]):
+                    t0 = time.perf_counter()
+                    resp = await client.get(url, params, headers=headers)
+                    timings.append(time.perf_counter() - t0)
+                    params["cursor"] = resp.json()["next_cursor"]
+                    if not params["cursor"]:
+                        break
+            return timings
+
+        async def run():
+            slots = asyncio.Semaphore(opts["concurrency"])
+            results = await asyncio.gather(*(session(headers, slots) for headers in sessions))
+            return [t for timings in results for t in timings]
+
+        return asyncio.run(run())
+
+    def _report(self, label, timings, elapsed):
+        timings = sorted(timings)
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(f"{label:<24} {len(timings):>5} req  {len(timings) / elapsed:>8,.1f} req/s  "
+                          f"p50 {statistics.median(timings) * 1e3:>8.2f} ms  p99 {p99 * 1e3:>8.2f} ms")
+
+    def handle(self, *args, **opts):
+        country, users = self._insert(opts)
+        if opts["rtt"]:
+            rtt = opts["rtt"] / 1e3
+            self._add_rtt(connection, rtt)
+            connection_created.connect(lambda connection, **kw: self._add_rtt(connection, rtt), weak=False)
+        try:
+            sessions = [{"Authorization": f"Bearer {RefreshToken.for_user(u).access_token}"} for u in users]
+            with override_settings(ALLOWED_HOSTS=["testserver"], SECURE_SSL_REDIRECT=False):
+                for label, url, run in (("FeedView (WSGI)", reverse("feed"), self._run_sync),
+                                        ("AsyncFeedView (ASGI)", reverse("feed-async"), self._run_async)):
+                    cache.clear()  # cold seen-sets, buffers and throttle counters for each run
+                    t0 = time.perf_counter()
+                    timings = run(url, sessions, opts)
+                    self._report(label, timings, time.perf_counter() - t0)
+        finally:
+            User.objects.filter(id__in=[u.id for u in users]).delete()
+            country.delete()
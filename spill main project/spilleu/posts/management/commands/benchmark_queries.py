@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts.models import Post, PostFlagVote, SeenPost, VoteReaction
+from posts.utils import apply_keyset
+from users.models import City, Country, University, User
+
+
+class Command(BaseCommand):
+    help = ("Benchmark write throughput and read latency of the hot feed/reply/profile queries. "
+            "Run before and after an index migration (migrate posts <name>) to compare.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=20_000, help="Synthetic posts to insert (default 20000).")
+        parser.add_argument("--users", type=int, default=200, help="Synthetic users (default 200).")
+        parser.add_argument("--repeat", type=int, default=50, help="Runs per read query (default 50).")
+        parser.add_argument("--explain", action="store_true", help="Print the query plan of each read.")
+
+    def _rate(self, label, n, fn):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(f"write  {label:<14} {n / elapsed:>12,.0f} rows/s")
+
+    def _insert(self, opts):
+        rng = random.Random(1)
+        now = timezone.now()
+        country = Country.objects.create(name="Benchland")
+        city = City.objects.create(name="Bench", country=country)
+        unis = University.objects.bulk_create(
+            [University(name=f"Bench University {i}", city=city) for i in range(20)])
+        users = User.objects.bulk_create([
+            User(email=f"bench{i}@example.com", university=unis[i % len(unis)]) for i in range(opts["users"])])
+
+        n = opts["posts"]
+        top_n = n * 4 // 5
+        top = [Post(author=rng.choice(users), university=rng.choice(unis), first_name="alex",
+                    flag=rng.choice((None, "red", "green")), content="benchmark post")
+               for _ in range(top_n)]
+        self._rate("posts", top_n, lambda: Post.objects.bulk_create(top, batch_size=1000))
+        replies = [Post(author=rng.choice(users), university=p.university, parent=p, thread=p,
+                        first_name="alex", content="benchmark reply")
+                   for p in rng.choices(top, k=n - top_n)]
+        self._rate("replies", len(replies), lambda: Post.objects.bulk_create(replies, batch_size=1000))
+
+        # auto_now_add stamps every row with now on insert; spread them over a week
+        for p in top + replies:
+            p.created_at = now - timedelta(seconds=rng.randint(0, 7 * 24 * 3600))
+        Post.objects.bulk_update(top + replies, ["created_at"], batch_size=1000)
+
+        pairs = {(rng.choice(users).id, rng.choice(top).id) for _ in range(n)}
+        self._rate("reactions", len(pairs), lambda: VoteReaction.objects.bulk_create(
+            [VoteReaction(user_id=u, post_id=p, reaction="up") for u, p in pairs], batch_size=1000))
+        self._rate("flag votes", len(pairs), lambda: PostFlagVote.objects.bulk_create(
+            [PostFlagVote(user_id=u, post_id=p, vote="red") for u, p in pairs], batch_size=1000))
+        self._rate("seen", len(pairs), lambda: SeenPost.objects.bulk_create(
+            [SeenPost(user_id=u, post_id=p) for u, p in pairs], batch_size=1000))
+        return rng, unis, users, top
+
+    def _read(self, label, qs, opts):
+        timings = []
+        for _ in range(opts["repeat"]):
+            t0 = time.perf_counter()
+            list(qs.all())  # fresh clone: no result cache
+            timings.append(time.perf_counter() - t0)
+        self.stdout.write(f"read   {label:<14} p50 {statistics.median(timings) * 1e3:>8.3f} ms  "
+                          f"max {max(timings) * 1e3:>8.3f} ms")
+        if opts["explain"]:
+            self.stdout.write("       " + qs.explain().replace("\n", "\n       "))
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            rng, unis, users, top = self._insert(opts)
+            connection.cursor().execute("ANALYZE")
+
+            viewer = rng.choice(users)
+            mid = sorted(top, key=lambda p: (p.created_at, p.id))[len(top) // 2]
+            page_ids = [p.id for p in rng.sample(top, 20)]
+            feed = Post.objects.filter(visible=True, parent__isnull=True)
+
+            self._read("feed first", feed.order_by("-created_at", "-id").values_list("id", "created_at")[:20], opts)
+            self._read("feed keyset", apply_keyset(feed, mid.created_at, mid.id)
+                       .values_list("id", "created_at")[:20], opts)
+            self._read("university", apply_keyset(feed.filter(university_id=unis[0].id), mid.created_at, mid.id)
+                       .values_list("id", "created_at")[:20], opts)
+            self._read("replies", Post.objects.filter(parent_id=mid.id).order_by("-created_at", "-id")[:20], opts)
+            self._read("profile", Post.objects.filter(author_id=viewer.id, parent__isnull=True)
+                       .order_by("-created_at")[:20], opts)
+            self._read("viewer likes", VoteReaction.objects.filter(user=viewer, post_id__in=page_ids)
+                       .values_list("post_id", "reaction"), opts)
+            self._read("seen window", SeenPost.objects.filter(user=viewer).values_list("post_id", flat=True), opts)
+
+            transaction.set_rollback(True)
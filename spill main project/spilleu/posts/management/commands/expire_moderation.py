@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.moderation import expire_suppressions
+
+
+class Command(BaseCommand):
+    help = "Lift moderation suppressions whose moderation_until has passed (schedule every minute)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Posts updated per transaction (default 1000).")
+
+    def handle(self, *args, **opts):
+        expired = expire_suppressions(batch_size=max(1, opts["batch_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Moderation sweep: {expired} posts visible again."))
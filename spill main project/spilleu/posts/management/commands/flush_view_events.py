@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.view_buffer import flush
+
+
+class Command(BaseCommand):
+    help = ("Drain buffered view events into SeenPost, views_count and PostViewDaily "
+            "(run every few seconds, or with --interval as a worker)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-events", type=int, default=50_000, help="Events applied per transaction (default 50000).")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Keep running, flushing every N seconds (default 0: drain once and exit).")
+
+    def _drain(self, max_events):
+        """Flush until the buffer is empty. Returns (events read, new views), or None if locked."""
+        read = recorded = 0
+        while True:
+            result = flush(max_events=max_events)
+            if result is None:
+                return None
+            read, recorded = read + result[0], recorded + result[1]
+            if result[0] < max_events:
+                return read, recorded
+
+    def handle(self, *args, **opts):
+        max_events = max(1, opts["max_events"])
+        while True:
+            result = self._drain(max_events)
+            if result is None:
+                self.stdout.write(self.style.WARNING("View flush: another flusher holds the lock."))
+            elif result[0] or not opts["interval"]:
+                self.stdout.write(self.style.SUCCESS(f"View flush: {result[0]} events, {result[1]} new views."))
+            if not opts["interval"]:
+                return
+            time.sleep(opts["interval"])
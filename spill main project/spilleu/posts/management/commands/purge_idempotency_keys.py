@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from posts.batch import purge_keys
+
+
+class Command(BaseCommand):
+    help = "Delete batch and action idempotency keys older than BATCH_IDEMPOTENCY_TTL (schedule hourly)"
+
+    def handle(self, *args, **opts):
+        self.stdout.write(self.style.SUCCESS(f"Idempotency keys: {purge_keys()} purged."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.person_search import rebuild_name_grams, trigrams_enabled
+
+
+class Command(BaseCommand):
+    help = "Rebuild the person-search trigram table from Post.first_name_key (run after enabling PERSON_SEARCH_TRIGRAMS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000, help="Posts indexed per insert batch (default 2000).")
+
+    def handle(self, *args, **opts):
+        if not trigrams_enabled():
+            self.stdout.write(self.style.WARNING("PERSON_SEARCH_TRIGRAMS is off; clearing the trigram table."))
+        indexed = rebuild_name_grams(batch_size=max(1, opts["batch_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Name trigrams rebuilt for {indexed} posts."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.candidate_pool import CANDIDATE_WINDOW, rebuild_pool, refresh_dirty
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the For You candidate pool for the recent window and prune aged-out rows (schedule every "
+            "few minutes); with --dirty-only, refresh just the posts marked by recent writes (every few seconds)")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000, help="Posts refreshed per upsert (default 2000).")
+        parser.add_argument("--dirty-only", action="store_true", help="Only refresh posts marked dirty since the last run.")
+
+    def handle(self, *args, **opts):
+        batch_size = max(1, opts["batch_size"])
+        if opts["dirty_only"]:
+            refreshed = refresh_dirty(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f"Candidate pool: {refreshed} dirty rows upserted."))
+            return
+        self.stdout.write(self.style.NOTICE(f"Refreshing candidate pool (window {CANDIDATE_WINDOW}) ..."))
+        refreshed, pruned = rebuild_pool(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Candidate pool refreshed: {refreshed} rows upserted, {pruned} pruned."))
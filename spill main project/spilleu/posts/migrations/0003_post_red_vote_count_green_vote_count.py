@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-16 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='green_vote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='red_vote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-16 20:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_views_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedCandidate',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feed_candidate', serialize=False, to='posts.post')),
+                ('university_id', models.BigIntegerField()),
+                ('flag', models.CharField(blank=True, max_length=10, null=True)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('moderation_status', models.CharField(default='ok', max_length=4)),
+                ('moderation_until', models.DateTimeField(blank=True, null=True)),
+                ('engagement_score', models.FloatField(default=0.0)),
+                ('eng_rate_score', models.FloatField(default=0.0)),
+                ('zero_penalty', models.FloatField(default=0.0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-16 21:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def sync_visible(apps, schema_editor):
+    """Lift lapsed suppressions, derive `visible`, drop hidden posts from the For You pool."""
+    Post = apps.get_model('posts', 'Post')
+    FeedCandidate = apps.get_model('posts', 'FeedCandidate')
+    Post.objects.filter(moderation_status__in=['soft', 'esc'], moderation_until__lte=timezone.now()).update(
+        moderation_status='ok')
+    Post.objects.exclude(moderation_status='ok').update(visible=False)
+    FeedCandidate.objects.filter(post__visible=False).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_feedcandidate'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='feedcandidate',
+            name='moderation_status',
+        ),
+        migrations.RemoveField(
+            model_name='feedcandidate',
+            name='moderation_until',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='visible',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(sync_visible, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('parent__isnull', True), ('visible', True)), fields=['created_at', 'id'], name='post_visible_top_created_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.1 on 2026-10-16 21:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_visible'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_post_univers_76b144_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='postflagvote',
+            name='posts_postf_post_id_0ce06d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='postflagvote',
+            name='posts_postf_user_id_670561_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='savedpost',
+            name='posts_saved_user_id_27a404_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='savedpost',
+            name='posts_saved_post_id_a5f1c9_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='seenpost',
+            name='posts_seenp_post_id_0bfb4d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='seenpost',
+            name='posts_seenp_user_id_813ea8_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='seenreply',
+            name='posts_seenr_reply_i_3060c5_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='seenreply',
+            name='posts_seenr_user_id_34e35d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='votereaction',
+            name='posts_voter_post_id_32dcb1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='votereaction',
+            name='posts_voter_user_id_93eade_idx',
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='parent',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.post'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['created_at', 'id'], name='post_top_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['university', 'created_at', 'id'], name='post_top_uni_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('parent__isnull', False)), fields=['parent', 'created_at'], name='post_reply_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'created_at'], name='post_author_created_idx'),
+        ),
+    ]
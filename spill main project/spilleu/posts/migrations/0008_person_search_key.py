@@ -0,0 +1,72 @@
+# Generated by Django 5.2.1 on 2026-10-16 21:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from posts.utils import name_grams, normalize_name
+
+
+def backfill_name_keys(apps, schema_editor):
+    """first_name_key for every post, trigram rows for top-level posts."""
+    Post = apps.get_model('posts', 'Post')
+    PostNameGram = apps.get_model('posts', 'PostNameGram')
+    last_pk = 0
+    while True:
+        batch = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'first_name', 'parent_id')[:2000])
+        if not batch:
+            return
+        for post in batch:
+            post.first_name_key = normalize_name(post.first_name)
+        Post.objects.bulk_update(batch, ['first_name_key'])
+        PostNameGram.objects.bulk_create(
+            [PostNameGram(post_id=p.pk, gram=g) for p in batch if p.parent_id is None for g in name_grams(p.first_name_key)],
+            batch_size=5000)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_feed_indexes'),
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostNameGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_post_first_n_89744c_idx',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='first_name_key',
+            field=models.CharField(blank=True, default='', max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='first_name',
+            field=models.CharField(max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['first_name_key'], name='post_top_name_key_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddField(
+            model_name='postnamegram',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_grams', to='posts.post'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='postnamegram',
+            unique_together={('gram', 'post')},
+        ),
+        migrations.RunPython(backfill_name_keys, migrations.RunPython.noop),
+    ]
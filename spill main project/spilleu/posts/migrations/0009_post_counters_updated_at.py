@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-16 22:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_person_search_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='counters_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
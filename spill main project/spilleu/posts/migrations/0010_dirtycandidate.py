@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-16 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_counters_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyCandidate',
+            fields=[
+                ('post_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('marked_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -2,10 +2,13 @@
 
 from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 from users.models import University
 
+from .utils import normalize_name
+
 User = settings.AUTH_USER_MODEL
 
 
@@ -36,19 +39,23 @@ class Post(models.Model):
         (MOD_ESC, "Escalated"),
     ]
 
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
+    # FK indexes come from the composite indexes in Meta (leading column)
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts', db_index=False)
     
     # Flag is optional — can be "red", "green", or null (Tea posts)
     flag = models.CharField(max_length=10, choices=FLAG_CHOICES, null=True, blank=True)
     
     # NEW: Person identification fields for flagged posts
-    first_name = models.CharField(max_length=30, db_index=True)
+    first_name = models.CharField(max_length=30)
+    # utils.normalize_name(first_name), kept in sync by save(); see posts/person_search.py
+    first_name_key = models.CharField(max_length=30, blank=True, default='')
     person_age = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True)
 
     content = models.TextField()
 
     # Threading
-    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies',
+                               db_index=False)
     thread = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='thread_posts')
 
     # Repost
@@ -63,21 +70,40 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     image_url = models.URLField(blank=True, null=True)
 
-    # DENORMALIZED COUNTER FIELDS
+    # DENORMALIZED COUNTER FIELDS (source of truth for reads; see posts/counters.py)
     replies_count = models.PositiveIntegerField(default=0, db_index=True)
     like_count = models.PositiveIntegerField(default=0, db_index=True)
+    red_vote_count = models.PositiveIntegerField(default=0)
+    green_vote_count = models.PositiveIntegerField(default=0)
+    views_count = models.PositiveIntegerField(default=0)  # SeenPost rows (top-level) / SeenReply rows (replies)
+    # Last write to any counter above (counters.update_counters); posts/sync/ filters on it
+    counters_updated_at = models.DateTimeField(default=timezone.now)
 
     moderation_status = models.CharField(
         max_length=4, choices=MODERATION_CHOICES, default=MOD_OK, db_index=True
     )
     moderation_until = models.DateTimeField(null=True, blank=True, db_index=True)
+    # moderation_status == MOD_OK, kept in sync by save(); lapsed suppressions
+    # are flipped back by the expire_moderation command (posts/moderation.py)
+    visible = models.BooleanField(default=True)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
+            # Top-level timelines: feeds, university pages, trending (keyset on created_at, id)
+            models.Index(fields=['created_at', 'id'], condition=Q(parent__isnull=True),
+                         name='post_top_created_idx'),
+            models.Index(fields=['created_at', 'id'], condition=Q(parent__isnull=True, visible=True),
+                         name='post_visible_top_created_idx'),  # visible-only feed walks
+            models.Index(fields=['university', 'created_at', 'id'], condition=Q(parent__isnull=True),
+                         name='post_top_uni_created_idx'),
+            models.Index(fields=['parent', 'created_at'], condition=Q(parent__isnull=False),
+                         name='post_reply_created_idx'),  # reply lists
+            models.Index(fields=['author', 'created_at'], name='post_author_created_idx'),  # profiles
             models.Index(fields=['created_at']),
-            models.Index(fields=['university', 'created_at']),
-            models.Index(fields=['first_name']),  # NEW
+            # Exact and prefix person lookups (LIKE 'key%' needs the pattern opclass on PostgreSQL)
+            models.Index(fields=['first_name_key'], opclasses=['varchar_pattern_ops'], condition=Q(parent__isnull=True),
+                         name='post_top_name_key_idx'),
             models.Index(fields=['person_age']),  # NEW
         ]
 
@@ -92,6 +118,12 @@ class Post(models.Model):
     def save(self, *args, **kwargs):
         if self.parent and not self.thread:
             self.thread = self.parent.thread or self.parent
+        self.visible = self.moderation_status == self.MOD_OK
+        self.first_name_key = normalize_name(self.first_name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = {'moderation_status': 'visible', 'first_name': 'first_name_key'}
+            kwargs['update_fields'] = {*update_fields, *(derived[f] for f in update_fields if f in derived)}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -99,6 +131,18 @@ class Post(models.Model):
         return f"{self.author} - {kind} #{self.pk} - {self.first_name}"
 
 
+class PostNameGram(models.Model):
+    """Trigram of a top-level post's first_name_key, for infix/fuzzy person search."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='name_grams')
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ('gram', 'post')
+
+    def __str__(self):
+        return f"{self.gram!r} in Post {self.post_id}"
+
+
 # ---------- Reactions / Saves ----------
 
 class VoteReaction(models.Model):
@@ -113,10 +157,6 @@ class VoteReaction(models.Model):
 
     class Meta:
         unique_together = ('user', 'post')
-        indexes = [
-            models.Index(fields=['post']),
-            models.Index(fields=['user', 'post']),
-        ]
 
     def __str__(self):
         return f"{self.user} liked Post {self.post_id}"
@@ -135,10 +175,6 @@ class PostFlagVote(models.Model):
 
     class Meta:
         unique_together = ('user', 'post')
-        indexes = [
-            models.Index(fields=['post']),
-            models.Index(fields=['user', 'post']),
-        ]
 
     def __str__(self):
         return f"{self.user} voted {self.vote} on Post {self.post_id}"
@@ -151,15 +187,36 @@ class SavedPost(models.Model):
 
     class Meta:
         unique_together = ('user', 'post')
-        indexes = [
-            models.Index(fields=['user']),
-            models.Index(fields=['post']),
-        ]
 
     def __str__(self):
         return f"{self.user} saved Post {self.post_id}"
 
 
+class IdempotencyKey(models.Model):
+    """
+    A client-supplied batch key or action id and the result it produced
+    (posts/batch.py). Inserted before the work runs, in the same transaction,
+    so the unique constraint serializes concurrent retries across workers.
+    """
+    SCOPE_CHOICES = (
+        ("batch", "Batch"),
+        ("action", "Action"),
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    scope = models.CharField(max_length=6, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=255)
+    result = models.JSONField(null=True, blank=True)  # null until the work is done
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} for {self.user_id}"
+
+
 # ---------- Views / Impressions ----------
 
 class SeenPost(models.Model):
@@ -169,10 +226,6 @@ class SeenPost(models.Model):
 
     class Meta:
         unique_together = ('user', 'post')
-        indexes = [
-            models.Index(fields=['post']),
-            models.Index(fields=['user', 'post']),
-        ]
 
     def __str__(self):
         return f"{self.user} saw Post {self.post_id}"
@@ -185,10 +238,6 @@ class SeenReply(models.Model):
 
     class Meta:
         unique_together = ('user', 'reply')
-        indexes = [
-            models.Index(fields=['reply']),
-            models.Index(fields=['user', 'reply']),
-        ]
 
     def __str__(self):
         return f"{self.user} saw Reply {self.reply_id}"
@@ -226,6 +275,42 @@ class ReplyViewDaily(models.Model):
         return f"Views {self.unique_count} for Reply {self.reply_id} on {self.day}"
 
 
+# ---------- For You candidate pool ----------
+
+class FeedCandidate(models.Model):
+    """
+    Time-independent For You score components for a recent visible top-level
+    post. Maintained by posts/candidate_pool.py; request time only adds decay
+    and per-user affinity on top of these.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='feed_candidate')
+    university_id = models.BigIntegerField()
+    flag = models.CharField(max_length=10, null=True, blank=True)
+    created_at = models.DateTimeField(db_index=True)
+
+    engagement_score = models.FloatField(default=0.0)
+    eng_rate_score = models.FloatField(default=0.0)
+    zero_penalty = models.FloatField(default=0.0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Candidate Post {self.post_id}"
+
+
+class DirtyCandidate(models.Model):
+    """
+    A post whose FeedCandidate row is out of date. Write paths insert one row
+    per affected post; candidate_pool.refresh_dirty() drains them in batches.
+    A plain id rather than a foreign key, so marking a post inside its own
+    delete cascade can't violate the constraint.
+    """
+    post_id = models.BigIntegerField(primary_key=True)
+    marked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Dirty candidate {self.post_id}"
+
+
 # ---------- Reports ----------
 
 class ReportedPost(models.Model):
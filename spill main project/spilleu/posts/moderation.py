@@ -0,0 +1,43 @@
+# posts/moderation.py
+"""
+Lifting lapsed moderation suppressions.
+
+Reads filter on the maintained ``Post.visible`` flag (moderation_status ==
+MOD_OK) instead of re-checking ``moderation_until`` against the request time,
+which keeps the predicate constant and lets the (visible, created_at) partial
+index serve it. The price is that a timed suppression stays in effect until
+expire_suppressions() runs, so schedule the expire_moderation command every
+minute or so.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import uni_buffers
+from .candidate_pool import refresh_candidates
+from .models import Post
+
+
+def expire_suppressions(now=None, batch_size=1000):
+    """
+    Flip suppressions whose ``moderation_until`` has passed back to MOD_OK,
+    in bulk, and bring the For You pool and university buffers in line.
+    Returns the number of posts made visible again.
+    """
+    now = now or timezone.now()
+    expired = Post.objects.filter(moderation_status__in=[Post.MOD_SOFT, Post.MOD_ESC], moderation_until__lte=now)
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(expired.order_by('pk').select_for_update(skip_locked=True)
+                        .values_list('id', 'university_id', 'parent_id')[:batch_size])
+            if not rows:
+                return total
+            ids = [r[0] for r in rows]
+            Post.objects.filter(id__in=ids).update(moderation_status=Post.MOD_OK, visible=True)
+
+            top_level = [r for r in rows if r[2] is None]
+            refresh_candidates(r[0] for r in top_level)
+            for university_id in {r[1] for r in top_level}:
+                transaction.on_commit(lambda u=university_id: uni_buffers.invalidate(u))
+        total += len(rows)
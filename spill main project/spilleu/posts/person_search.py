@@ -0,0 +1,113 @@
+# posts/person_search.py
+"""
+Person search over the first names on top-level posts.
+
+``Post.first_name_key`` holds ``utils.normalize_name(first_name)`` (accent-
+and case-folded, trimmed), so lookups never need ``icontains``:
+
+* exact  -> ``first_name_key = key``, served by post_top_name_key_idx;
+* prefix -> ``first_name_key LIKE 'key%'``, same index;
+* fuzzy  -> overlap with the PostNameGram trigram rows, ranked in Python by
+  trigram similarity (names containing the query first).
+
+Results rank exact > prefix > fuzzy, newest first within a tier. The
+trigram table is optional (PERSON_SEARCH_TRIGRAMS); without it, search is
+exact + prefix only. After turning it on, backfill with the
+rebuild_name_grams command.
+"""
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import Post, PostNameGram
+from .utils import name_grams, normalize_name
+
+FUZZY_THRESHOLD = 0.3   # minimum trigram similarity (pg_trgm's default)
+FUZZY_CANDIDATES = 200  # best trigram overlaps scored per query
+
+
+def trigrams_enabled():
+    return getattr(settings, 'PERSON_SEARCH_TRIGRAMS', True)
+
+
+def _infix_grams(key):
+    """Unpadded trigrams: every name containing `key` has all of them."""
+    return {w[i:i + 3] for w in key.split() for i in range(len(w) - 2)}
+
+
+def sync_name_grams(post):
+    """Rewrite the trigram rows of `post` (top-level posts only)."""
+    PostNameGram.objects.filter(post_id=post.pk).delete()
+    if post.parent_id is None and trigrams_enabled():
+        PostNameGram.objects.bulk_create(
+            [PostNameGram(post_id=post.pk, gram=g) for g in name_grams(post.first_name_key)])
+
+
+def rebuild_name_grams(batch_size=2000):
+    """Recompute every trigram row from first_name_key. Returns the number of posts indexed."""
+    PostNameGram.objects.all().delete()
+    if not trigrams_enabled():
+        return 0
+    rows = Post.objects.filter(parent__isnull=True).order_by('pk').values_list('pk', 'first_name_key')
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return total
+        PostNameGram.objects.bulk_create(
+            [PostNameGram(post_id=pk, gram=g) for pk, key in batch for g in name_grams(key)],
+            batch_size=5000)
+        total += len(batch)
+        last_pk = batch[-1][0]
+
+
+def person_filter(qs, name):
+    """
+    Restrict `qs` to posts whose first name starts with `name` or, with the
+    trigram table, contains it (every trigram of `name` present).
+    """
+    key = normalize_name(name)
+    if not key:
+        return qs
+    match = Q(first_name_key__startswith=key)
+    inner = _infix_grams(key)
+    if inner and trigrams_enabled():
+        containing = (PostNameGram.objects.filter(gram__in=inner)
+                      .values('post_id').annotate(hits=Count('gram')).filter(hits=len(inner))
+                      .values('post_id'))
+        match |= Q(id__in=containing)
+    return qs.filter(match)
+
+
+def _fuzzy_ids(base, key, limit, exclude):
+    grams = name_grams(key)
+    overlaps = dict(PostNameGram.objects
+                    .filter(gram__in=grams).exclude(post_id__in=exclude)
+                    .values('post_id').annotate(hits=Count('gram')).order_by('-hits')
+                    .values_list('post_id', 'hits')[:FUZZY_CANDIDATES])
+    ranked = []
+    for pid, name, created_at in base.filter(id__in=list(overlaps)).values_list('id', 'first_name_key', 'created_at'):
+        hits = overlaps[pid]
+        similarity = hits / (len(grams) + len(name_grams(name)) - hits)
+        contains = key in name
+        if contains or similarity >= FUZZY_THRESHOLD:
+            ranked.append(((contains, similarity, created_at, pid), pid))
+    ranked.sort(reverse=True)
+    return [pid for _, pid in ranked[:limit]]
+
+
+def search_people(q, limit=10):
+    """Top-level post ids for the person query `q`: exact, then prefix, then fuzzy matches."""
+    key = normalize_name(q)
+    if not key:
+        return []
+    base = Post.objects.filter(parent__isnull=True)
+    newest = ('-created_at', '-id')
+    ids = list(base.filter(first_name_key=key).order_by(*newest).values_list('id', flat=True)[:limit])
+    if len(ids) < limit:
+        ids += (base.filter(first_name_key__startswith=key).exclude(first_name_key=key)
+                .order_by(*newest).values_list('id', flat=True)[:limit - len(ids)])
+    if len(ids) < limit and trigrams_enabled():
+        ids += _fuzzy_ids(base, key, limit - len(ids), exclude=ids)
+    return ids
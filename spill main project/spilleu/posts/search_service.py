@@ -2,9 +2,11 @@ from django.db.models import Q, Count, OuterRef, Subquery
 from django.utils import timezone
 from datetime import timedelta
 
+from core.timing import StageTimer
 from users.models import University
 from .models import Post, Hashtag, SeenPost
-from .feed_engine import rank_posts
+from .feed_engine import explain_posts, rank_post_ids
+from .selectors import hydrate_posts
 
 DEFAULT_LIMIT = 10  # items per bucket / page
 
@@ -17,7 +19,7 @@ def search_posts(q, limit=DEFAULT_LIMIT, exclude_seen_ids=None):
         return Post.objects.none()
 
     base = (Post.objects
-            .select_related("author", "university")
+            .select_related("author__university__city", "university__city")
             .prefetch_related("hashtags"))
 
     if q.startswith("#"):
@@ -59,19 +61,23 @@ def search_universities(q, limit=DEFAULT_LIMIT):
 
 # -------- Trending posts (with views-aware ranking) --------
 
-def trending_posts(limit=10, days=1):
-    """Global trending with the same scorer used by For-You."""
+def trending_posts(limit=10, days=1, timer=None, explain=False):
+    """
+    Global trending with the same scorer used by For-You. `timer` and
+    `explain` work as in get_for_you_feed().
+    """
+    timer = timer or StageTimer()
     since = timezone.now() - timedelta(days=days)
     now = timezone.now()
-    qs = (Post.objects
-          .filter(parent__isnull=True, created_at__gte=since)
-          .exclude(
-              Q(moderation_status__in=[Post.MOD_SOFT, Post.MOD_ESC]) &
-              (Q(moderation_until__isnull=True) | Q(moderation_until__gt=now))
-          )
-          .select_related("author", "university")
-          .prefetch_related("hashtags"))
-    return rank_posts(list(qs), user=None, limit=limit)
+    qs = Post.objects.filter(visible=True, parent__isnull=True, created_at__gte=since)
+    # Rank on narrow columns, then load full objects for the winners only
+    with timer.stage("rank"):
+        ids = rank_post_ids(qs, user=None, limit=limit, now=now)
+    with timer.stage("hydrate"):
+        posts = hydrate_posts(ids)
+    if explain:
+        explain_posts(posts, user_data={}, now=now)
+    return posts
 
 
 def trending_hashtags(limit=10, days=1, university_id=None):
@@ -104,6 +110,6 @@ def posts_for_hashtag(tag_name, limit=DEFAULT_LIMIT):
     # NOTE: no slicing here; let DRF pagination handle page size
     return (Post.objects
             .filter(hashtags__name__iexact=tag)
-            .select_related("author", "university")
+            .select_related("author__university__city", "university__city")
             .prefetch_related("hashtags")
             .order_by("-created_at"))
\ No newline at end of file
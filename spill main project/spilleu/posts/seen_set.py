@@ -0,0 +1,127 @@
+# posts/seen_set.py
+"""
+Compact per-user seen-set.
+
+Heavy readers accumulate tens of thousands of SeenPost rows, so filtering feeds
+with ``id IN (SELECT post_id FROM seenpost WHERE user_id = ...)`` or a Python
+``NOT IN`` list gets slower the longer someone uses the app. Instead each user
+gets a cached, sorted int64 array of the post ids they have seen among posts
+created in the last FEED_SEEN_WINDOW_DAYS, plus the timestamp that window
+starts at (``covered_from``):
+
+* a post created at or after ``covered_from`` is seen iff its id is in the array
+  (binary search, vectorised over a whole page);
+* an older post is looked up in SeenPost, bounded to the ids being checked.
+
+The array is built with one indexed query on a cache miss and extended in place
+after each commit that records views (record_seen_posts / the SeenPost
+receiver). A lost concurrent update only makes a post look unseen until the
+entry expires, never the reverse.
+
+Only the worker that recorded a view extends its cache entry, so without a
+shared cache (CACHE_SHARED) the other workers' copies would miss it for the
+whole TTL. Entries then live FEED_SEEN_LOCAL_TTL seconds instead and are
+rebuilt from SeenPost.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SeenPost
+
+SEEN_KEY = "feed:seen:{}"
+SEEN_TTL = 24 * 3600
+
+
+def _ttl():
+    if getattr(settings, "CACHE_SHARED", False):
+        return SEEN_TTL
+    return getattr(settings, "FEED_SEEN_LOCAL_TTL", 60)
+
+
+def _window():
+    return timedelta(days=getattr(settings, "FEED_SEEN_WINDOW_DAYS", 14))
+
+
+class SeenSet:
+    __slots__ = ("user_id", "ids", "covered_from")
+
+    def __init__(self, user_id, ids, covered_from):
+        self.user_id = user_id
+        self.ids = ids  # sorted, unique int64
+        self.covered_from = covered_from
+
+    def __len__(self):
+        return len(self.ids)
+
+    def contains(self, post_ids):
+        """Boolean mask: which of `post_ids` are in the array."""
+        post_ids = np.asarray(post_ids, dtype=np.int64)
+        if not len(self.ids) or not len(post_ids):
+            return np.zeros(len(post_ids), dtype=bool)
+        pos = np.searchsorted(self.ids, post_ids)
+        pos[pos == len(self.ids)] = 0
+        return self.ids[pos] == post_ids
+
+    def covers(self, created_at):
+        return created_at >= self.covered_from
+
+    def seen_among(self, rows):
+        """Ids among `rows` of (post_id, created_at) that the user has seen."""
+        covered = [pid for pid, created_at in rows if self.covers(created_at)]
+        seen = {pid for pid, hit in zip(covered, self.contains(covered).tolist()) if hit}
+        return seen | self._lookup_uncovered([pid for pid, created_at in rows if not self.covers(created_at)])
+
+    def _lookup_uncovered(self, post_ids):
+        if not post_ids:
+            return set()
+        return set(SeenPost.objects.filter(user_id=self.user_id, post_id__in=post_ids).values_list("post_id", flat=True))
+
+    def to_cache(self):
+        return (self.covered_from, self.ids.tobytes())
+
+    @classmethod
+    def from_cache(cls, user_id, value):
+        covered_from, raw = value
+        return cls(user_id, np.frombuffer(raw, dtype=np.int64), covered_from)
+
+
+def load_seen_set(user, now=None):
+    """The user's seen-set, built from SeenPost on a cache miss."""
+    key = SEEN_KEY.format(user.id)
+    value = cache.get(key)
+    if value is not None:
+        return SeenSet.from_cache(user.id, value)
+
+    covered_from = (now or timezone.now()) - _window()
+    ids = np.fromiter(
+        SeenPost.objects.filter(user_id=user.id, post__created_at__gte=covered_from)
+        .values_list("post_id", flat=True),
+        dtype=np.int64,
+    )
+    seen = SeenSet(user.id, np.unique(ids), covered_from)
+    cache.set(key, seen.to_cache(), _ttl())
+    return seen
+
+
+def add_seen(user_id, post_ids):
+    """Merge newly seen `post_ids` into a cached set (no-op if not cached)."""
+    if not post_ids:
+        return
+    key = SEEN_KEY.format(user_id)
+    value = cache.get(key)
+    if value is None:
+        return  # next read rebuilds from SeenPost
+    seen = SeenSet.from_cache(user_id, value)
+    merged = SeenSet(user_id, np.union1d(seen.ids, np.fromiter(post_ids, dtype=np.int64)), seen.covered_from)
+    cache.set(key, merged.to_cache(), _ttl())
+
+
+def add_seen_on_commit(user_id, post_ids):
+    post_ids = list(post_ids)
+    transaction.on_commit(lambda: add_seen(user_id, post_ids))
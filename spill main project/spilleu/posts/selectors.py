@@ -1,6 +1,5 @@
 
 # posts/selectors.py - NEW FILE  
-from django.db.models import Q
 from users.models import UniversityFollow
 from .models import Post
 
@@ -22,3 +21,17 @@ def scope_filter(base_qs, scope, user):
             return base_qs.none()
     return base_qs.none()
 
+
+def hydrate_posts(ids, visible_only=False):
+    """
+    Hydration phase of a feed fetch: load full Post objects (author,
+    university, hashtags) for the final page `ids`, in the given order.
+    Missing ids are skipped; with `visible_only`, so are suppressed posts.
+    """
+    if not ids:
+        return []
+    qs = Post.objects.filter(id__in=ids)
+    if visible_only:
+        qs = qs.filter(visible=True)
+    by_id = qs.select_related('author__university__city', 'university__city').prefetch_related('hashtags').in_bulk()
+    return [by_id[pid] for pid in ids if pid in by_id]
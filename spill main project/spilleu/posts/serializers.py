@@ -1,14 +1,15 @@
 # posts/serializers.py
 
 from django.contrib.auth import get_user_model
-from django.utils import timezone
 from rest_framework import serializers
 
 from users.models import University
 from .models import (
     Post, PostFlagVote, ReportedPost, SavedPost, VoteReaction,
-    Hashtag, SeenPost, SeenReply
+    Hashtag
 )
+from .cards import display_name
+from .viewer_state import viewer_state_for
 
 User = get_user_model()
 
@@ -72,21 +73,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'email', 'name', 'university']
 
     def get_name(self, obj):
-        dob = getattr(obj, 'date_of_birth', None) or getattr(obj, 'dob', None)
-        if not dob:
-            return getattr(obj, "email", "f").split('@')[0]
-
-        today = timezone.now().date()
-        age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-        age = max(age, 0)
-
-        g = (getattr(obj, "gender", None) or "").strip().lower()
-        if g in ("m", "male", "man"):
-            prefix = "m"
-        else:
-            prefix = "f"
-
-        return f"{prefix}{age}"
+        return display_name(obj)
 
 
 class UniversityPreviewSerializer(serializers.ModelSerializer):
@@ -185,22 +172,22 @@ class PostPreviewSerializer(serializers.ModelSerializer):
         """Only show likes for Tea posts (no flag)"""
         if obj.flag in ("red", "green"):
             return 0
-        return getattr(obj, "upvotes", None) or obj.reactions.filter(reaction="up").count()
+        return obj.like_count
 
     def get_red_votes(self, obj):
         """Only show red votes for flagged posts"""
         if obj.flag not in ("red", "green"):
             return 0
-        return getattr(obj, "red_votes", None) or obj.flag_votes.filter(vote="red").count()
+        return obj.red_vote_count
 
     def get_green_votes(self, obj):
         """Only show green votes for flagged posts"""
         if obj.flag not in ("red", "green"):
             return 0
-        return getattr(obj, "green_votes", None) or obj.flag_votes.filter(vote="green").count()
+        return obj.green_vote_count
 
     def get_views(self, obj):
-        return getattr(obj, "views", None) or SeenPost.objects.filter(post=obj).count()
+        return obj.views_count
 
     def get_hashtags(self, obj):
         return [f"#{t.name}" for t in obj.hashtags.all()]
@@ -209,6 +196,9 @@ class PostPreviewSerializer(serializers.ModelSerializer):
         """For Tea posts - show if user liked it"""
         request = self.context.get('request')
         if request and request.user.is_authenticated and obj.flag not in ("red", "green"):
+            state = viewer_state_for(self.context, obj)
+            if state:
+                return state.reaction(obj.id)
             reaction = VoteReaction.objects.filter(user=request.user, post=obj).first()
             return reaction.reaction if reaction else None
         return None
@@ -217,6 +207,9 @@ class PostPreviewSerializer(serializers.ModelSerializer):
         """For flagged posts - show if user voted red/green"""
         request = self.context.get('request')
         if request and request.user.is_authenticated and obj.flag in ("red", "green"):
+            state = viewer_state_for(self.context, obj)
+            if state:
+                return state.flag_vote(obj.id)
             vote = PostFlagVote.objects.filter(user=request.user, post=obj).first()
             return vote.vote if vote else None
         return None
@@ -224,6 +217,9 @@ class PostPreviewSerializer(serializers.ModelSerializer):
     def get_saved(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            state = viewer_state_for(self.context, obj)
+            if state:
+                return state.saved(obj.id)
             return SavedPost.objects.filter(user=request.user, post=obj).exists()
         return False
 
@@ -254,16 +250,10 @@ class ReplySerializer(serializers.ModelSerializer):
         return resolve_image_url(getattr(obj, "image", None))
 
     def get_likes(self, obj):
-        annotated = getattr(obj, "upvotes", None)
-        if annotated is not None:
-            return int(annotated)
-        return obj.reactions.filter(reaction="up").count()
+        return obj.like_count
 
     def get_views(self, obj):
-        annotated = getattr(obj, "views", None)
-        if annotated is not None:
-            return int(annotated)
-        return SeenReply.objects.filter(reply=obj).count()
+        return obj.views_count
 
     def get_hashtags(self, obj):
         return [f"#{t.name}" for t in obj.hashtags.all()]
@@ -271,18 +261,15 @@ class ReplySerializer(serializers.ModelSerializer):
     def get_user_reaction(self, obj):
         request = self.context.get("request")
         if request and request.user and request.user.is_authenticated:
+            state = viewer_state_for(self.context, obj)
+            if state:
+                return state.reaction(obj.id)
             reaction = VoteReaction.objects.filter(user=request.user, post=obj).first()
             return reaction.reaction if reaction else None
         return None
 
     def get_replies_count(self, obj):
-        annotated = getattr(obj, "child_count", None)
-        if annotated is not None:
-            try:
-                return int(annotated)
-            except (TypeError, ValueError):
-                pass
-        return obj.replies.count()
+        return obj.replies_count
 
 
 class PostSerializer(PostPreviewSerializer):
@@ -295,7 +282,7 @@ class PostSerializer(PostPreviewSerializer):
         fields = PostPreviewSerializer.Meta.fields + ['replies_count', 'vote_score', 'is_seen']
 
     def get_replies_count(self, obj):
-        return getattr(obj, "comment_count", None) or obj.replies.count()
+        return obj.replies_count
 
     def get_vote_score(self, obj):
         """Different scoring for different post types"""
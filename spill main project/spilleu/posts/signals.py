@@ -4,30 +4,37 @@ from django.db.models import F
 from django.utils import timezone
 
 from .models import SeenPost, SeenReply, PostViewDaily, ReplyViewDaily
+from .counters import bump_view_counters
+from .candidate_pool import deleting_post_ids, mark_dirty
+from .seen_set import add_seen_on_commit
+from . import person_search, uni_buffers
+
+# Bulk inserts skip these receivers; use counters.record_seen_posts() for those.
 
 @receiver(post_save, sender=SeenPost)
 def bump_post_daily_views(sender, instance: SeenPost, created, **kwargs):
     if not created:
         return
     day = instance.seen_at.date() if hasattr(instance, "seen_at") and instance.seen_at else timezone.now().date()
-    obj, _ = PostViewDaily.objects.get_or_create(post=instance.post, day=day, defaults={"unique_count": 0})
-    PostViewDaily.objects.filter(pk=obj.pk).update(unique_count=F("unique_count") + 1)
+    bump_view_counters([instance.post_id], day=day)
+    add_seen_on_commit(instance.user_id, [instance.post_id])
 
 @receiver(post_save, sender=SeenReply)
 def bump_reply_daily_views(sender, instance: SeenReply, created, **kwargs):
     if not created:
         return
     day = instance.seen_at.date() if hasattr(instance, "seen_at") and instance.seen_at else timezone.now().date()
-    obj, _ = ReplyViewDaily.objects.get_or_create(reply=instance.reply, day=day, defaults={"unique_count": 0})
-    ReplyViewDaily.objects.filter(pk=obj.pk).update(unique_count=F("unique_count") + 1)
+    bump_view_counters([instance.reply_id], day=day, daily_model=ReplyViewDaily, daily_fk="reply_id")
 
     # posts/signals.py
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
 from django.db.models import F
 from django.dispatch import receiver
 from django.utils.functional import cached_property
 
-from .models import Post, VoteReaction  # adjust import paths if needed
+from .models import Post, VoteReaction, PostFlagVote  # adjust import paths if needed
+from .batch import applying_batch
+from .counters import update_counters
 
 # ---------- Replies counter on parent ----------
 
@@ -37,7 +44,7 @@ def bump_parent_replies_count_on_create(sender, instance: Post, created, **kwarg
     When a new Post with a parent (i.e., a reply) is created, bump parent's replies_count.
     """
     if created and instance.parent_id:
-        Post.objects.filter(pk=instance.parent_id).update(replies_count=F('replies_count') + 1)
+        update_counters(Post.objects.filter(pk=instance.parent_id), replies_count=F('replies_count') + 1)
 
 
 @receiver(post_delete, sender=Post)
@@ -47,9 +54,8 @@ def decrease_parent_replies_count_on_delete(sender, instance: Post, **kwargs):
     (If you only soft-delete, skip decrement or gate on instance.is_deleted)
     """
     if instance.parent_id:
-        Post.objects.filter(pk=instance.parent_id, replies_count__gt=0).update(
-            replies_count=F('replies_count') - 1
-        )
+        update_counters(Post.objects.filter(pk=instance.parent_id, replies_count__gt=0),
+                        replies_count=F('replies_count') - 1)
 
 # ---------- Like counter on Post (denormalized) ----------
 
@@ -84,7 +90,7 @@ def maintain_like_count_on_save(sender, instance: VoteReaction, created, **kwarg
     # Case 1: brand new reaction
     if created:
         if _is_like(instance.reaction):
-            Post.objects.filter(pk=instance.post_id).update(like_count=F('like_count') + 1)
+            update_counters(Post.objects.filter(pk=instance.post_id), like_count=F('like_count') + 1)
         return
 
     # Case 2: update
@@ -97,23 +103,140 @@ def maintain_like_count_on_save(sender, instance: VoteReaction, created, **kwarg
     # If the target post changed (rare), adjust both
     if prev_post_id and prev_post_id != instance.post_id:
         if prev_was_like:
-            Post.objects.filter(pk=prev_post_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+            update_counters(Post.objects.filter(pk=prev_post_id, like_count__gt=0), like_count=F('like_count') - 1)
         if now_is_like:
-            Post.objects.filter(pk=instance.post_id).update(like_count=F('like_count') + 1)
+            update_counters(Post.objects.filter(pk=instance.post_id), like_count=F('like_count') + 1)
         return
 
     # Same post, reaction value changed
     if not prev_was_like and now_is_like:
-        Post.objects.filter(pk=instance.post_id).update(like_count=F('like_count') + 1)
+        update_counters(Post.objects.filter(pk=instance.post_id), like_count=F('like_count') + 1)
     elif prev_was_like and not now_is_like:
-        Post.objects.filter(pk=instance.post_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+        update_counters(Post.objects.filter(pk=instance.post_id, like_count__gt=0), like_count=F('like_count') - 1)
 
 @receiver(post_delete, sender=VoteReaction)
 def maintain_like_count_on_delete(sender, instance: VoteReaction, **kwargs):
     """
     When a like reaction is deleted, decrement like_count.
     """
-    if _is_like(instance.reaction):
-        Post.objects.filter(pk=instance.post_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+    if _is_like(instance.reaction) and not applying_batch():
+        update_counters(Post.objects.filter(pk=instance.post_id, like_count__gt=0), like_count=F('like_count') - 1)
+
+
+# ---------- Red/green flag-vote counters on Post (denormalized) ----------
+
+def _flag_vote_field(vote_value):
+    """Map a PostFlagVote.vote value to the Post counter column it feeds."""
+    if vote_value == 'red':
+        return 'red_vote_count'
+    if vote_value == 'green':
+        return 'green_vote_count'
+    return None
+
+
+def _bump_flag_vote(post_id, vote_value, delta):
+    field = _flag_vote_field(vote_value)
+    if not field or not post_id:
+        return
+    if delta > 0:
+        update_counters(Post.objects.filter(pk=post_id), **{field: F(field) + delta})
+    else:
+        update_counters(Post.objects.filter(pk=post_id, **{f'{field}__gte': -delta}), **{field: F(field) + delta})
+
+
+@receiver(pre_save, sender=PostFlagVote)
+def cache_old_flag_vote_on_update(sender, instance: PostFlagVote, **kwargs):
+    """
+    Before saving, cache the previous vote if this is an update
+    (e.g. a red -> green switch through update_or_create).
+    """
+    instance._old_vote = None
+    instance._old_post_id = None
+    if instance.pk:
+        old = PostFlagVote.objects.filter(pk=instance.pk).values('vote', 'post_id').first()
+        if old:
+            instance._old_vote = old['vote']
+            instance._old_post_id = old['post_id']
 
 
+@receiver(post_save, sender=PostFlagVote)
+def maintain_flag_vote_counts_on_save(sender, instance: PostFlagVote, created, **kwargs):
+    """
+    Keep Post.red_vote_count / Post.green_vote_count in sync.
+    - If created: +1 on the counter for the cast vote
+    - If updated: move one unit from the old counter to the new one
+    """
+    if created:
+        _bump_flag_vote(instance.post_id, instance.vote, +1)
+        return
+
+    prev_vote = getattr(instance, '_old_vote', None)
+    prev_post_id = getattr(instance, '_old_post_id', None) or instance.post_id
+    if prev_vote == instance.vote and prev_post_id == instance.post_id:
+        return
+
+    _bump_flag_vote(prev_post_id, prev_vote, -1)
+    _bump_flag_vote(instance.post_id, instance.vote, +1)
+
+
+@receiver(post_delete, sender=PostFlagVote)
+def maintain_flag_vote_counts_on_delete(sender, instance: PostFlagVote, **kwargs):
+    """
+    When a flag vote is deleted, decrement the matching counter.
+    """
+    if not applying_batch():
+        _bump_flag_vote(instance.post_id, instance.vote, -1)
+
+
+# ---------- For You candidate pool ----------
+# Only mark ids dirty here; candidate_pool.refresh_dirty() recomputes them in
+# batches outside the request. Views don't mark (see candidate_pool).
+
+
+@receiver(post_save, sender=Post)
+def refresh_candidate_on_post_save(sender, instance: Post, created, **kwargs):
+    """New top-level posts enter the pool; new replies/reposts change their target's score."""
+    ids = {instance.parent_id or instance.pk}
+    if created and instance.reposted_from_id:
+        ids.add(instance.reposted_from_id)
+    mark_dirty(ids)
+
+
+@receiver(pre_delete, sender=Post)
+def mark_candidate_deleting(sender, instance: Post, **kwargs):
+    deleting_post_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def refresh_candidate_on_post_delete(sender, instance: Post, **kwargs):
+    deleting_post_ids().discard(instance.pk)
+    mark_dirty({instance.parent_id, instance.reposted_from_id})
+
+
+@receiver(post_save, sender=VoteReaction)
+@receiver(post_delete, sender=VoteReaction)
+@receiver(post_save, sender=PostFlagVote)
+@receiver(post_delete, sender=PostFlagVote)
+def refresh_candidate_on_vote(sender, instance, **kwargs):
+    if not applying_batch():
+        mark_dirty([instance.post_id])
+
+
+# ---------- Per-university recent-post buffers ----------
+
+@receiver(post_save, sender=Post)
+def update_uni_buffer_on_post_save(sender, instance: Post, created, **kwargs):
+    uni_buffers.on_post_saved(instance, created)
+
+
+@receiver(post_delete, sender=Post)
+def update_uni_buffer_on_post_delete(sender, instance: Post, **kwargs):
+    uni_buffers.on_post_deleted(instance)
+
+
+# ---------- Person-search trigrams ----------
+
+@receiver(post_save, sender=Post)
+def sync_name_grams_on_post_save(sender, instance: Post, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'first_name' in update_fields:
+        person_search.sync_name_grams(instance)
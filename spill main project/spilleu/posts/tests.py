@@ -1,3 +1,901 @@
-from django.test import TestCase
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import (
+    AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.streaming import iter_json
+from notifications import outbox
+from notifications.models import Notification, OutboxEvent
+from users.models import City, Country, University, UniversityFollow, User
+from .feed_engine import (
+    calculate_post_score, explain_post_score, post_columns, rank_post_ids, score_posts_batch, top_k_indices,
+)
+from .batch import purge_keys
+from .candidate_pool import ranked_candidate_ids, rebuild_pool, refresh_dirty
+from .counters import counter_drift, rebuild_counters, record_seen_posts
+from .moderation import expire_suppressions
+from .person_search import person_filter, search_people
+from .models import (
+    DirtyCandidate, FeedCandidate, IdempotencyKey, Post, PostFlagVote, PostViewDaily, SavedPost, SeenPost, SeenReply,
+    VoteReaction,
+)
+from .cards import build_cards, post_card, post_preview_card, reply_card
+from .selectors import hydrate_posts
+from .serializers import PostPreviewSerializer, PostSerializer, ReplySerializer
+from .seen_set import load_seen_set
+from .uni_buffers import BUFFER_KEY, recent_rows
+from . import view_buffer
+from .viewer_state import viewer_context
+from .utils import apply_keyset, encode_cursor, normalize_name
+from .views import FeedView
+
+
+def make_university(name="Test University"):
+    country = Country.objects.create(name="Testland")
+    city = City.objects.create(name="Testville", country=country)
+    return University.objects.create(name=name, city=city)
+
+
+def make_user(email, university):
+    return User.objects.create_user(email, "pass12345", university=university)
+
+
+def make_post(author, flag=None, parent=None, **extra):
+    return Post.objects.create(
+        author=author,
+        flag=flag,
+        parent=parent,
+        first_name=extra.pop("first_name", "alex"),
+        content=extra.pop("content", "some content long enough to post"),
+        university=extra.pop("university", author.university),
+        **extra,
+    )
+
+
+class CounterConsistencyTests(TestCase):
+    """Stored Post counters must match their source rows after every write path."""
+
+    def setUp(self):
+        self.uni = make_university()
+        self.alice = make_user("alice@example.com", self.uni)
+        self.bob = make_user("bob@example.com", self.uni)
+
+    def assertConsistent(self):
+        self.assertEqual(counter_drift(), [])
+
+    def test_likes_and_replies(self):
+        tea = make_post(self.alice)
+        VoteReaction.objects.update_or_create(user=self.bob, post=tea, defaults={"reaction": "up"})
+        VoteReaction.objects.update_or_create(user=self.alice, post=tea, defaults={"reaction": "up"})
+        reply = make_post(self.bob, parent=tea)
+        VoteReaction.objects.create(user=self.alice, post=reply, reaction="up")
+        self.assertConsistent()
+
+        VoteReaction.objects.filter(user=self.bob, post=tea).delete()
+        reply.delete()
+        self.assertConsistent()
+
+        tea.refresh_from_db()
+        self.assertEqual((tea.like_count, tea.replies_count), (1, 0))
+
+    def test_flag_votes_switch_and_remove(self):
+        red = make_post(self.alice, flag="red")
+        PostFlagVote.objects.update_or_create(user=self.bob, post=red, defaults={"vote": "red"})
+        PostFlagVote.objects.update_or_create(user=self.alice, post=red, defaults={"vote": "red"})
+        PostFlagVote.objects.update_or_create(user=self.bob, post=red, defaults={"vote": "green"})
+        self.assertConsistent()
+
+        PostFlagVote.objects.filter(user=self.alice, post=red).delete()
+        self.assertConsistent()
+
+        red.refresh_from_db()
+        self.assertEqual((red.red_vote_count, red.green_vote_count), (0, 1))
+
+    def test_views_single_and_bulk(self):
+        first, second = make_post(self.alice), make_post(self.alice)
+        reply = make_post(self.bob, parent=first)
+        SeenPost.objects.get_or_create(user=self.alice, post=first)
+        SeenReply.objects.get_or_create(user=self.alice, reply=reply)
+        record_seen_posts(self.bob, [first.id, second.id, second.id, 999999])
+        record_seen_posts(self.bob, [first.id])  # replay adds nothing
+        self.assertConsistent()
+
+        first.refresh_from_db()
+        self.assertEqual(first.views_count, 2)
+        self.assertEqual(PostViewDaily.objects.get(post=first).unique_count, 2)
+        self.assertEqual(PostViewDaily.objects.get(post=second).unique_count, 1)
+
+    def test_bulk_views_count_only_inserted_rows(self):
+        first, second = make_post(self.alice), make_post(self.alice)
+        # A concurrent request inserted this row between our read and our insert
+        SeenPost.objects.bulk_create([SeenPost(user=self.bob, post=first)])
+        self.assertEqual(record_seen_posts(self.bob, [first.id, second.id]), {second.id})
+        first.refresh_from_db()
+        self.assertEqual(first.views_count, 0)  # bumped by the other request, not again here
+
+    def test_rebuild_repairs_drift(self):
+        tea = make_post(self.alice)
+        VoteReaction.objects.create(user=self.bob, post=tea, reaction="up")
+        Post.objects.filter(pk=tea.pk).update(like_count=7, replies_count=3)
+        self.assertEqual(len(counter_drift()), 2)
+
+        rebuild_counters()
+        self.assertConsistent()
+
+
+class CandidatePoolTests(TestCase):
+    """The For You pool must follow writes and rank like the reference scorer."""
+
+    def setUp(self):
+        self.uni = make_university()
+        self.users = [make_user(f"user{i}@example.com", self.uni) for i in range(4)]
+
+    def test_pool_tracks_writes_and_matches_reference(self):
+        author = self.users[0]
+        tea, quiet, red, hidden = (make_post(author), make_post(author),
+                                   make_post(author, flag="red"), make_post(author))
+        for u in self.users[1:]:
+            VoteReaction.objects.create(user=u, post=tea, reaction="up")
+        PostFlagVote.objects.create(user=self.users[1], post=red, vote="green")
+        PostFlagVote.objects.update_or_create(user=self.users[1], post=red, defaults={"vote": "red"})
+        make_post(self.users[2], parent=red)
+        record_seen_posts(self.users[3], [quiet.id, tea.id])
+        hidden.moderation_status = Post.MOD_SOFT
+        hidden.save(update_fields=["moderation_status"])
+
+        self.assertEqual(FeedCandidate.objects.count(), 0)  # writes only mark ids dirty
+        refresh_dirty()
+        self.assertEqual(DirtyCandidate.objects.count(), 0)
+        self.assertEqual(FeedCandidate.objects.count(), 3)  # replies and suppressed posts never enter the pool
+
+        now = timezone.now()
+        viewer = self.users[1]
+        user_data = {"followed_uni_ids": {self.uni.id}, "preferred_flag_type": None}
+        visible = [Post.objects.get(pk=p.pk) for p in (tea, quiet, red)]
+        expected = [p.id for p in sorted(
+            visible, key=lambda p: calculate_post_score(p, viewer, user_data, now=now), reverse=True)]
+        self.assertEqual(ranked_candidate_ids(viewer, user_data, 10, now=now), expected)
+        self.assertEqual(rank_post_ids(Post.objects.filter(id__in=expected), viewer, 10, user_data, now=now),
+                         expected)
+        self.assertEqual(ranked_candidate_ids(viewer, user_data, 10, seen_ids=[tea.id], now=now),
+                         [pid for pid in expected if pid != tea.id])
+
+        tea.delete()
+        self.assertFalse(FeedCandidate.objects.filter(post_id=tea.id).exists())
+
+
+class PrefilterTests(TestCase):
+    """Shortlisting by the SQL score bound must not change the top k."""
+
+    def setUp(self):
+        self.uni, other = make_university(), make_university("Other University")
+        self.viewer = make_user("viewer@example.com", self.uni)
+        author = make_user("author@example.com", other)
+        self.now = timezone.now()
+        rng = random.Random(5)
+        for i in range(30):
+            post = make_post(author, flag=rng.choice((None, "red", "green")),
+                             university=rng.choice((self.uni, other)))
+            Post.objects.filter(pk=post.pk).update(
+                like_count=rng.randint(0, 40), red_vote_count=rng.randint(0, 20),
+                green_vote_count=rng.randint(0, 20), replies_count=rng.choice((0, rng.randint(0, 15))),
+                views_count=rng.choice((0, 150, rng.randint(0, 3000))),
+                created_at=self.now - timedelta(hours=rng.uniform(0, 8 * 24)),
+            )
+        FeedCandidate.objects.all().delete()  # update() bypassed the pool receivers
+        rebuild_pool()
+        self.user_data = {"followed_uni_ids": {self.uni.id}, "preferred_flag_type": "green"}
+
+    def expected(self, posts, k):
+        posts = sorted(posts, key=lambda p: (p.created_at, p.id), reverse=True)
+        return [p.id for p in sorted(
+            posts, key=lambda p: calculate_post_score(p, self.viewer, self.user_data, now=self.now),
+            reverse=True)][:k]
+
+    def test_top_k_matches_full_computation(self):
+        posts = list(Post.objects.all())
+        pool = [p for p in posts if p.created_at >= self.now - timedelta(days=3)]
+        for cap in (1, 4, 1000):
+            self.assertEqual(rank_post_ids(Post.objects.all(), self.viewer, 5, self.user_data,
+                                           now=self.now, cap=cap), self.expected(posts, 5))
+            self.assertEqual(ranked_candidate_ids(self.viewer, self.user_data, 5, now=self.now, cap=cap),
+                             self.expected(pool, 5))
+
+        seen = self.expected(pool, 3)
+        self.assertEqual(ranked_candidate_ids(self.viewer, self.user_data, 5, seen_ids=seen, now=self.now, cap=2),
+                         self.expected([p for p in pool if p.id not in seen], 5))
+
+    def test_reads_only_the_shortlist(self):
+        with override_settings(FEED_PREFILTER_CAP=8), CaptureQueriesContext(connection) as ctx:
+            rank_post_ids(Post.objects.all(), self.viewer, 1, self.user_data, now=self.now)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn("LIMIT 8", ctx.captured_queries[0]["sql"])
+
+
+@override_settings(CACHE_SHARED=True)
+class RankedFeedTests(APITestCase):
+    """Ranked For You pages slice one cached snapshot: stable order, no repeats."""
+
+    def setUp(self):
+        cache.clear()
+        self.uni = make_university()
+        self.author = make_user("author@example.com", self.uni)
+        self.viewer = make_user("viewer@example.com", self.uni)
+        self.posts = [make_post(self.author) for _ in range(5)]
+        for i, post in enumerate(self.posts):
+            for voter in [make_user(f"v{i}-{j}@example.com", self.uni) for j in range(i)]:
+                VoteReaction.objects.create(user=voter, post=post, reaction="up")
+        refresh_dirty()
+        self.client.force_authenticate(self.viewer)
+
+    def fetch(self, **params):
+        resp = self.client.get(reverse("feed"), {"scope": "for_you", "page_size": 2, **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_pages_follow_snapshot(self):
+        expected = ranked_candidate_ids(self.viewer, {"followed_uni_ids": {self.uni.id}}, 10)
+        page = self.fetch(ranked=1)
+        seen = [item["id"] for item in page["items"]]
+        make_post(self.author)  # new posts must not shift later pages
+        while page["next_cursor"]:
+            page = self.fetch(cursor=page["next_cursor"])
+            self.assertEqual(page["mode"], "ranked")
+            seen += [item["id"] for item in page["items"]]
+        self.assertEqual(seen, expected)
+
+    def test_lost_snapshot_keeps_offset(self):
+        expected = ranked_candidate_ids(self.viewer, {"followed_uni_ids": {self.uni.id}}, 10)
+        cursor = self.fetch(ranked=1)["next_cursor"]
+        cache.clear()  # snapshot expired
+        self.assertEqual([item["id"] for item in self.fetch(cursor=cursor)["items"]], expected[2:4])
+
+        self.client.force_authenticate(make_user("other@example.com", self.uni))
+        page = self.fetch(cursor=cursor)  # foreign snapshot: re-ranked for the caller, not page 1 again
+        self.assertEqual([item["id"] for item in page["items"]], expected[2:4])
+
+    @override_settings(CACHE_SHARED=False)
+    def test_falls_back_without_shared_cache(self):
+        page = self.fetch(ranked=1)
+        self.assertNotEqual(page["mode"], "ranked")
+        self.assertEqual([item["id"] for item in page["items"]], [p.id for p in self.posts[:-3:-1]])
+
+
+class SeenSetTests(APITestCase):
+    """The cached seen-set must agree with SeenPost and drive the feed's unseen/seen split."""
+
+    def setUp(self):
+        cache.clear()
+        self.uni = make_university()
+        self.author = make_user("author@example.com", self.uni)
+        self.viewer = make_user("viewer@example.com", self.uni)
+        self.posts = [make_post(self.author) for _ in range(6)]
+
+    def test_tracks_committed_views(self):
+        old = make_post(self.author)
+        Post.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=60))
+        old.refresh_from_db()
+        SeenPost.objects.create(user=self.viewer, post=self.posts[0])
+        SeenPost.objects.create(user=self.viewer, post=old)
+
+        seen = load_seen_set(self.viewer)
+        self.assertEqual(seen.ids.tolist(), [self.posts[0].id])  # outside the window: not cached
+        with self.captureOnCommitCallbacks(execute=True):
+            record_seen_posts(self.viewer, [self.posts[1].id, self.posts[2].id])
+        with self.captureOnCommitCallbacks(execute=True):
+            SeenPost.objects.create(user=self.viewer, post=self.posts[3])
+
+        seen = load_seen_set(self.viewer)
+        rows = [(p.id, p.created_at) for p in self.posts + [old]]
+        self.assertEqual(seen.seen_among(rows), {old.id, *[p.id for p in self.posts[:4]]})
+
+    def test_local_cache_entries_expire_quickly(self):
+        load_seen_set(self.viewer)
+        SeenPost.objects.bulk_create([SeenPost(user=self.viewer, post=self.posts[0])])  # recorded by another worker
+        with override_settings(CACHE_SHARED=True):
+            self.assertEqual(load_seen_set(self.viewer).ids.tolist(), [])
+        cache.clear()
+        with override_settings(CACHE_SHARED=False, FEED_SEEN_LOCAL_TTL=0):
+            load_seen_set(self.viewer)
+            self.assertEqual(load_seen_set(self.viewer).ids.tolist(), [self.posts[0].id])
+
+    def test_feed_lists_unseen_then_seen(self):
+        record_seen_posts(self.viewer, [p.id for p in self.posts[::2]])
+        self.client.force_authenticate(self.viewer)
+        ids, cursor = [], None
+        for _ in range(5):
+            params = {"scope": "for_you", "page_size": 2, **({"cursor": cursor} if cursor else {})}
+            page = self.client.get(reverse("feed"), params).json()
+            ids += [(item["id"], item["is_seen"]) for item in page["items"]]
+            cursor = page["next_cursor"]
+            if not cursor or not page["items"]:
+                break
+        newest_first = [p.id for p in reversed(self.posts)]
+        unseen = [(pid, False) for pid in newest_first if pid not in {p.id for p in self.posts[::2]}]
+        seen = [(pid, True) for pid in newest_first if pid in {p.id for p in self.posts[::2]}]
+        self.assertEqual(ids, unseen + seen)
+
+    def test_scan_limit_returns_resumable_cursor(self):
+        newer = [make_post(self.author) for _ in range(40)]  # one full scan chunk, all seen
+        record_seen_posts(self.viewer, [p.id for p in self.posts[1:] + newer])
+        self.client.force_authenticate(self.viewer)
+        chunks, FeedView.seen_scan_chunks = FeedView.seen_scan_chunks, 1
+        try:
+            page = self.client.get(reverse("feed"), {"page_size": 1}).json()
+            self.assertEqual((page["items"], page["mode"]), ([], "unseen"))
+            page = self.client.get(reverse("feed"), {"page_size": 1, "cursor": page["next_cursor"]}).json()
+        finally:
+            FeedView.seen_scan_chunks = chunks
+        self.assertEqual([item["id"] for item in page["items"]], [self.posts[0].id])
+
+
+class ModerationSweepTests(APITestCase):
+    """`visible` follows moderation; the sweeper lifts lapsed suppressions everywhere."""
+
+    def setUp(self):
+        cache.clear()
+        self.uni = make_university()
+        self.viewer = make_user("viewer@example.com", self.uni)
+        self.posts = [make_post(self.viewer) for _ in range(3)]
+
+    def feed_ids(self):
+        self.client.force_authenticate(self.viewer)
+        return [item["id"] for item in self.client.get(reverse("feed"), {"scope": "my_uni"}).json()["items"]]
+
+    def test_sweep_restores_lapsed_suppressions(self):
+        lapsed, active, _ = self.posts
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            for post, until in ((lapsed, now - timedelta(minutes=1)), (active, now + timedelta(hours=1))):
+                post.moderation_status, post.moderation_until = Post.MOD_SOFT, until
+                post.save(update_fields=["moderation_status", "moderation_until"])
+        self.assertEqual(list(Post.objects.filter(visible=False).order_by("id").values_list("id", flat=True)),
+                         [lapsed.id, active.id])
+        self.assertEqual(self.feed_ids(), [self.posts[2].id])
+        self.assertFalse(FeedCandidate.objects.filter(post__in=[lapsed, active]).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_suppressions(), 1)
+        self.assertEqual(expire_suppressions(), 0)
+        lapsed.refresh_from_db()
+        self.assertEqual((lapsed.moderation_status, lapsed.visible), (Post.MOD_OK, True))
+        self.assertEqual(self.feed_ids(), [self.posts[2].id, lapsed.id])
+        self.assertTrue(FeedCandidate.objects.filter(post=lapsed).exists())
+
+
+class PersonSearchTests(TestCase):
+    """Person search ranks exact > prefix > fuzzy over the normalized first-name key."""
+
+    def setUp(self):
+        author = make_user("author@example.com", make_university())
+        self.posts = {name: make_post(author, first_name=name)
+                      for name in ("Zoë", " zoe ", "Zoey", "Chloe", "Alex", "Alexandra", "Lexi")}
+        make_post(author, parent=self.posts["Alex"], first_name="Alex")  # replies are not people results
+
+    def ids(self, *names):
+        return [self.posts[n].id for n in names]
+
+    def test_normalize(self):
+        self.assertEqual(normalize_name("  ZOË\t Ann "), "zoe ann")
+        self.assertEqual(self.posts["Zoë"].first_name_key, "zoe")
+
+    def test_ranking(self):
+        self.assertEqual(search_people("ZOE"), self.ids(" zoe ", "Zoë", "Zoey"))
+        self.assertEqual(search_people("lex"), self.ids("Lexi", "Alex", "Alexandra"))  # prefix, then containing
+        self.assertEqual(search_people("alexx"), self.ids("Alex", "Alexandra"))  # by trigram similarity
+        with override_settings(PERSON_SEARCH_TRIGRAMS=False):
+            self.assertEqual(search_people("lex"), self.ids("Lexi"))
+
+    def test_filter_and_rename(self):
+        top = Post.objects.filter(parent__isnull=True)
+        self.assertEqual(set(person_filter(top, "LEX").values_list("id", flat=True)),
+                         set(self.ids("Alex", "Alexandra", "Lexi")))
+        chloe = self.posts["Chloe"]
+        chloe.first_name = "Alexis"
+        chloe.save(update_fields=["first_name"])
+        self.assertEqual(Post.objects.get(pk=chloe.pk).first_name_key, "alexis")
+        self.assertIn(chloe.id, person_filter(top, "lex").values_list("id", flat=True))
+
+
+@override_settings(FEED_UNI_BUFFER_SIZE=3, CACHE_SHARED=True)
+class UniBufferTests(APITestCase):
+    """Merged university buffers must read like the keyset query, or defer to it."""
+
+    def setUp(self):
+        cache.clear()
+        first = make_university("First")
+        self.unis = [first, University.objects.create(name="Second", city=first.city)]
+        self.author = make_user("author@example.com", first)
+        self.viewer = make_user("viewer@example.com", first)
+        for uni in self.unis:
+            UniversityFollow.objects.create(user=self.viewer, university=uni)
+        self.posts = [make_post(self.author, university=self.unis[i]) for i in (0, 0, 1, 0, 1, 0)]
+
+    def rows(self, limit, after=(None, None)):
+        return recent_rows([u.id for u in self.unis], *after, limit, cutoff=timezone.now())
+
+    def expected(self, limit, after=(None, None)):
+        qs = Post.objects.filter(visible=True, parent__isnull=True, university__in=self.unis)
+        return list(apply_keyset(qs, *after).values_list('id', 'created_at')[:limit])
+
+    def test_buffers_follow_writes(self):
+        self.assertEqual(self.rows(4), self.expected(4))
+        self.assertIsNone(self.rows(6))  # past the depth of the first university's buffer
+        newest = self.posts[-1]
+        self.assertEqual(self.rows(2, after=(newest.created_at, newest.id)),
+                         self.expected(2, after=(newest.created_at, newest.id)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = make_post(self.author, university=self.unis[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[5].delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts[4].moderation_status = Post.MOD_SOFT
+            self.posts[4].save(update_fields=["moderation_status"])
+        self.assertEqual(self.rows(3), self.expected(3))
+        self.assertEqual(self.rows(1)[0][0], added.id)
+
+    def test_following_feed_matches_keyset_walk(self):
+        self.client.force_authenticate(self.viewer)
+        ids, cursor = [], None
+        while True:
+            params = {"scope": "following", "page_size": 2, **({"cursor": cursor} if cursor else {})}
+            page = self.client.get(reverse("feed"), params).json()
+            ids += [item["id"] for item in page["items"]]
+            cursor = page["next_cursor"]
+            if not cursor or not page["items"]:
+                break
+        self.assertEqual(ids, [pid for pid, _ in self.expected(10)])
+
+    @override_settings(CACHE_SHARED=False)
+    def test_local_cache_uses_keyset_query(self):
+        self.assertIsNone(self.rows(2))
+        self.assertEqual(cache.get(BUFFER_KEY.format(self.unis[0].id)), None)
+
+
+class ViewerStateTests(TestCase):
+    """Preloaded viewer state must serialize exactly like the per-row lookups, without them."""
+
+    def test_matches_per_row_lookups(self):
+        uni = make_university()
+        author, viewer = make_user("author@example.com", uni), make_user("viewer@example.com", uni)
+        tea, red, green = make_post(author), make_post(author, flag="red"), make_post(author, flag="green")
+        reply = make_post(author, parent=tea)
+        VoteReaction.objects.create(user=viewer, post=tea, reaction="up")
+        VoteReaction.objects.create(user=viewer, post=reply, reaction="up")
+        PostFlagVote.objects.create(user=viewer, post=red, vote="green")
+        SavedPost.objects.create(user=viewer, post=green)
+
+        request = RequestFactory().get("/")
+        request.user = viewer
+        for serializer, objs in ((PostSerializer, [tea, red, green]), (ReplySerializer, [reply])):
+            per_row = serializer(objs, many=True, context={"request": request}).data
+            context = viewer_context(request, objs)
+            with CaptureQueriesContext(connection) as queries:
+                preloaded = serializer(objs, many=True, context=context).data
+            self.assertEqual(preloaded, per_row)
+            tables = ("votereaction", "postflagvote", "savedpost")
+            self.assertFalse([q for q in queries if any(t in q["sql"] for t in tables)])
+
+
+class CardBuilderTests(TestCase):
+    """Golden test: card builders must render byte-identical JSON to the serializers."""
+
+    def test_cards_match_serializers(self):
+        uni = make_university()
+        author = make_user("author@example.com", uni)
+        author.date_of_birth = date(2002, 2, 28)
+        author.save(update_fields=["date_of_birth"])
+        viewer = make_user("viewer@example.com", uni)
+        posts = [
+            make_post(author),
+            make_post(viewer, flag="red", person_age=22, image_url="https://example.com/a.jpg"),
+            make_post(author, flag="green", first_name="sam"),
+        ]
+        reply = make_post(viewer, parent=posts[0], thread=posts[0])
+        VoteReaction.objects.create(user=viewer, post=posts[0], reaction="up")
+        VoteReaction.objects.create(user=viewer, post=reply, reaction="up")
+        PostFlagVote.objects.create(user=author, post=posts[1], vote="green")
+        PostFlagVote.objects.create(user=viewer, post=posts[2], vote="red")
+        SavedPost.objects.create(user=viewer, post=posts[2])
+        record_seen_posts(viewer, [posts[1].id])
+
+        posts = hydrate_posts([p.id for p in posts])
+        posts[1]._is_seen = True
+        replies = hydrate_posts([reply.id])
+        render = JSONRenderer().render
+        for user in (viewer, AnonymousUser()):
+            request = RequestFactory().get("/")
+            request.user = user
+            for serializer, card, objs in ((PostSerializer, post_card, posts),
+                                           (PostPreviewSerializer, post_preview_card, posts),
+                                           (ReplySerializer, reply_card, replies)):
+                expected = render(serializer(objs, many=True, context={"request": request}).data)
+                self.assertEqual(render(build_cards(objs, request, card)), expected)
+
+
+class BatchActionsTests(APITestCase):
+    """The set-based batch must answer like sequential execution and leave counters exact."""
+
+    def setUp(self):
+        cache.clear()
+        uni = make_university()
+        self.author = make_user("author@example.com", uni)
+        self.viewer = make_user("viewer@example.com", uni)
+        self.tea = make_post(self.author)
+        self.red = make_post(self.author, flag="red")
+        self.reply = make_post(self.author, parent=self.tea, thread=self.tea)
+        self.liked = make_post(self.author)
+        VoteReaction.objects.create(user=self.viewer, post=self.liked, reaction="up")
+        self.client.force_authenticate(self.viewer)
+
+    def post_batch(self, actions):
+        resp = self.client.post(reverse("batch"), {"actions": actions}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()["results"]
+
+    def test_matches_sequential_results(self):
+        missing = self.liked.id + 100
+        results = self.post_batch([
+            {"type": "like", "id": self.tea.id, "op": "add"},
+            {"type": "like", "id": self.tea.id, "op": "add"},
+            {"type": "like", "id": self.red.id, "op": "add"},
+            {"type": "like", "id": self.liked.id, "op": "remove"},
+            {"type": "like", "id": self.liked.id, "op": "remove"},
+            {"type": "like", "id": self.reply.id, "op": "sideways"},
+            {"type": "flag_vote", "id": self.red.id, "vote": "red"},
+            {"type": "flag_vote", "id": self.red.id, "vote": "green"},
+            {"type": "flag_vote", "id": self.reply.id, "vote": "red"},
+            {"type": "flag_vote", "id": self.tea.id, "vote": "red"},
+            {"type": "save", "id": self.tea.id, "op": "add"},
+            {"type": "save", "id": self.red.id, "op": "add"},
+            {"type": "save", "id": self.red.id, "op": "remove"},
+            {"type": "save", "id": missing, "op": "add"},
+            {"type": "view", "id": self.tea.id},
+            {"type": "like", "id": missing, "op": "add"},
+            {"type": "like", "id": "abc", "op": "add"},
+            {"type": "poke", "id": self.tea.id},
+        ])
+        not_found = "No Post matches the given query."
+        self.assertEqual(results, [
+            {"ok": True, "kind": "like", "id": self.tea.id},
+            {"ok": True, "kind": "like", "id": self.tea.id},
+            {"ok": False, "kind": "like", "id": self.red.id, "error": "Use flag voting on flagged posts"},
+            {"ok": True, "kind": "like", "id": self.liked.id},
+            {"ok": False, "kind": "like", "id": self.liked.id},
+            {"ok": True, "kind": "flag_vote", "id": self.red.id, "vote": "red"},
+            {"ok": True, "kind": "flag_vote", "id": self.red.id, "vote": "green"},
+            {"ok": False, "kind": "flag_vote", "id": self.reply.id, "error": not_found},
+            {"ok": False, "kind": "flag_vote", "id": self.tea.id, "error": "Only flagged posts accept red/green votes"},
+            {"ok": True, "kind": "save", "id": self.tea.id},
+            {"ok": True, "kind": "save", "id": self.red.id},
+            {"ok": True, "kind": "save", "id": self.red.id},
+            {"ok": False, "kind": "save", "id": missing, "error": "post not found"},
+            {"ok": True, "kind": "view", "id": self.tea.id, "skipped": True, "reason": "not committed"},
+            {"ok": False, "kind": "like", "id": missing, "error": not_found},
+            {"ok": False, "kind": "like", "id": "abc", "error": "Field 'id' expected a number but got 'abc'."},
+            {"ok": False, "id": self.tea.id, "error": "unknown type"},
+        ])
+
+        self.assertEqual(counter_drift(), [])
+        self.assertEqual(dict(PostFlagVote.objects.filter(user=self.viewer).values_list("post_id", "vote")),
+                         {self.red.id: "green"})
+        self.assertEqual(list(SavedPost.objects.filter(user=self.viewer).values_list("post_id", flat=True)),
+                         [self.tea.id])
+        outbox.process()
+        notified = Notification.objects.filter(user=self.author, actor=self.viewer)
+        self.assertEqual(sorted(notified.values_list("post_id", "kind")), sorted([
+            (self.tea.id, Notification.LIKE_ON_MY_POST), (self.red.id, Notification.FLAG_VOTE_ON_MY_POST)]))
+
+    def test_retried_actions_are_answered_from_cache(self):
+        actions = [
+            {"type": "like", "id": self.tea.id, "op": "add", "action_id": "a1"},
+            {"type": "like", "id": self.liked.id, "op": "remove", "action_id": "a2"},
+            {"type": "save", "id": self.tea.id, "op": "add", "action_id": "a3"},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.post_batch(actions)
+        outbox.process()
+        VoteReaction.objects.create(user=self.viewer, post=self.liked, reaction="up")  # liked again since
+        retried = self.post_batch(actions + [{"type": "like", "id": self.tea.id, "op": "remove", "action_id": "a1"}])
+        self.assertEqual(retried, first + first[:1])
+        self.assertTrue(VoteReaction.objects.filter(user=self.viewer, post=self.liked).exists())
+        outbox.process()
+        self.assertEqual(Notification.objects.filter(post=self.tea, kind=Notification.LIKE_ON_MY_POST).count(), 1)
+
+    def test_retried_batch_is_answered_from_cache(self):
+        headers = {"Idempotency-Key": "b1"}
+        actions = [{"type": "like", "id": self.tea.id, "op": "add"}]
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(reverse("batch"), {"actions": actions}, format="json", headers=headers)
+        with CaptureQueriesContext(connection) as ctx:
+            retried = self.client.post(reverse("batch"), {"actions": actions}, format="json", headers=headers)
+        self.assertEqual(retried.json(), first.json())
+        self.assertFalse([q["sql"] for q in ctx.captured_queries if "votereaction" in q["sql"]])
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=1))  # past the TTL
+        again = self.client.post(reverse("batch"), {"actions": actions + actions}, format="json", headers=headers)
+        self.assertEqual(len(again.json()["results"]), 2)  # ran again
+        self.assertEqual(purge_keys(), 0)
+
+        long_key = {"Idempotency-Key": "k" * 300}
+        self.assertEqual(self.client.post(reverse("batch"), {"actions": actions}, format="json",
+                                          headers=long_key).status_code, 400)
+
+    def test_query_count_is_flat(self):
+        posts = [make_post(self.author) for _ in range(25)]
+        actions = [{"type": "like", "id": p.id, "op": "add"} for p in posts]
+        actions += [{"type": "save", "id": p.id, "op": "add"} for p in posts]
+        with CaptureQueriesContext(connection) as ctx:
+            self.post_batch(actions)
+        self.assertEqual(VoteReaction.objects.filter(user=self.viewer).count(), 26)
+        self.assertEqual(counter_drift(), [])
+        # Notifications and pushes are queued as one outbox event: a fixed handful
+        self.assertLess(len(ctx.captured_queries), 25)
+
+    def test_deletes_skip_row_receivers(self):
+        VoteReaction.objects.create(user=self.author, post=self.liked, reaction="up")
+        DirtyCandidate.objects.all().delete()
+        events = OutboxEvent.objects.filter(kind="reactions_changed")
+        before = events.count()
+        self.post_batch([{"type": "like", "id": self.liked.id, "op": "remove"}])
+        self.liked.refresh_from_db()
+        self.assertEqual(self.liked.like_count, 1)  # decremented once, not once per receiver
+        self.assertEqual(events.count(), before + 1)
+        self.assertEqual(list(DirtyCandidate.objects.values_list("post_id", flat=True)), [self.liked.id])
+
+
+@override_settings(VIEW_BUFFER=True)
+class ViewBufferTests(APITestCase):
+    """Buffered views cost the request no writes and land deduplicated, with exact counters, on flush."""
+
+    def setUp(self):
+        cache.clear()
+        uni = make_university()
+        self.author = make_user("author@example.com", uni)
+        self.viewer = make_user("viewer@example.com", uni)
+        self.other = make_user("other@example.com", uni)
+        self.posts = [make_post(self.author) for _ in range(3)]
+        SeenPost.objects.create(user=self.viewer, post=self.posts[0])
+        self.client.force_authenticate(self.viewer)
+
+    def test_flush_records_views_once(self):
+        p0, p1, p2 = (p.id for p in self.posts)
+        load_seen_set(self.viewer)
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.post(reverse("batch"), {"commit_seen": True, "actions": [
+                {"type": "view", "id": pid} for pid in (p0, p1, p1, p2 + 100)]}, format="json")
+            self.client.post(reverse("mark-post-seen"), {"post_id": p1}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse([q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))])
+        self.assertFalse(SeenPost.objects.filter(post_id=p1).exists())
+        self.assertEqual(load_seen_set(self.viewer).contains([p1, p2]).tolist(), [True, False])  # hidden from the feed already
+
+        yesterday = timezone.now() - timedelta(days=1)
+        view_buffer.push_views(self.other.id, [p1, p2], ts=yesterday.timestamp())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(view_buffer.flush(), (6, 3))
+        self.assertEqual(view_buffer.flush(), (0, 0))
+        self.assertEqual(counter_drift(), [])
+        self.assertEqual(sorted(SeenPost.objects.values_list("user_id", "post_id")),
+                         sorted([(self.viewer.id, p0), (self.viewer.id, p1), (self.other.id, p1), (self.other.id, p2)]))
+        today, day_before = timezone.now().date(), yesterday.date()
+        self.assertEqual(sorted(PostViewDaily.objects.filter(post_id__in=(p1, p2)).values_list("post_id", "day", "unique_count")),
+                         sorted([(p1, today, 1), (p1, day_before, 1), (p2, day_before, 1)]))
+
+    def test_flush_waits_once_for_a_claimed_slot(self):
+        view_buffer._next_seq()  # claimed, never written
+        view_buffer.push_views(self.viewer.id, [self.posts[1].id])
+        self.assertEqual(view_buffer.flush(), (0, 0))
+        self.assertEqual(view_buffer.flush(), (1, 1))
+        self.assertEqual(Post.objects.get(pk=self.posts[1].pk).views_count, 1)
+
+
+class CounterSyncTests(APITestCase):
+    """posts/sync/ returns card-equal counter rows, and only for posts changed since the watermark."""
+
+    def setUp(self):
+        uni = make_university()
+        self.author = make_user("author@example.com", uni)
+        self.viewer = make_user("viewer@example.com", uni)
+        self.tea = make_post(self.author)
+        self.red = make_post(self.author, flag="red")
+        self.idle = make_post(self.author)
+        self.client.force_authenticate(self.viewer)
+
+    def sync(self, since=None):
+        body = {"ids": [self.tea.id, self.red.id, self.idle.id], **({"since": since} if since else {})}
+        resp = self.client.post(reverse("post-sync"), body, format="json")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    @override_settings(POST_SYNC_LAG_SECONDS=0)
+    def test_returns_changed_posts_only(self):
+        first = self.sync()
+        self.assertEqual(sorted(row[0] for row in first["posts"]), sorted([self.tea.id, self.red.id, self.idle.id]))
+
+        VoteReaction.objects.create(user=self.viewer, post=self.tea, reaction="up")
+        PostFlagVote.objects.create(user=self.viewer, post=self.red, vote="green")
+        SavedPost.objects.create(user=self.viewer, post=self.red)
+        make_post(self.viewer, parent=self.tea, thread=self.tea)
+        delta = self.sync(first["watermark"])
+
+        request = RequestFactory().get("/")
+        request.user = self.viewer
+        cards = {c["id"]: c for c in build_cards(hydrate_posts([self.tea.id, self.red.id]), request)}
+        self.assertEqual(sorted(row[0] for row in delta["posts"]), sorted(cards))
+        for row in delta["posts"]:
+            self.assertEqual(dict(zip(delta["fields"], row)), {f: cards[row[0]][f] for f in delta["fields"]})
+        self.assertEqual(self.sync(delta["watermark"])["posts"], [])
+
+    def test_rejects_bad_input(self):
+        for body in ({"ids": "1,2"}, {"ids": [1], "since": "yesterday"}, {"ids": list(range(1000))}):
+            self.assertEqual(self.client.post(reverse("post-sync"), body, format="json").status_code, 400)
+
+
+class StreamingJSONTests(APITestCase):
+    """Streamed list pages must be byte-identical to JSONRenderer's output."""
+
+    def test_iter_json_matches_renderer(self):
+        data = {
+            "items": [{"name": "zoë \u2028 \"quoted\"", "n": 1, "ok": True, "none": None, "tags": ["#a"]}] * 3000,
+            "next_cursor": None,
+            "at": timezone.now(),
+            "filters": {"name": "", "age": None},
+        }
+        chunks = list(iter_json(data))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks), JSONRenderer().render(data))
+
+    def test_feed_streams_long_pages(self):
+        uni = make_university()
+        author = make_user("author@example.com", uni)
+        posts = [make_post(author, flag=(None, "red", "green")[i % 3]) for i in range(6)]
+        SavedPost.objects.bulk_create([SavedPost(user=author, post=p) for p in posts])
+        self.client.force_authenticate(author)
+
+        cursor = encode_cursor({"mode": "unseen", "refresh_watermark": timezone.now().isoformat()})
+        for url, params in ((reverse("feed"), {"page_size": 10, "cursor": cursor}), (reverse("saved-posts-list"), {})):
+            with override_settings(STREAM_JSON_MIN_ITEMS=100):
+                expected = self.client.get(url, params)
+            with override_settings(STREAM_JSON_MIN_ITEMS=1):
+                streamed = self.client.get(url, params)
+            self.assertTrue(streamed.streaming)
+            self.assertEqual(streamed["Content-Type"], expected["Content-Type"])
+            self.assertEqual(b"".join(streamed.streaming_content), expected.content)
+
+
+@override_settings(CACHE_SHARED=True)
+class AsyncFeedTests(TransactionTestCase):
+    """AsyncFeedView must answer exactly like FeedView (its worker threads need committed rows)."""
+
+    def setUp(self):
+        cache.clear()
+        self.uni = make_university()
+        self.author = make_user("author@example.com", self.uni)
+        self.viewer = make_user("viewer@example.com", self.uni)
+        self.posts = [make_post(self.author) for _ in range(7)]
+        record_seen_posts(self.viewer, [p.id for p in self.posts[1::2]])
+        refresh_dirty()
+        self.auth = {"Authorization": f"Bearer {RefreshToken.for_user(self.viewer).access_token}"}
+
+    def fetch_both(self, params):
+        sync = Client().get(reverse("feed"), params, headers=self.auth)
+        async_resp = async_to_sync(AsyncClient().get)(reverse("feed-async"), params, headers=self.auth)
+        return sync, async_resp
+
+    def test_pages_match_sync_view(self):
+        unseen = [p.id for p in self.posts[0::2]]
+        for extra, expected in (({}, [p.id for p in self.posts]), ({"ranked": 1}, unseen)):
+            first_sync, first_async = self.fetch_both({"page_size": 3, **extra})
+            self.assertEqual(first_async.status_code, 200)
+            a, b = first_sync.json(), first_async.json()
+            self.assertEqual(a["items"], b["items"])
+            self.assertEqual((a["mode"], a["has_more"]), (b["mode"], b["has_more"]))
+
+            cursor, ids = a["next_cursor"], [item["id"] for item in a["items"]]
+            while cursor:  # same cursor in, byte-identical page out (unseen -> seen backfill -> seen)
+                sync, async_resp = self.fetch_both({"page_size": 3, "cursor": cursor, **extra})
+                self.assertEqual(sync.content, async_resp.content)
+                cursor = sync.json()["next_cursor"]
+                ids += [item["id"] for item in sync.json()["items"]]
+            self.assertEqual(sorted(ids), expected)  # ranking leaves seen posts out
+
+    def test_unauthenticated(self):
+        resp = async_to_sync(AsyncClient().get)(reverse("feed-async"))
+        self.assertEqual(resp.status_code, 401)
+        self.assertEqual(resp.content, Client().get(reverse("feed")).content)
+
+
+@override_settings(CACHE_SHARED=True)
+class FeedDebugTests(APITestCase):
+    """?debug=1 is staff-only and explains the scores it returns."""
+
+    def setUp(self):
+        self.uni = make_university()
+        self.author = make_user("author@example.com", self.uni)
+        make_post(self.author), make_post(self.author, flag="red")
+        refresh_dirty()
+
+    def test_staff_debug_output(self):
+        staff = make_user("staff@example.com", self.uni)
+        staff.is_staff = True
+        staff.save(update_fields=["is_staff"])
+        self.client.force_authenticate(staff)
+        resp = self.client.get(reverse("feed"), {"ranked": 1, "debug": 1})
+        stages = [part.split(";")[0] for part in resp["Server-Timing"].split(", ")]
+        self.assertEqual(stages, ["query", "rank", "hydrate", "serialize", "explain", "db"])
+        scores = resp.json()["debug"]["scores"]
+        self.assertEqual([s["id"] for s in scores], [item["id"] for item in resp.json()["items"]])
+        self.assertEqual(len(scores), 2)
+        self.assertLessEqual({"vote_score", "eng_rate_term", "zero_penalty", "decay", "university_boost",
+                              "flag_boost", "score"}, set(scores[0]))
+
+    def test_hidden_from_non_staff(self):
+        self.client.force_authenticate(self.author)
+        resp = self.client.get(reverse("feed"), {"debug": 1})
+        self.assertNotIn("Server-Timing", resp)
+        self.assertNotIn("debug", resp.json())
+
+
+class BatchScorerTests(SimpleTestCase):
+    """score_posts_batch() must match the scalar reference exactly."""
+
+    def random_posts(self, n, now, seed=7):
+        rng = random.Random(seed)
+        return [SimpleNamespace(
+            flag=rng.choice((None, "red", "green", "")),
+            like_count=rng.choice((0, 0, rng.randint(0, 500))),
+            red_vote_count=rng.choice((0, rng.randint(0, 300))),
+            green_vote_count=rng.choice((0, rng.randint(0, 300))),
+            replies_count=rng.choice((0, rng.randint(0, 100))),
+            repost_count=rng.choice((0, rng.randint(0, 10))),
+            views_count=rng.choice((0, 99, 100, 101, rng.randint(0, 50_000))),
+            created_at=now - timedelta(seconds=rng.uniform(0, 10 * 24 * 3600)),
+            university_id=rng.randint(1, 6),
+        ) for _ in range(n)]
+
+    def assertMatchesScalar(self, posts, user, user_data, now):
+        batch = score_posts_batch(**post_columns(posts), user=user, user_data=user_data, now=now)
+        scalar = [calculate_post_score(p, user, user_data, now=now) for p in posts]
+        self.assertEqual(batch.tolist(), scalar)
+
+    def test_identical_to_scalar(self):
+        now = timezone.now()
+        posts = self.random_posts(5000, now)
+        user_data = {"followed_uni_ids": {2, 3}, "preferred_flag_type": "red"}
+        self.assertMatchesScalar(posts, SimpleNamespace(university_id=1), user_data, now)
+        self.assertMatchesScalar(posts, SimpleNamespace(university_id=None), {"followed_uni_ids": set()}, now)
+        self.assertMatchesScalar(posts, SimpleNamespace(university_id=None), {"followed_uni_ids": {None, 3}}, now)
+        self.assertMatchesScalar(posts, None, {}, now)
+
+    def test_explain_matches_scalar(self):
+        now = timezone.now()
+        user, user_data = SimpleNamespace(university_id=1), {"followed_uni_ids": {2}, "preferred_flag_type": "green"}
+        for p in self.random_posts(2000, now, seed=11):
+            self.assertEqual(explain_post_score(p, user, user_data, now=now)["score"],
+                             calculate_post_score(p, user, user_data, now=now))
+
+    def test_empty(self):
+        self.assertEqual(len(score_posts_batch(**post_columns([]))), 0)
+
+    def test_top_k_matches_stable_sort(self):
+        rng = random.Random(3)
+        for n, k in ((0, 5), (3, 5), (50, 50), (1000, 20), (1000, 1)):
+            scores = [float(rng.randint(0, 30)) for _ in range(n)]  # plenty of ties
+            expected = sorted(range(n), key=lambda i: scores[i], reverse=True)[:k]
+            self.assertEqual(top_k_indices(np.asarray(scores), k).tolist(), expected)
@@ -0,0 +1,167 @@
+# posts/uni_buffers.py
+"""
+Per-university ring buffers of recent top-level posts.
+
+The following/my_uni scopes are a chronological walk over one or a handful of
+universities. Each university gets a cached list of its newest
+FEED_UNI_BUFFER_SIZE visible top-level posts as (created_at, id) entries,
+newest first, so a page is a k-way merge of the relevant buffers
+instead of a ``university_id IN (...)`` keyset query. The database is only hit
+to hydrate the page, or when a cursor runs past the buffer depth.
+
+Maintenance (receivers in posts/signals.py, after commit):
+
+* post created -> appended to its university's buffer, oldest entry dropped;
+* post deleted -> trimmed out of the buffer;
+* post edited or moderated -> the buffer is dropped and rebuilt on next read
+  (posts/moderation.py drops it too when a suppression lapses).
+
+Writers take a short cache lock and drop the buffer when they can't get it.
+A reader rebuilding concurrently with a write can still cache a buffer that
+misses the new post; FEED_UNI_BUFFER_TTL bounds how long that lasts.
+
+Writes only reach the buffers of the worker's own cache, so the buffers are
+used only with CACHE_SHARED; otherwise recent_rows() returns None and the feed
+runs the keyset query.
+"""
+
+import heapq
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Post
+
+BUFFER_KEY = "feed:uni:{}:recent:v2"
+LOCK_TIMEOUT = 5
+
+
+def _depth():
+    return getattr(settings, "FEED_UNI_BUFFER_SIZE", 200)
+
+
+def _ttl():
+    return getattr(settings, "FEED_UNI_BUFFER_TTL", 300)
+
+
+def _enabled():
+    return getattr(settings, "CACHE_SHARED", False)
+
+
+def _build(university_id):
+    depth = _depth()
+    entries = list(Post.objects
+                   .filter(university_id=university_id, visible=True, parent__isnull=True)
+                   .order_by('-created_at', '-id')
+                   .values_list('created_at', 'id')[:depth])
+    return {"entries": entries, "complete": len(entries) < depth}
+
+
+def load_buffers(university_ids):
+    """{university_id: buffer} for every id, rebuilding cache misses."""
+    keys = {BUFFER_KEY.format(uid): uid for uid in set(university_ids) if uid}
+    found = cache.get_many(list(keys))
+    buffers = {keys[k]: v for k, v in found.items()}
+    for key, uid in keys.items():
+        if uid not in buffers:
+            buffers[uid] = _build(uid)
+            cache.add(key, buffers[uid], _ttl())
+    return buffers
+
+
+def recent_rows(university_ids, after_created_at, after_id, limit, cutoff):
+    """
+    Up to `limit` (id, created_at) rows across `university_ids`, newest first,
+    strictly after the (after_created_at, after_id) keyset position and not
+    newer than `cutoff`. Returns None when the buffers can't answer exactly
+    (the walk ran past the depth of a truncated buffer, or the cache isn't
+    shared); query the DB then.
+    """
+    if not _enabled():
+        return None
+    buffers = load_buffers(university_ids)
+    if not buffers:
+        return []
+
+    # Below the oldest entry of a truncated buffer, posts may be missing
+    floor = max((b["entries"][-1] for b in buffers.values() if not b["complete"] and b["entries"]),
+                default=None)
+    after = (after_created_at, after_id) if after_created_at and after_id else None
+
+    rows = []
+    merged = heapq.merge(*(b["entries"] for b in buffers.values()), reverse=True)
+    for key in merged:
+        created_at, pid = key
+        if floor is not None and key < floor:
+            return None
+        if created_at > cutoff or (after and key >= after):
+            continue
+        rows.append((pid, created_at))
+        if len(rows) == limit:
+            return rows
+    return rows if floor is None else None
+
+
+def _update(university_id, fn):
+    """
+    Apply `fn(buffer)` under the buffer lock. The buffer is dropped instead
+    when the lock is contended or `fn` returns False.
+    """
+    key = BUFFER_KEY.format(university_id)
+    lock = key + ":lock"
+    if not cache.add(lock, 1, LOCK_TIMEOUT):
+        cache.delete(key)
+        return
+    try:
+        buffer = cache.get(key)
+        if buffer is not None:
+            if fn(buffer) is False:
+                cache.delete(key)
+            else:
+                cache.set(key, buffer, _ttl())
+    finally:
+        cache.delete(lock)
+
+
+def append_post(post):
+    if not post.visible:
+        return
+
+    def add(buffer):
+        entries = buffer["entries"]
+        entries.append((post.created_at, post.id))
+        entries.sort(reverse=True)
+        if len(entries) > _depth():
+            del entries[_depth():]
+            buffer["complete"] = False
+
+    _update(post.university_id, add)
+
+
+def remove_post(university_id, post_id):
+    def trim(buffer):
+        buffer["entries"] = [e for e in buffer["entries"] if e[1] != post_id]
+        return buffer["complete"] or bool(buffer["entries"])  # an empty truncated buffer has no floor
+
+    _update(university_id, trim)
+
+
+def invalidate(university_id):
+    cache.delete(BUFFER_KEY.format(university_id))
+
+
+def on_post_saved(post, created):
+    if post.parent_id or not post.university_id or not _enabled():
+        return
+    if created:
+        transaction.on_commit(lambda: append_post(post))
+    else:
+        transaction.on_commit(lambda: invalidate(post.university_id))
+
+
+def on_post_deleted(post):
+    if post.parent_id or not post.university_id or not _enabled():
+        return
+    university_id, post_id = post.university_id, post.pk
+    transaction.on_commit(lambda: remove_post(university_id, post_id))
@@ -1,5 +1,6 @@
 # posts/urls.py
 
+from django.conf import settings
 from django.urls import path
 from .views import (
     CreatePostView,
@@ -13,6 +14,7 @@ from .views import (
     RemoveVoteReactionView,
     SavePostView,
     BatchActionsView,
+    CounterSyncView,
     SavedPostsListView,
     VoteReactionView,
     FlagVoteView,  # NEW
@@ -22,6 +24,7 @@ from .views import (
     UserPostsView,
     cloudinary_signature,
 )
+from .views_async import AsyncFeedView
 
 urlpatterns = [
     # Posts
@@ -47,8 +50,13 @@ urlpatterns = [
     path("seen/post/", MarkPostSeenView.as_view(), name="mark-post-seen"),
 
     # Feed with person search
-    path("feed/", FeedView.as_view(), name="feed"),
+    # (AsyncFeedView under ASGI, see core/asgi.py; /feed/async/ always async)
+    path("feed/", (AsyncFeedView if settings.FEED_ASYNC else FeedView).as_view(), name="feed"),
+    path("feed/async/", AsyncFeedView.as_view(), name="feed-async"),
     
+    # Counter delta-sync for posts the client already shows
+    path("sync/", CounterSyncView.as_view(), name="post-sync"),
+
     # Batch actions (updated for new voting system)
     path("batch/", BatchActionsView.as_view(), name="batch"),
 
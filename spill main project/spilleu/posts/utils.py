@@ -1,6 +1,7 @@
 # posts/utils.py - NEW FILE
 import base64
 import json
+import unicodedata
 from django.utils import timezone
 from django.db.models import Q
 
@@ -47,3 +48,19 @@ def resolve_image_url(file_field) -> str | None:
         return file_field.url
     except Exception:
         return None
+
+
+def normalize_name(value) -> str:
+    """Person-search key: accent-folded, case-folded, whitespace-collapsed ("  Zoë  Ann" -> "zoe ann")."""
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return " ".join(folded.split())[:30]
+
+
+def name_grams(key: str) -> set:
+    """Trigrams of a normalized name, padded like pg_trgm ("  a", " al", "ale", ..., "ex ")."""
+    grams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
@@ -0,0 +1,158 @@
+# posts/view_buffer.py
+"""
+Write-behind buffer for view events.
+
+Scrolling is by far the largest write load: every commit_seen batch and
+every MarkPostSeenView call inserted SeenPost rows inside the request's
+transaction and bumped views_count and PostViewDaily while holding it. With
+VIEW_BUFFER on, a request instead appends (user_id, post_id, ts) events to an
+append-only log in the cache and returns. ``manage.py flush_view_events``
+drains the log in large batches, one transaction per batch:
+
+* events are deduplicated per (user, post), keeping the earliest ts, and
+  against existing SeenPost rows; unknown post ids are dropped;
+* new SeenPost rows are bulk-inserted (seen_at is the flush time);
+* views_count and PostViewDaily (bucketed by the event's day) get one UPDATE
+  per distinct delta, not one per row.
+
+The log is a sequence counter plus one cache entry per append ("slot"). The
+flusher reads slots in order from its own cursor. A slot is claimed with
+``incr`` before it is written, so a missing slot can be a write in flight: the
+flusher stops there and skips it only if it is still missing on the next run.
+A batch replayed after a crash is harmless, since the SeenPost dedup makes
+flushing idempotent.
+
+Requests add the ids to the viewer's cached seen-set straight away, so feeds
+don't serve them again while they wait in the buffer. The log lives in the
+cache, so it needs a shared one (REDIS_URL); VIEW_BUFFER defaults to on only
+when that is configured.
+"""
+
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .candidate_pool import refresh_candidates
+from .counters import add_view_counts
+from .models import Post, SeenPost
+from .seen_set import add_seen, add_seen_on_commit
+
+SEQ_KEY = "views:log:seq"
+CURSOR_KEY = "views:log:cursor"
+GAP_KEY = "views:log:gap"
+SLOT_KEY = "views:log:{}"
+LOCK_KEY = "views:log:lock"
+LOCK_TIMEOUT = 300
+
+
+def enabled():
+    return getattr(settings, "VIEW_BUFFER", False)
+
+
+def _ttl():
+    return getattr(settings, "VIEW_BUFFER_TTL", 24 * 3600)
+
+
+def _next_seq():
+    try:
+        return cache.incr(SEQ_KEY)
+    except ValueError:
+        cache.add(SEQ_KEY, 0, None)
+        return cache.incr(SEQ_KEY)
+
+
+def push_views(user_id, post_ids, ts=None):
+    """Append one view event per post id. Two cache writes, no queries."""
+    post_ids = list(dict.fromkeys(post_ids))
+    if not post_ids:
+        return
+    ts = int(ts or time.time())
+    cache.set(SLOT_KEY.format(_next_seq()), [(user_id, pid, ts) for pid in post_ids], _ttl())
+    add_seen(user_id, post_ids)
+
+
+def read_events(max_events):
+    """
+    (events, cursor): events from slots after the flush cursor, up to about
+    `max_events`, and the sequence number they run to.
+    """
+    cursor = cache.get(CURSOR_KEY, 0)
+    head = cache.get(SEQ_KEY, 0)
+    events = []
+    while cursor < head and len(events) < max_events:
+        seqs = range(cursor + 1, min(head, cursor + 500) + 1)
+        slots = cache.get_many([SLOT_KEY.format(s) for s in seqs])
+        for seq in seqs:
+            slot = slots.get(SLOT_KEY.format(seq))
+            if slot is None:
+                # Claimed but not written yet, or lost: wait one run, then skip
+                if cache.get(GAP_KEY) != seq:
+                    cache.set(GAP_KEY, seq, None)
+                    return events, cursor
+            else:
+                events.extend(slot)
+            cursor = seq
+            if len(events) >= max_events:
+                break
+    return events, cursor
+
+
+def _advance(cursor):
+    old = cache.get(CURSOR_KEY, 0)
+    cache.set(CURSOR_KEY, cursor, None)
+    cache.delete_many([SLOT_KEY.format(s) for s in range(old + 1, cursor + 1)])
+
+
+def apply_events(events):
+    """
+    Record `events` set-wise. Returns the number of new (user, post) views.
+    Idempotent: events already in SeenPost are ignored.
+    """
+    first_seen = {}
+    for user_id, post_id, ts in events:
+        key = (user_id, post_id)
+        if key not in first_seen or ts < first_seen[key]:
+            first_seen[key] = ts
+    if not first_seen:
+        return 0
+
+    user_ids = {u for u, _ in first_seen}
+    post_ids = set(Post.objects.filter(id__in={p for _, p in first_seen}).values_list("id", flat=True))
+    existing = set(SeenPost.objects.filter(user_id__in=user_ids, post_id__in=post_ids)
+                   .values_list("user_id", "post_id"))
+    new = {key: ts for key, ts in first_seen.items() if key[1] in post_ids and key not in existing}
+    if not new:
+        return 0
+
+    SeenPost.objects.bulk_create([SeenPost(user_id=u, post_id=p) for u, p in new],
+                                 ignore_conflicts=True, batch_size=1000)
+    add_view_counts(Counter(
+        (pid, datetime.fromtimestamp(ts, dt_timezone.utc).date()) for (_, pid), ts in new.items()))
+    refresh_candidates({pid for _, pid in new})
+    by_user = {}
+    for user_id, post_id in new:
+        by_user.setdefault(user_id, []).append(post_id)
+    for user_id, ids in by_user.items():
+        add_seen_on_commit(user_id, ids)
+    return len(new)
+
+
+def flush(max_events=50_000):
+    """
+    Drain up to `max_events` buffered events. Returns (events read, new
+    views recorded), or None when another flush holds the lock.
+    """
+    if not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        return None
+    try:
+        events, cursor = read_events(max_events)
+        with transaction.atomic():
+            recorded = apply_events(events)
+        _advance(cursor)
+        return len(events), recorded
+    finally:
+        cache.delete(LOCK_KEY)
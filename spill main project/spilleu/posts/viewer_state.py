@@ -0,0 +1,70 @@
+# posts/viewer_state.py
+"""
+Requesting user's state (like, flag vote, saved) for a page of posts.
+
+Post serializers used to look each of these up per row. List views load them
+for the whole page in three queries and pass the result through serializer
+context as ``viewer_state``; serializers fall back to the per-row lookup for
+posts the loader did not cover (e.g. nested parents and replies on detail).
+"""
+
+from .models import PostFlagVote, SavedPost, VoteReaction
+
+
+class ViewerState:
+    def __init__(self, post_ids, reactions=None, flag_votes=None, saved_ids=None):
+        self.post_ids = set(post_ids)
+        self.reactions = reactions or {}
+        self.flag_votes = flag_votes or {}
+        self.saved_ids = saved_ids or set()
+
+    # One independent query each (the async feed runs them concurrently)
+    @staticmethod
+    def load_reactions(user, ids):
+        return dict(VoteReaction.objects.filter(user=user, post_id__in=ids).values_list("post_id", "reaction"))
+
+    @staticmethod
+    def load_flag_votes(user, ids):
+        return dict(PostFlagVote.objects.filter(user=user, post_id__in=ids).values_list("post_id", "vote"))
+
+    @staticmethod
+    def load_saved_ids(user, ids):
+        return set(SavedPost.objects.filter(user=user, post_id__in=ids).values_list("post_id", flat=True))
+
+    @classmethod
+    def load(cls, user, posts):
+        """Three queries for any number of `posts` (objects or ids)."""
+        ids = {getattr(p, "id", p) for p in posts}
+        if not ids or not (user and user.is_authenticated):
+            return cls(ids)
+        return cls(
+            ids,
+            reactions=cls.load_reactions(user, ids),
+            flag_votes=cls.load_flag_votes(user, ids),
+            saved_ids=cls.load_saved_ids(user, ids),
+        )
+
+    def covers(self, post_id):
+        return post_id in self.post_ids
+
+    def reaction(self, post_id):
+        return self.reactions.get(post_id)
+
+    def flag_vote(self, post_id):
+        return self.flag_votes.get(post_id)
+
+    def saved(self, post_id):
+        return post_id in self.saved_ids
+
+
+def viewer_state_for(context, obj):
+    """The context's ViewerState if it covers `obj`, else None."""
+    state = context.get("viewer_state")
+    if state is not None and state.covers(obj.id):
+        return state
+    return None
+
+
+def viewer_context(request, posts):
+    """Serializer context for a list of `posts` with the viewer state preloaded."""
+    return {"request": request, "viewer_state": ViewerState.load(request.user, posts)}
@@ -1,11 +1,13 @@
 # posts/views.py
 
 import time
-from datetime import datetime, timedelta
+from datetime import timedelta
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q, Count, F, Case, When, Value, FloatField, Max
+from django.db.models import F, Case, When, Value, FloatField, Max
 from django.db.models.functions import Greatest
+from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status, throttling
@@ -15,9 +17,10 @@ from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticate
 from rest_framework.decorators import api_view, permission_classes
 
 from users.permissions import IsSelfieVerified
-from users.models import UniversityFollow
 
-from posts.feed_engine import calculate_post_score, get_for_you_feed, rank_posts
+from core.streaming import StreamingJSONResponse, should_stream
+from core.timing import StageTimer, is_debug_request
+from posts.feed_engine import calculate_post_score, explain_posts, get_for_you_feed, rank_posts
 from .models import (
     Post, PostFlagVote, SeenPost, SeenReply,
     VoteReaction, SavedPost, ReportedPost, Hashtag
@@ -32,8 +35,17 @@ from .search_service import (
     posts_for_hashtag, search_posts, search_universities,
     search_hashtags, trending_hashtags,
 )
-from .selectors import scope_filter
-from .utils import encode_cursor, decode_cursor, apply_keyset
+from .selectors import hydrate_posts
+from .batch import MAX_KEY_LENGTH, ActionBatch, claim_batch, finish_batch
+from .counters import record_seen_posts
+from .person_search import search_people
+from .feed_query import ChronologicalFeed, FeedRequest, ranked_page_ids
+from .seen_set import load_seen_set
+from .cards import (
+    COUNTER_COLUMNS, COUNTER_FIELDS, build_cards, counter_row, iter_cards, post_card, post_preview_card, reply_card,
+)
+from .viewer_state import ViewerState
+from . import view_buffer
 
 # Cloudinary imports
 import cloudinary
@@ -51,6 +63,29 @@ class SustainedBatchThrottle(throttling.UserRateThrottle):
     scope = "batch_sustained"
 
 
+# --------------------------------------------------
+# Card rendering for list views
+# --------------------------------------------------
+class CardListMixin:
+    """
+    Generic list views: render the page with a plain-dict card builder
+    (posts/cards.py) instead of `serializer_class`. The output is identical;
+    viewer likes/votes/saves are loaded once for the page. Long pages stream
+    (core/streaming.py).
+    """
+    card = post_card
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(build_cards(queryset, request, type(self).card))
+        if should_stream(request, len(page)):
+            response = self.get_paginated_response(iter_cards(page, request, type(self).card))
+            return StreamingJSONResponse(response.data, stream_key="results")
+        return self.get_paginated_response(build_cards(page, request, type(self).card))
+
+
 # --------------------------------------------------
 # Batch actions (updated for new voting system)
 # --------------------------------------------------
@@ -59,6 +94,22 @@ class BatchActionsView(APIView):
     throttle_classes = [BurstBatchThrottle, SustainedBatchThrottle]
 
     def post(self, request):
+        # A retried batch is answered with the stored body (posts/batch.py) without running again
+        batch_key = request.headers.get("Idempotency-Key") or request.data.get("batch_id")
+        action_ids = [a.get("action_id") for a in request.data.get("actions", []) or [] if isinstance(a, dict)]
+        if any(len(str(k)) > MAX_KEY_LENGTH for k in [batch_key, *action_ids] if k is not None):
+            return Response({"error": f"Idempotency keys are limited to {MAX_KEY_LENGTH} characters."}, status=400)
+        if not batch_key:
+            return Response(self.run_actions(request), status=200)
+
+        previous = claim_batch(request.user.id, str(batch_key))
+        if previous is not None:
+            return Response(previous, status=200)
+        body = self.run_actions(request)
+        finish_batch(request.user.id, str(batch_key), body)
+        return Response(body, status=200)
+
+    def run_actions(self, request):
         actions = request.data.get("actions", []) or []
         commit_seen_hdr = (request.headers.get("X-Commit-Seen") or "").strip().lower() in {"1", "true", "yes"}
         commit_seen_body = bool(request.data.get("commit_seen"))
@@ -67,83 +118,31 @@ class BatchActionsView(APIView):
         out = []
         view_ids_unique = []
 
-        for action in actions:
-            action_type = (action.get('type') or 'unknown').lower()
-            pid = action.get('id')
-
-            if action_type == 'view':
-                if pid and isinstance(pid, int):
-                    view_ids_unique.append(pid)
-                if not commit_seen:
-                    out.append({"ok": True, "kind": "view", "id": pid, "skipped": True, "reason": "not committed"})
+        # Likes, flag votes and saves run set-wise (posts/batch.py); results
+        # come back in action order, None for views and unknown ops
+        results = ActionBatch(request.user, actions).run()
+        for action, result in zip(actions, results):
+            if (action.get('type') or 'unknown').lower() != 'view':
+                if result is not None:
+                    out.append(result)
                 continue
 
+            pid = action.get('id')
+            if pid and isinstance(pid, int):
+                view_ids_unique.append(pid)
+            if not commit_seen:
+                out.append({"ok": True, "kind": "view", "id": pid, "skipped": True, "reason": "not committed"})
+
+        # Bulk commit of view actions (bumps views_count / PostViewDaily set-wise),
+        # or hand them to the write-behind buffer (posts/view_buffer.py)
+        if commit_seen and view_ids_unique and view_buffer.enabled():
+            view_buffer.push_views(request.user.id, view_ids_unique)
+            out.extend({"ok": True, "kind": "view", "id": pid, "committed": True} for pid in view_ids_unique)
+        elif commit_seen and view_ids_unique:
             try:
-                if action_type == "like":
-                    # Handle likes (Tea posts and comments only)
-                    post = get_object_or_404(Post, pk=pid)
-                    if post.parent_id is None and post.flag in ("red", "green"):
-                        out.append({"ok": False, "kind": "like", "id": pid, "error": "Use flag voting on flagged posts"})
-                        continue
-                    
-                    op = action.get("op", "").lower()
-                    if op == "add":
-                        VoteReaction.objects.update_or_create(
-                            user=request.user, post=post, defaults={"reaction": "up"}
-                        )
-                        out.append({"ok": True, "kind": "like", "id": pid})
-                    elif op == "remove":
-                        deleted, _ = VoteReaction.objects.filter(user=request.user, post=post).delete()
-                        out.append({"ok": bool(deleted), "kind": "like", "id": pid})
-
-                elif action_type == "flag_vote":
-                    # Handle flag votes (Red/Green posts only)
-                    post = get_object_or_404(Post, pk=pid, parent__isnull=True)
-                    if post.flag not in ("red", "green"):
-                        out.append({"ok": False, "kind": "flag_vote", "id": pid, "error": "Only flagged posts accept red/green votes"})
-                        continue
-                    
-                    vote = action.get("vote", "").lower()
-                    if vote in ("red", "green"):
-                        PostFlagVote.objects.update_or_create(
-                            user=request.user, post=post, defaults={"vote": vote}
-                        )
-                        out.append({"ok": True, "kind": "flag_vote", "id": pid, "vote": vote})
-                    elif vote == "remove":
-                        deleted, _ = PostFlagVote.objects.filter(user=request.user, post=post).delete()
-                        out.append({"ok": bool(deleted), "kind": "flag_vote", "id": pid})
-
-                elif action_type == "save":
-                    op = action.get("op", "").lower()
-                    if op == "add":
-                        SavedPost.objects.get_or_create(user=request.user, post_id=pid)
-                        out.append({"ok": True, "kind": "save", "id": pid})
-                    elif op == "remove":
-                        deleted, _ = SavedPost.objects.filter(user=request.user, post_id=pid).delete()
-                        out.append({"ok": bool(deleted), "kind": "save", "id": pid})
-
-                else:
-                    out.append({"ok": False, "id": pid, "error": "unknown type"})
-
-            except Post.DoesNotExist:
-                out.append({"ok": False, "kind": action_type, "id": pid, "error": "post not found"})
-            except Exception as e:
-                out.append({"ok": False, "kind": action_type, "id": pid, "error": str(e)})
-
-        # Bulk commit of view actions
-        if commit_seen and view_ids_unique:
-            try:
-                existing_posts = set(Post.objects.filter(id__in=view_ids_unique).values_list("id", flat=True))
-                if existing_posts:
-                    already = set(SeenPost.objects.filter(user=request.user, post_id__in=existing_posts).values_list("post_id", flat=True))
-                    to_insert_ids = [pid for pid in existing_posts if pid not in already]
-                    to_create = [SeenPost(user=request.user, post_id=pid) for pid in to_insert_ids]
-
-                    if to_create:
-                        SeenPost.objects.bulk_create(to_create, ignore_conflicts=True, batch_size=500)
-
-                    for pid in view_ids_unique:
-                        out.append({"ok": True, "kind": "view", "id": pid, "committed": True})
+                record_seen_posts(request.user, view_ids_unique)
+                for pid in view_ids_unique:
+                    out.append({"ok": True, "kind": "view", "id": pid, "committed": True})
 
             except Exception as e:
                 for pid in view_ids_unique:
@@ -153,7 +152,7 @@ class BatchActionsView(APIView):
                     except Exception as inner:
                         out.append({"ok": False, "kind": "view", "id": pid, "error": str(inner)})
 
-        return Response({"results": out}, status=200)
+        return {"results": out}
 
 
 # --------------------------------------------------
@@ -205,8 +204,9 @@ class ReplyPagination(PageNumberPagination):
     max_page_size = 20
 
 
-class PostRepliesView(generics.ListAPIView):
+class PostRepliesView(CardListMixin, generics.ListAPIView):
     serializer_class = ReplySerializer
+    card = reply_card
     permission_classes = [AllowAny]
     pagination_class = ReplyPagination
 
@@ -221,14 +221,12 @@ class PostRepliesView(generics.ListAPIView):
         qs = (
             Post.objects
             .filter(parent_id=parent_id)
-            .select_related('author', 'university', 'parent', 'thread')
+            .select_related('author__university__city', 'university__city')
             .prefetch_related('hashtags')
         )
 
-        # Annotations for sorting
+        # Annotations for sorting (likes/replies come from the stored counters)
         qs = qs.annotate(
-            upvotes=Count('reactions', filter=Q(reactions__reaction='up'), distinct=True),
-            child_count=Count('replies', distinct=True),
             last_activity_at=Greatest(
                 F('created_at'),
                 Max('replies__created_at'),
@@ -240,7 +238,7 @@ class PostRepliesView(generics.ListAPIView):
                 default=Value(0.0),
                 output_field=FloatField(),
             ),
-            score=F('upvotes') + (Value(0.5) * F('child_count')) + F('recent_boost')
+            score=F('like_count') + (Value(0.5) * F('replies_count')) + F('recent_boost')
         )
 
         if sort == 'new':
@@ -339,138 +337,134 @@ class RemoveFlagVoteView(APIView):
 # --------------------------------------------------
 class FeedView(APIView):
     permission_classes = [IsAuthenticated]
+    seen_scan_chunks = 5  # max keyset chunks scanned per unseen page
 
     def get(self, request):
-        user = request.user
-        scope = request.query_params.get('scope', 'for_you')
-        page_size = int(request.query_params.get('page_size', 20))
-        cursor_token = request.query_params.get('cursor')
-        
-        # NEW: Person search filters
-        name = (request.query_params.get("name") or "").strip()
-        uni_id = request.query_params.get("university_id")
-        age = request.query_params.get("age")
-        
+        # Staff can add ?debug=1 for per-item score components and a
+        # Server-Timing header (query/rank/hydrate/serialize + DB time)
+        self.timer = StageTimer()
+        self.debug = is_debug_request(request)
+        if not self.debug:
+            return self.feed_page(request)
+        with self.timer.track_queries():
+            response = self.feed_page(request)
+        response["Server-Timing"] = self.timer.header()
+        return response
+
+    def cards(self, items, request):
+        """
+        The page's cards: a lazy iterator when the response will stream (long
+        pages, never with ?debug=1), else a list.
+        """
+        self.stream = not self.debug and should_stream(request, len(items))
+        cards = iter_cards(items, request)
+        return cards if self.stream else list(cards)
+
+    def respond(self, data, items, now):
+        if self.stream:
+            return StreamingJSONResponse(data)
+        if self.debug:
+            explain_posts(items, self.request.user, now=now)
+            data["debug"] = {"scores": [{"id": p.id, **p.score_explain} for p in items]}
+            self.timer.lap("explain")
+        return Response(data)
+
+    def feed_page(self, request):
         now = timezone.now()
+        params = FeedRequest(request.query_params, now)
+        if params.error:
+            return Response({'error': params.error}, status=400)
+        if params.ranked:
+            return self.ranked_page(request, params, now)
+
+        feed = ChronologicalFeed(request.user, params)
+        if feed.mode == "unseen":
+            rows, exhausted, position = feed.scan_unseen(load_seen_set(request.user, now=now), self.seen_scan_chunks)
+            if exhausted:
+                rows += feed.seen_rows(None, None, params.page_size - len(rows))
+            mode_next = "seen" if exhausted else "unseen"
+        else:
+            rows, position, mode_next = feed.seen_page(), None, "seen"
+        self.timer.lap("query")
 
-        if scope not in ['for_you', 'following', 'my_uni']:
-            return Response({'error': 'Invalid scope. Must be: for_you, following, or my_uni'}, status=400)
-
-        # Cursor management
-        cursor = {
-            "mode": "unseen",
-            "last_created_at": None,
-            "last_id": None,
-            "refresh_watermark": now.isoformat(),
-        }
-        if cursor_token:
-            try:
-                cursor = decode_cursor(cursor_token)
-            except Exception:
-                pass
+        # Phase two: hydrate only the page, in order
+        seen_flags = {pid: is_seen for pid, _, is_seen in rows}
+        items = hydrate_posts(list(seen_flags))
+        for obj in items:
+            obj._is_seen = seen_flags[obj.id]
+        self.timer.lap("hydrate")
 
-        refresh_cutoff = cursor.get("refresh_watermark", now.isoformat())
-        try:
-            refresh_cutoff_dt = datetime.fromisoformat(refresh_cutoff.replace('Z', '+00:00'))
-        except Exception:
-            refresh_cutoff_dt = now
-
-        # Base queryset with person search filters
-        base_qs = (Post.objects
-                   .filter(created_at__lte=refresh_cutoff_dt, parent__isnull=True)
-                   .select_related('author', 'university')
-                   .prefetch_related('hashtags'))
-
-        # Apply person search filters
-        if name:
-            base_qs = base_qs.filter(first_name__icontains=name)
-        if uni_id and str(uni_id).isdigit():
-            base_qs = base_qs.filter(university_id=int(uni_id))
-        if age and str(age).isdigit():
-            base_qs = base_qs.filter(person_age=int(age))
-
-        base_qs = scope_filter(base_qs, scope, user)
-
-        # Exclude suppressed posts
-        base_qs = base_qs.exclude(
-            Q(moderation_status__in=[Post.MOD_SOFT, Post.MOD_ESC]) &
-            (Q(moderation_until__isnull=True) | Q(moderation_until__gt=now))
-        )
+        serialized_data = self.cards(items, request)
+        self.timer.lap("serialize")
 
-        # Annotations for different post types
-        from django.db.models import OuterRef, Subquery
-        views_subq = (SeenPost.objects.filter(post_id=OuterRef('pk')).values('post_id').annotate(c=Count('id')).values('c')[:1])
-
-        annotated_qs = base_qs.annotate(
-            seen=Q(id__in=SeenPost.objects.filter(user=user).values_list('post_id', flat=True)),
-            upvotes=Count('reactions', filter=Q(reactions__reaction='up'), distinct=True),
-            red_votes=Count('flag_votes', filter=Q(flag_votes__vote='red'), distinct=True),
-            green_votes=Count('flag_votes', filter=Q(flag_votes__vote='green'), distinct=True),
-            repost_count=Count('reposts', distinct=True),
-            comment_count=Count('replies', distinct=True),
-            views=Subquery(views_subq),
-        )
+        next_cursor = feed.next_cursor(rows, position, mode_next)
+        return self.respond({
+            "items": serialized_data,
+            "next_cursor": next_cursor,
+            "scope": params.scope,
+            "has_more": bool(next_cursor),
+            "mode": mode_next,
+            "filters": params.filters(),
+        }, items, now)
 
-        # Split unseen/seen
-        unseen_qs = annotated_qs.filter(seen=False)
-        seen_qs = annotated_qs.filter(seen=True)
-
-        # Pagination logic
-        last_created_at = cursor.get("last_created_at")
-        last_id = cursor.get("last_id")
-
-        def page_queryset(qs):
-            if last_created_at and last_id:
-                try:
-                    last_created_dt = datetime.fromisoformat(last_created_at.replace('Z', '+00:00'))
-                    return list(apply_keyset(qs, last_created_dt, last_id)[:page_size])
-                except Exception:
-                    return list(qs.order_by('-created_at', '-id')[:page_size])
-            return list(qs.order_by('-created_at', '-id')[:page_size])
-
-        # Fetch items based on mode
-        items = []
-        mode_next = cursor.get("mode", "unseen")
-
-        if cursor.get("mode", "unseen") == "unseen":
-            unseen_posts = page_queryset(unseen_qs)
-            if len(unseen_posts) < page_size:
-                needed = page_size - len(unseen_posts)
-                seen_posts = list(seen_qs.order_by('-created_at', '-id')[:needed])
-                items = unseen_posts + seen_posts
-                mode_next = "seen" if seen_posts else "seen"
-            else:
-                items = unseen_posts
-                mode_next = "unseen"
-        else:
-            seen_posts = page_queryset(seen_qs)
-            items = seen_posts
-            mode_next = "seen"
+    def ranked_page(self, request, params, now):
+        """One page of the ranked For You feed, sliced from a cached snapshot."""
+        page_ids, next_cursor = ranked_page_ids(request.user, params.cursor, params.page_size, now, self.timer)
 
-        # Mark seen status for serializer
+        items = hydrate_posts(page_ids, visible_only=True)
         for obj in items:
-            obj._is_seen = getattr(obj, 'seen', False)
+            obj._is_seen = False
+        self.timer.lap("hydrate")
 
-        serialized_data = PostSerializer(items, many=True, context={'request': request}).data
+        serialized_data = self.cards(items, request)
+        self.timer.lap("serialize")
 
-        # Next cursor
-        next_cursor = None
-        if items:
-            last_item = items[-1]
-            next_cursor = encode_cursor({
-                "mode": mode_next,
-                "last_created_at": last_item.created_at.isoformat(),
-                "last_id": last_item.id,
-                "refresh_watermark": refresh_cutoff_dt.isoformat(),
-            })
-
-        return Response({
+        return self.respond({
             "items": serialized_data,
             "next_cursor": next_cursor,
-            "scope": scope,
+            "scope": "for_you",
             "has_more": bool(next_cursor),
-            "mode": mode_next,
-            "filters": {"name": name, "university_id": uni_id, "age": age}
+            "mode": "ranked",
+            "filters": {"name": "", "university_id": None, "age": None}
+        }, items, now)
+
+
+class CounterSyncView(APIView):
+    """
+    POST {"ids": [...], "since": <watermark>}: counters and viewer state for
+    the posts among `ids` whose counters changed after `since` (all of them
+    without one), as tuples in `fields` order — the same values as the card
+    fields of those names. One primary-key query on Post, plus the three
+    viewer-state lookups when something changed.
+
+    Send the returned `watermark` as the next `since`. It trails the clock by
+    POST_SYNC_LAG_SECONDS so counter writes still uncommitted when this ran are
+    sent next time instead of being missed; a post may be sent twice.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        ids = request.data.get("ids") or []
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return Response({"error": "ids must be a list of post ids"}, status=400)
+        if len(ids) > settings.POST_SYNC_MAX_IDS:
+            return Response({"error": f"At most {settings.POST_SYNC_MAX_IDS} ids per request"}, status=400)
+
+        now = timezone.now()
+        qs = Post.objects.filter(id__in=set(ids))
+        since = request.data.get("since")
+        if since:
+            since_dt = parse_datetime(since) if isinstance(since, str) else None
+            if since_dt is None:
+                return Response({"error": "since must be an ISO 8601 watermark"}, status=400)
+            qs = qs.filter(counters_updated_at__gt=since_dt)
+
+        rows = list(qs.values_list(*COUNTER_COLUMNS))
+        state = ViewerState.load(request.user, [row[0] for row in rows])
+        return Response({
+            "watermark": (now - timedelta(seconds=settings.POST_SYNC_LAG_SECONDS)).isoformat(),
+            "fields": COUNTER_FIELDS,
+            "posts": [counter_row(row, state) for row in rows],
         })
 
 
@@ -484,6 +478,13 @@ class MarkPostSeenView(APIView):
         post_id = request.data.get('post_id')
         if not post_id:
             return Response({'error': 'Missing post_id'}, status=400)
+        if view_buffer.enabled():
+            # Unknown ids are dropped by the flusher; no query here
+            try:
+                view_buffer.push_views(request.user.id, [int(post_id)])
+            except (TypeError, ValueError):
+                return Response({'error': 'Invalid post_id'}, status=400)
+            return Response({'message': 'Marked as seen.'}, status=200)
         post = Post.objects.filter(id=post_id).first()
         if not post:
             return Response({'error': 'Post not found'}, status=404)
@@ -521,14 +522,14 @@ class SavePostView(APIView):
             return Response({'error': 'Not in saved posts.'}, status=404)
 
 
-class SavedPostsListView(generics.ListAPIView):
+class SavedPostsListView(CardListMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return (Post.objects
                 .filter(saved_by__user=self.request.user)
-                .select_related('author', 'university')
+                .select_related('author__university__city', 'university__city')
                 .prefetch_related('hashtags')
                 .order_by('-saved_by__saved_at'))
 
@@ -603,16 +604,13 @@ class GlobalSearchView(APIView):
         data = {}
 
         if tab in ("all", "posts"):
-            posts = search_posts(q)
-            data["posts"] = PostPreviewSerializer(posts, many=True, context={"request": request}).data
+            posts = list(search_posts(q))
+            data["posts"] = build_cards(posts, request, post_preview_card)
 
         if tab in ("all", "people"):
-            # Search people by first name
-            people_posts = Post.objects.filter(
-                first_name__icontains=q, 
-                parent__isnull=True
-            ).select_related("author", "university").prefetch_related("hashtags")[:10]
-            data["people"] = PostPreviewSerializer(people_posts, many=True, context={"request": request}).data
+            # Search people by first name: exact, then prefix, then fuzzy matches
+            people_posts = hydrate_posts(search_people(q, limit=10))
+            data["people"] = build_cards(people_posts, request, post_preview_card)
 
         if tab in ("all", "university"):
             unis = search_universities(q)
@@ -664,15 +662,16 @@ def cloudinary_signature(request):
 # --------------------------------------------------
 # Additional views for completeness
 # --------------------------------------------------
-class UniversityPostsView(generics.ListAPIView):
+class UniversityPostsView(CardListMixin, generics.ListAPIView):
     serializer_class = PostPreviewSerializer
+    card = post_preview_card
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
         uid = int(self.kwargs["university_id"])
         return (Post.objects
                 .filter(university_id=uid, parent__isnull=True)
-                .select_related("author", "university")
+                .select_related("author__university__city", "university__city")
                 .prefetch_related("hashtags")
                 .order_by("-created_at"))
 
@@ -680,8 +679,9 @@ class UniversityPostsView(generics.ListAPIView):
         return {"request": self.request}
 
 
-class HashtagPostsView(generics.ListAPIView):
+class HashtagPostsView(CardListMixin, generics.ListAPIView):
     serializer_class = PostPreviewSerializer
+    card = post_preview_card
     permission_classes = [IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
@@ -692,7 +692,7 @@ class HashtagPostsView(generics.ListAPIView):
         return {"request": self.request}
 
 
-class UserPostsView(generics.ListAPIView):
+class UserPostsView(CardListMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -700,7 +700,7 @@ class UserPostsView(generics.ListAPIView):
         user_id = int(self.kwargs["user_id"])
         return (Post.objects
                 .filter(author_id=user_id, parent__isnull=True)
-                .select_related("author", "university")
+                .select_related("author__university__city", "university__city")
                 .prefetch_related("hashtags")
                 .order_by("-created_at"))
 
@@ -743,7 +743,7 @@ class CreateReplyView(APIView):
 
 # Update your UserPostsView in posts/views.py
 
-class UserPostsView(generics.ListAPIView):
+class UserPostsView(CardListMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -763,15 +763,8 @@ class UserPostsView(generics.ListAPIView):
         
         return (Post.objects
                 .filter(author_id=user_id, parent__isnull=True)
-                .select_related("author", "university")
+                .select_related("author__university__city", "university__city")
                 .prefetch_related("hashtags")
-                .annotate(
-                    # Add the same annotations as other views
-                    upvotes=Count('reactions', filter=Q(reactions__reaction='up'), distinct=True),
-                    red_votes=Count('flag_votes', filter=Q(flag_votes__vote='red'), distinct=True),
-                    green_votes=Count('flag_votes', filter=Q(flag_votes__vote='green'), distinct=True),
-                    comment_count=Count('replies', distinct=True),
-                )
                 .order_by("-created_at"))
 
     def get_serializer_context(self):
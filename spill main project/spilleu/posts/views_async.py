@@ -0,0 +1,169 @@
+# posts/views_async.py
+"""
+Async variant of FeedView for ASGI deployments.
+
+FeedView runs its queries strictly in sequence: unseen scan, seen backfill,
+hydration, then the three viewer-state lookups inside iter_cards().
+AsyncFeedView returns the same responses but runs the independent ones
+concurrently, each in a worker thread on that thread's own DB connection:
+
+* the unseen scan and a speculative seen backfill (its first rows are the
+  backfill FeedView would fetch; discarded when the unseen stream fills the
+  page — one short indexed query traded for a round trip);
+* hydration and the viewer's likes, flag votes and saves for the page.
+
+Authentication, permissions, throttling and rendering go through FeedView's
+DRF machinery, so status codes, headers and JSON bytes match. core/asgi.py
+routes /feed/ here (FEED_ASYNC); /feed/async/ always reaches it. The sync
+view stays the fallback under WSGI.
+"""
+
+import asyncio
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.views import View
+from rest_framework.response import Response
+
+from core.streaming import StreamingJSONResponse, should_stream
+from core.timing import StageTimer, is_debug_request
+from .cards import iter_cards
+from .feed_engine import explain_posts
+from .feed_query import ChronologicalFeed, FeedRequest, ranked_page_ids
+from .seen_set import load_seen_set
+from .selectors import hydrate_posts
+from .viewer_state import ViewerState
+from .views import FeedView
+
+
+async def run_db(fn, *args, timer=None):
+    """
+    Run blocking ORM code `fn(*args)` in a worker thread, on that thread's own
+    connection (released per CONN_MAX_AGE afterwards). With `timer`, its
+    queries are counted; concurrent calls add up, so DB time can exceed wall
+    time.
+    """
+    def call():
+        try:
+            with timer.track_queries() if timer else nullcontext():
+                return fn(*args)
+        finally:
+            close_old_connections()
+
+    return await sync_to_async(call, thread_sensitive=False)()
+
+
+class AsyncFeedView(View):
+    seen_scan_chunks = FeedView.seen_scan_chunks
+    speculative_backfill = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # ATOMIC_REQUESTS can't wrap an async view; this one only reads
+        return transaction.non_atomic_requests(super().as_view(**initkwargs))
+
+    @staticmethod
+    def drf_initial(request):
+        """Authenticate, check permissions and throttles like FeedView. Returns (view, request, denial)."""
+        view = FeedView()
+        view.args, view.kwargs = (), {}
+        view.headers = view.default_response_headers
+        drf_request = view.request = view.initialize_request(request)
+        try:
+            view.initial(drf_request)
+        except Exception as exc:
+            return view, drf_request, view.finalize_response(drf_request, view.handle_exception(exc)).render()
+        return view, drf_request, None
+
+    async def get(self, request):
+        view, drf_request, denied = await run_db(self.drf_initial, request)
+        if denied is not None:
+            return denied
+
+        self.timer = StageTimer()
+        self.debug = is_debug_request(drf_request)
+        timer = self.timer if self.debug else None
+        user = drf_request.user
+        now = timezone.now()
+
+        params = FeedRequest(drf_request.query_params, now)
+        if params.error:
+            return self.render(view, drf_request, {'error': params.error}, status=400)
+
+        if params.ranked:
+            page_ids, next_cursor = await run_db(ranked_page_ids, user, params.cursor, params.page_size, now,
+                                                 self.timer, timer=timer)
+            items, state = await self.hydrate(user, {pid: False for pid in page_ids}, True, timer)
+            data = {
+                "next_cursor": next_cursor,
+                "scope": "for_you",
+                "has_more": bool(next_cursor),
+                "mode": "ranked",
+                "filters": {"name": "", "university_id": None, "age": None},
+            }
+        else:
+            feed = ChronologicalFeed(user, params)
+            if feed.mode == "unseen":
+                scan = run_db(self.scan_unseen, feed, user, now, timer=timer)
+                backfill = None
+                if self.speculative_backfill:
+                    (rows, exhausted, position), backfill = await asyncio.gather(
+                        scan, run_db(feed.seen_rows, None, None, params.page_size, timer=timer))
+                else:
+                    rows, exhausted, position = await scan
+                if exhausted:
+                    missing = params.page_size - len(rows)
+                    if backfill is None:
+                        backfill = await run_db(feed.seen_rows, None, None, missing, timer=timer)
+                    rows += backfill[:missing]
+                mode_next = "seen" if exhausted else "unseen"
+            else:
+                rows, position, mode_next = await run_db(feed.seen_page, timer=timer), None, "seen"
+            self.timer.lap("query")
+
+            items, state = await self.hydrate(user, {pid: is_seen for pid, _, is_seen in rows}, False, timer)
+            next_cursor = feed.next_cursor(rows, position, mode_next)
+            data = {
+                "next_cursor": next_cursor,
+                "scope": params.scope,
+                "has_more": bool(next_cursor),
+                "mode": mode_next,
+                "filters": params.filters(),
+            }
+
+        cards = iter_cards(items, drf_request, viewer_state=state)
+        if not self.debug and should_stream(drf_request, len(items)):
+            return view.finalize_response(drf_request, StreamingJSONResponse({"items": cards, **data}, asynchronous=True))
+        data = {"items": list(cards), **data}
+        self.timer.lap("serialize")
+        if self.debug:
+            await run_db(explain_posts, items, user, None, now, timer=timer)
+            data["debug"] = {"scores": [{"id": p.id, **p.score_explain} for p in items]}
+            self.timer.lap("explain")
+
+        response = self.render(view, drf_request, data)
+        if self.debug:
+            response["Server-Timing"] = self.timer.header()
+        return response
+
+    def scan_unseen(self, feed, user, now):
+        return feed.scan_unseen(load_seen_set(user, now=now), self.seen_scan_chunks)
+
+    async def hydrate(self, user, seen_flags, visible_only, timer):
+        """Page objects and viewer state, loaded concurrently (four queries at once)."""
+        ids = list(seen_flags)
+        jobs = [run_db(hydrate_posts, ids, visible_only, timer=timer)]
+        if ids and user.is_authenticated:
+            jobs += [run_db(load, user, ids, timer=timer)
+                     for load in (ViewerState.load_reactions, ViewerState.load_flag_votes, ViewerState.load_saved_ids)]
+        items, *loaded = await asyncio.gather(*jobs)
+        for obj in items:
+            obj._is_seen = seen_flags[obj.id]
+        self.timer.lap("hydrate")
+        return items, ViewerState(ids, *loaded)
+
+    @staticmethod
+    def render(view, drf_request, data, status=200):
+        return view.finalize_response(drf_request, Response(data, status=status)).render()